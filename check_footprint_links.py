@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This script checks the links between symbols and footprints of a whole
+library collection at once:
+
+* missing footprints - footprint fields (F2) pointing to a footprint or
+  footprint library which does not exist, or not of the form Library:Footprint
+* dead filters - footprint filters ($FPLIST) which match no footprint
+* unreferenced footprints - footprints which are neither set in a footprint
+  field nor matched by any footprint filter
+
+The footprint names are listed once (.pretty folders or packs, the files
+are not parsed). The .lib files are scanned for the footprint fields and
+filters only, in parallel.
+
+Filters are matched like KiCad does: a filter containing ':' is matched
+against Library:Footprint, other filters against the footprint name.
+
+Example:
+    ./check_footprint_links.py --symbols path/to/library --footprints path/to/footprints
+"""
+
+from __future__ import print_function
+
+import argparse
+import bisect
+import fnmatch
+import json
+import multiprocessing
+import os
+import re
+import sys
+
+for directory in ['pcb', 'common']:
+    path = os.path.abspath(os.path.join(sys.path[0], directory))
+    if not path in sys.path:
+        sys.path.append(path)
+
+from print_color import *
+from prettypack import findLibraries, listFootprints
+
+FOOTPRINT_FIELD = re.compile(r'^F2\s+"((?:[^"\\]|\\.)*)"')
+
+def findSymbolLibraries(paths):
+    """
+    Sorted list of all .lib files in the given paths (files or folders)
+    """
+    files = set()
+
+    for path in paths:
+        if os.path.isfile(path):
+            files.add(os.path.abspath(path))
+            continue
+
+        for root, dirnames, filenames in os.walk(path):
+            for filename in filenames:
+                if filename.endswith('.lib'):
+                    files.add(os.path.abspath(os.path.join(root, filename)))
+
+    return sorted(files)
+
+def libraryFootprints(task):
+    """
+    Sorted footprint names of a footprint library, returns (library, names)
+    """
+    library, path = task
+    return library, [os.path.basename(f)[:-10] for f in listFootprints(path)]
+
+def scanLibrary(filename):
+    """
+    Footprint fields and filters of all symbols of a .lib file, without parsing the drawings.
+    Returns (filename, list of (symbol, footprint field, filters), error)
+    """
+    symbols = []
+    symbol = None
+
+    try:
+        with open(filename, 'r') as f:
+            in_fplist = False
+            for line in f:
+                if line.startswith('DEF '):
+                    symbol = [line.split()[1], '', []]
+                elif symbol is None:
+                    continue
+                elif in_fplist:
+                    if line.startswith('$ENDFPLIST'):
+                        in_fplist = False
+                    elif line.strip():
+                        symbol[2].append(line.strip())
+                elif line.startswith('$FPLIST'):
+                    in_fplist = True
+                elif line.startswith('F2 '):
+                    match = FOOTPRINT_FIELD.match(line)
+                    if match:
+                        symbol[1] = match.group(1)
+                elif line.startswith('ENDDEF'):
+                    symbols.append(tuple(symbol))
+                    symbol = None
+    except (IOError, OSError, UnicodeDecodeError) as e:
+        return (filename, [], str(e))
+
+    return (filename, symbols, None)
+
+class FilterMatcher(object):
+    """
+    Matches footprint filters against all footprints.
+    Filters starting with a literal text are only matched against the
+    footprints starting with that text (found by bisection). Other filters
+    are only matched against the footprints containing their longest
+    literal part (found by a text search over all names).
+    """
+
+    def __init__(self, footprints):
+        self.footprints = footprints
+        # sorted names and Library:Footprint names, each with the index of the footprint
+        self.names = self._nameList(sorted((fp[1], i) for i, fp in enumerate(footprints)))
+        self.full_names = self._nameList(sorted(('{l}:{f}'.format(l=fp[0], f=fp[1]), i) for i, fp in enumerate(footprints)))
+
+    def _nameList(self, names):
+        """
+        The names, all names as one text (one per line) and the start of each line
+        """
+        starts = []
+        position = 0
+        for name, index in names:
+            starts.append(position)
+            position += len(name) + 1
+        return names, '\n'.join(name for name, index in names) + '\n', starts
+
+    def _candidates(self, pattern, name_list):
+        names, text, starts = name_list
+
+        # literal text before the first wildcard
+        prefix = re.split(r'[*?\[]', pattern, 1)[0]
+        if prefix:
+            start = bisect.bisect_left(names, (prefix,))
+            end = bisect.bisect_left(names, (prefix + u'\U0010ffff',))
+            return names[start:end]
+
+        literal = max(re.split(r'[*?]|\[[^\]]*\]', pattern), key=len)
+        if not literal or '[' in literal:
+            return names
+
+        lines = set()
+        position = text.find(literal)
+        while position >= 0:
+            lines.add(bisect.bisect_right(starts, position) - 1)
+            position = text.find(literal, position + 1)
+
+        return [names[line] for line in sorted(lines)]
+
+    def match(self, pattern):
+        """
+        Set of indices of the footprints matching a filter
+        """
+        name_list = self.full_names if ':' in pattern else self.names
+        regex = re.compile(fnmatch.translate(pattern))
+
+        return set(index for name, index in self._candidates(pattern, name_list) if regex.match(name))
+
+def checkLinks(symbol_files, footprint_libs, jobs):
+    """
+    Check the links between the symbols of symbol_files and the
+    footprints of footprint_libs (map of { library : list of paths }).
+    The footprints of libraries with the same name are merged.
+    Returns a dict with the lists 'missing', 'dead_filters', 'unreferenced' and 'errors'.
+    """
+    tasks = [(library, path) for library in sorted(footprint_libs) for path in footprint_libs[library]]
+
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        lib_footprints = pool.map(libraryFootprints, tasks)
+        results = pool.imap(scanLibrary, symbol_files, chunksize=4)
+    else:
+        lib_footprints = map(libraryFootprints, tasks)
+        results = map(scanLibrary, symbol_files)
+
+    # all footprints as (library, name), and the index of each one
+    footprints = set()
+    for library, names in lib_footprints:
+        footprints.update((library, name) for name in names)
+    footprints = sorted(footprints)
+    index = dict((fp, i) for i, fp in enumerate(footprints))
+
+    matcher = FilterMatcher(footprints)
+    filter_matches = {}
+
+    report = {'missing': [], 'dead_filters': [], 'unreferenced': [], 'errors': []}
+    referenced = set()
+
+    for filename, symbols, error in results:
+        library = os.path.splitext(os.path.basename(filename))[0]
+
+        if error:
+            report['errors'].append((filename, error))
+
+        for name, footprint, filters in symbols:
+            symbol = '{l}:{s}'.format(l=library, s=name)
+
+            if footprint:
+                fp = tuple(footprint.split(':', 1))
+                if len(fp) != 2 or not fp[0] or not fp[1]:
+                    report['missing'].append((symbol, footprint, "not of the form 'Library:Footprint'"))
+                elif not fp[0] in footprint_libs:
+                    report['missing'].append((symbol, footprint, "footprint library '{l}' not found".format(l=fp[0])))
+                elif not fp in index:
+                    report['missing'].append((symbol, footprint, "footprint not found"))
+                else:
+                    referenced.add(index[fp])
+
+            for pattern in filters:
+                if not pattern in filter_matches:
+                    filter_matches[pattern] = matcher.match(pattern)
+                    referenced.update(filter_matches[pattern])
+
+                if not filter_matches[pattern]:
+                    report['dead_filters'].append((symbol, pattern))
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    report['unreferenced'] = ['{l}:{f}'.format(l=fp[0], f=fp[1]) for i, fp in enumerate(footprints) if not i in referenced]
+
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the links between symbols and footprints: missing footprints, dead footprint filters and unreferenced footprints')
+    parser.add_argument('-s', '--symbols', help='.lib files or folders containing them', nargs='+', required=True)
+    parser.add_argument('-f', '--footprints', help='.pretty folders, .prettypack files or folders containing them', nargs='+', required=True)
+    parser.add_argument('--missing', help='Only report missing footprints', action='store_true')
+    parser.add_argument('--filters', help='Only report dead footprint filters', action='store_true')
+    parser.add_argument('--unreferenced', help='Only report unreferenced footprints', action='store_true')
+    parser.add_argument('-j', '--jobs', help='Number of processes used for reading files (default = number of CPUs)', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--json', help='Print the report as JSON', action='store_true')
+    parser.add_argument('--nocolor', help='does not use color', action='store_true')
+
+    args = parser.parse_args()
+
+    printer = PrintColor(use_color = not args.nocolor)
+
+    # report everything unless some parts are selected
+    sections = [s for s in ['missing', 'filters', 'unreferenced'] if getattr(args, s)] or ['missing', 'filters', 'unreferenced']
+
+    footprint_libs = findLibraries(args.footprints)
+
+    for library in sorted(footprint_libs):
+        if len(footprint_libs[library]) > 1:
+            printer.yellow("Footprint library '{l}' found more than once, the footprints are merged: {p}".format(
+                l=library, p=', '.join(footprint_libs[library])))
+
+    report = checkLinks(findSymbolLibraries(args.symbols), footprint_libs, args.jobs)
+
+    for filename, error in report['errors']:
+        printer.red("Could not read '{f}': {e}".format(f=filename, e=error))
+
+    if args.json:
+        output = {}
+        if 'missing' in sections:
+            output['missing'] = [{'symbol': s, 'footprint': f, 'error': e} for s, f, e in report['missing']]
+        if 'filters' in sections:
+            output['dead_filters'] = [{'symbol': s, 'filter': f} for s, f in report['dead_filters']]
+        if 'unreferenced' in sections:
+            output['unreferenced'] = report['unreferenced']
+        print(json.dumps(output, indent=4))
+    else:
+        if 'missing' in sections:
+            for symbol, footprint, error in report['missing']:
+                printer.red("{s}: footprint '{f}': {e}".format(s=symbol, f=footprint, e=error))
+        if 'filters' in sections:
+            for symbol, pattern in report['dead_filters']:
+                printer.yellow("{s}: footprint filter '{f}' matches no footprint".format(s=symbol, f=pattern))
+        if 'unreferenced' in sections:
+            for footprint in report['unreferenced']:
+                print("Footprint '{f}' is not referenced by any symbol".format(f=footprint))
+
+        printer.green("{m} missing footprints, {d} dead filters, {u} unreferenced footprints".format(
+            m=len(report['missing']), d=len(report['dead_filters']), u=len(report['unreferenced'])))
+
+    errors = report['errors']
+    if 'missing' in sections:
+        errors = errors + report['missing']
+    if 'filters' in sections:
+        errors = errors + report['dead_filters']
+
+    sys.exit(1 if errors else 0)
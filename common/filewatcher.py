@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+
+class FileWatcher(object):
+    """
+    Poll a set of files and directories for modifications.
+
+    Directories are re-listed on every poll, so files which are added to
+    (or removed from) a watched directory are reported as changed as well.
+    Only files ending with one of the given extensions are considered.
+    """
+
+    def __init__(self, paths, extensions, interval=0.5):
+        self.paths = paths
+        self.extensions = tuple(extensions)
+        self.interval = interval
+        self.state = self.scan()
+
+    def listFiles(self):
+        files = []
+
+        for path in self.paths:
+            if os.path.isdir(path):
+                for f in sorted(os.listdir(path)):
+                    if f.endswith(self.extensions):
+                        files.append(os.path.join(path, f))
+            elif path.endswith(self.extensions):
+                files.append(path)
+
+        return files
+
+    def scan(self):
+        state = {}
+
+        for f in self.listFiles():
+            try:
+                st = os.stat(f)
+            except OSError:
+                # File might be in the middle of being rewritten
+                continue
+            state[f] = (st.st_mtime, st.st_size)
+
+        return state
+
+    def changes(self):
+        """
+        Return a sorted list of all files which have been modified, created
+        or deleted since the previous call
+        """
+        state = self.scan()
+
+        changed = set()
+
+        for f in state:
+            if self.state.get(f) != state[f]:
+                changed.add(f)
+
+        for f in self.state:
+            if f not in state:
+                changed.add(f)
+
+        self.state = state
+
+        return sorted(changed)
+
+    def watch(self, callback):
+        """
+        Block until interrupted, calling callback(changed_files) every time
+        some of the watched files are modified
+        """
+        try:
+            while True:
+                time.sleep(self.interval)
+                changed = self.changes()
+                if changed:
+                    callback(changed)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Geometry helpers shared by the library checkers.
+
+Boxes are tuples of (xmin, ymin, xmax, ymax).
+
+Batch operations on many points use NumPy if it is installed,
+otherwise they fall back to plain Python.
+
+"""
+
+from __future__ import division
+
+import heapq
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def boxOfPoints(points):
+    """
+    Bounding box of a list of (x, y) tuples
+    """
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def mergeBoxes(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def expandBox(box, distance):
+    return (box[0] - distance, box[1] - distance, box[2] + distance, box[3] + distance)
+
+def boxesOverlap(a, b):
+    """
+    True if two boxes overlap (touching counts as overlapping)
+    """
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def rotatePoints(points, degrees):
+    """
+    Rotate a list of (x, y) points around the origin.
+    Returns a list of (x, y) tuples.
+    """
+    radians = degrees * math.pi / 180
+    c = math.cos(radians)
+    s = math.sin(radians)
+
+    if numpy is not None and len(points) > 0:
+        xy = numpy.array(points, dtype=float)
+        x = xy[:, 0]
+        y = xy[:, 1]
+        return list(zip((x * c - y * s).tolist(), (y * c + x * s).tolist()))
+
+    return [(x * c - y * s, y * c + x * s) for x, y in points]
+
+def translatePoints(points, dx, dy):
+    """
+    Move a list of (x, y) points by (dx, dy).
+    Returns a list of (x, y) tuples.
+    """
+    if numpy is not None and len(points) > 0:
+        xy = numpy.array(points, dtype=float)
+        return list(zip((xy[:, 0] + dx).tolist(), (xy[:, 1] + dy).tolist()))
+
+    return [(x + dx, y + dy) for x, y in points]
+
+def rectanglesBoundingBox(rects):
+    """
+    Bounding box of rotated rectangles.
+
+    rects is a list of (x, y, width, height, degrees) tuples, each
+    rectangle centered at (x, y) and rotated around its center.
+    Returns None for an empty list.
+    """
+    if len(rects) == 0:
+        return None
+
+    if numpy is not None:
+        r = numpy.array(rects, dtype=float)
+        radians = r[:, 4] * math.pi / 180
+        c = numpy.cos(radians)
+        s = numpy.sin(radians)
+        w = r[:, 2] / 2
+        h = r[:, 3] / 2
+
+        # Half extents of the rotated rectangles
+        ex = numpy.abs(w * c) + numpy.abs(h * s)
+        ey = numpy.abs(w * s) + numpy.abs(h * c)
+
+        return (float(numpy.min(r[:, 0] - ex)), float(numpy.min(r[:, 1] - ey)),
+                float(numpy.max(r[:, 0] + ex)), float(numpy.max(r[:, 1] + ey)))
+
+    box = None
+
+    for x, y, width, height, degrees in rects:
+        radians = degrees * math.pi / 180
+        c = math.cos(radians)
+        s = math.sin(radians)
+        w = width / 2
+        h = height / 2
+
+        ex = abs(w * c) + abs(h * s)
+        ey = abs(w * s) + abs(h * c)
+
+        rect = (x - ex, y - ey, x + ex, y + ey)
+        box = rect if box is None else mergeBoxes(box, rect)
+
+    return box
+
+def arcBoundingBox(cx, cy, x, y, angle):
+    """
+    Exact bounding box of an arc around (cx, cy), starting at (x, y)
+    and sweeping the given angle (degrees, either direction).
+
+    The box is spanned by the two endpoints and every point where the
+    arc crosses one of the axes through the center.
+    """
+    dx = x - cx
+    dy = y - cy
+    r = math.hypot(dx, dy)
+
+    if abs(angle) >= 360:
+        return (cx - r, cy - r, cx + r, cy + r)
+
+    a1 = math.degrees(math.atan2(dy, dx))
+    a2 = a1 + angle
+
+    end = math.radians(a2)
+    points = [(x, y), (cx + r * math.cos(end), cy + r * math.sin(end))]
+
+    lo = min(a1, a2)
+    hi = max(a1, a2)
+
+    # Multiples of 90 degrees within the swept range
+    quadrant = int(math.ceil(lo / 90))
+    while quadrant * 90 <= hi:
+        points.append([
+            (cx + r, cy),
+            (cx, cy + r),
+            (cx - r, cy),
+            (cx, cy - r)][quadrant % 4])
+        quadrant += 1
+
+    return boxOfPoints(points)
+
+class GridIndex(object):
+    """
+    Uniform grid over a list of boxes, to quickly find the boxes which
+    overlap a given query box.
+
+    Items are referred to by their index in the list of boxes.
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = boxes
+
+        if cell_size is None:
+            # Use the average item size, so that most items fall in few cells
+            sizes = [max(b[2] - b[0], b[3] - b[1]) for b in boxes]
+            cell_size = sum(sizes) / len(sizes) if sizes else 1
+
+        self.cell_size = max(cell_size, 1e-3)
+
+        self.cells = {}
+
+        for i, box in enumerate(boxes):
+            for cell in self._cells(box):
+                self.cells.setdefault(cell, []).append(i)
+
+    def _range(self, lo, hi):
+        return range(int(math.floor(lo / self.cell_size)), int(math.floor(hi / self.cell_size)) + 1)
+
+    def _cells(self, box):
+        for x in self._range(box[0], box[2]):
+            for y in self._range(box[1], box[3]):
+                yield (x, y)
+
+    def query(self, box):
+        """
+        Sorted list of indices of all boxes overlapping the given box
+        """
+        # Query box may be much larger than the grid (e.g. long lines)
+        nx = len(self._range(box[0], box[2]))
+        ny = len(self._range(box[1], box[3]))
+
+        if nx * ny > len(self.cells):
+            candidates = set()
+            for cell, items in self.cells.items():
+                if box[0] <= (cell[0] + 1) * self.cell_size and cell[0] * self.cell_size <= box[2] and \
+                   box[1] <= (cell[1] + 1) * self.cell_size and cell[1] * self.cell_size <= box[3]:
+                    candidates.update(items)
+        else:
+            candidates = set()
+            for cell in self._cells(box):
+                candidates.update(self.cells.get(cell, []))
+
+        return sorted(i for i in candidates if boxesOverlap(self.boxes[i], box))
+
+# Overlap detection of graphic items (rule F5.4),
+# math and comments from Michal script
+# https://github.com/michal777/KiCad_Lib_Check
+
+# Distance (mm) below which coordinates are considered equal
+TOLERANCE = 1e-4
+
+# Angle (rad) below which directions are considered equal
+ANGLE_TOLERANCE = 1e-5
+
+def _clusters(items, key, tolerance):
+    """
+    Group items whose key values are within tolerance of each other.
+    Items are sorted by key, a new group starts at every gap > tolerance.
+    """
+    groups = []
+    last = None
+
+    for item in sorted(items, key=key):
+        k = key(item)
+        if last is None or k - last > tolerance:
+            groups.append([])
+        groups[-1].append(item)
+        last = k
+
+    return groups
+
+def _overlappingIntervals(intervals, tolerance):
+    """
+    Find the owners of intervals which overlap an interval of another owner
+    by more than the tolerance.
+
+    intervals is a list of (start, end, owner) tuples.
+    Runs in O(n log n): intervals are swept in order of their start,
+    every interval is marked at most once.
+    """
+    marked = set()
+
+    # Intervals which have not been marked yet and might still overlap, by end
+    unmarked = []
+    max_end = None
+
+    for seq, (start, end, owner) in enumerate(sorted(intervals, key=lambda i: (i[0], i[1]))):
+        if end - start <= tolerance:
+            continue
+
+        while unmarked and unmarked[0][0] <= start + tolerance:
+            heapq.heappop(unmarked)
+
+        if max_end is not None and max_end > start + tolerance:
+            # Every remaining interval ends after this one starts
+            marked.add(owner)
+            marked.update(i[2] for i in unmarked)
+            unmarked = []
+        elif owner not in marked:
+            heapq.heappush(unmarked, (end, seq, owner))
+
+        if max_end is None or end > max_end:
+            max_end = end
+
+    return marked
+
+def collinearOverlaps(segments):
+    """
+    Find line segments which overlap another collinear segment.
+
+    segments is a list of ((x1, y1), (x2, y2)) tuples.
+    Segments are grouped by direction and offset (distance of their line
+    from the origin), then the intervals they cover along each line are
+    compared. Segments which only touch at their ends don't overlap.
+
+    Returns the sorted list of indices of overlapping segments.
+    """
+    lines = []
+
+    for i, (p1, p2) in enumerate(segments):
+        dx = p2[0] - p1[0]
+        dy = p2[1] - p1[1]
+        length = math.hypot(dx, dy)
+
+        if length <= TOLERANCE:
+            continue
+
+        # Direction within (-90, 90] degrees
+        theta = math.atan2(dy, dx)
+        if theta <= -math.pi / 2 + ANGLE_TOLERANCE:
+            theta += math.pi
+        elif theta > math.pi / 2 + ANGLE_TOLERANCE:
+            theta -= math.pi
+
+        lines.append((theta, i))
+
+    overlaps = set()
+
+    for direction in _clusters(lines, lambda l: l[0], ANGLE_TOLERANCE):
+        # Common direction of all lines in this group
+        ux = math.cos(direction[0][0])
+        uy = math.sin(direction[0][0])
+
+        offsets = []
+        for theta, i in direction:
+            p1, p2 = segments[i]
+            offset = -uy * p1[0] + ux * p1[1]
+            t1 = ux * p1[0] + uy * p1[1]
+            t2 = ux * p2[0] + uy * p2[1]
+            offsets.append((offset, min(t1, t2), max(t1, t2), i))
+
+        for line in _clusters(offsets, lambda l: l[0], TOLERANCE):
+            overlaps.update(_overlappingIntervals([l[1:] for l in line], TOLERANCE))
+
+    return sorted(overlaps)
+
+def arcOverlaps(arcs):
+    """
+    Find arcs (and circles) which overlap another arc or circle.
+
+    arcs is a list of (cx, cy, radius, start angle, sweep angle) tuples,
+    angles in degrees. Circles have a sweep angle of 360.
+    Arcs are grouped by center and radius, then the angle ranges they
+    cover are compared.
+
+    Returns the sorted list of indices of overlapping arcs.
+    """
+    overlaps = set()
+
+    items = [(arc[0], arc[1], arc[2], i) for i, arc in enumerate(arcs) if arc[2] > TOLERANCE]
+
+    for same_x in _clusters(items, lambda a: a[0], TOLERANCE):
+        for same_y in _clusters(same_x, lambda a: a[1], TOLERANCE):
+            for same_r in _clusters(same_y, lambda a: a[2], TOLERANCE):
+                intervals = []
+
+                for cx, cy, r, i in same_r:
+                    start, sweep = arcs[i][3], arcs[i][4]
+
+                    if sweep < 0:
+                        start, sweep = start + sweep, -sweep
+
+                    if sweep >= 360:
+                        intervals.append((0, 360, i))
+                        continue
+
+                    start = start % 360
+                    if start + sweep > 360:
+                        intervals.append((start, 360, i))
+                        intervals.append((0, start + sweep - 360, i))
+                    else:
+                        intervals.append((start, start + sweep, i))
+
+                # Angle corresponding to TOLERANCE on the circumference
+                tolerance = math.degrees(TOLERANCE / same_r[0][2])
+
+                overlaps.update(_overlappingIntervals(intervals, tolerance))
+
+    return sorted(overlaps)
+
+class PointIndex(object):
+    """
+    Snaps points to a grid of the given tolerance, so that points closer
+    than the tolerance (in x and y) map to the same node number.
+    A point may have a smaller tolerance of its own (e.g. 0 for exact
+    matches), two points match within the larger tolerance of the two.
+    """
+
+    def __init__(self, tolerance=TOLERANCE):
+        self.tolerance = max(tolerance, TOLERANCE)
+        self.cells = {}
+        self.points = []
+
+    def node(self, x, y, tolerance=None):
+        if tolerance is None:
+            tolerance = self.tolerance
+
+        cx = int(math.floor(x / self.tolerance))
+        cy = int(math.floor(y / self.tolerance))
+
+        # Matching point might be in a neighbouring cell
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for n, t in self.cells.get((i, j), []):
+                    px, py = self.points[n]
+                    limit = max(t, tolerance)
+                    if abs(px - x) <= limit and abs(py - y) <= limit:
+                        return n
+
+        n = len(self.points)
+        self.points.append((x, y))
+        self.cells.setdefault((cx, cy), []).append((n, tolerance))
+
+        return n
+
+class Contours(object):
+    """
+    Result of buildContours()
+        * loops - closed contours, lists of item indices in chain order
+        * chains - contours which are not closed, lists of item indices in chain order
+        * open_ends - list of (item index, (x, y)) for every unconnected endpoint
+    """
+
+    def __init__(self):
+        self.loops = []
+        self.chains = []
+        self.open_ends = []
+
+    @property
+    def closed(self):
+        return len(self.open_ends) == 0
+
+def buildContours(segments, tolerance=TOLERANCE, tolerances=None):
+    """
+    Link items (lines, arcs) into contours by their endpoints.
+
+    segments is a list of ((x1, y1), (x2, y2)) endpoint tuples, or None for
+    items which are closed on their own (e.g. circles).
+    Endpoints closer than the tolerance are connected. tolerances is an
+    optional list of the tolerance of each item (at most tolerance), the
+    endpoints of two items are connected within the larger of both.
+
+    Chains end at unconnected endpoints and at branch points, where
+    more than two items meet.
+    """
+    contours = Contours()
+
+    points = PointIndex(tolerance)
+
+    # node : list of (item, other node)
+    links = {}
+    ends = {}
+
+    for i, segment in enumerate(segments):
+        if segment is None:
+            contours.loops.append([i])
+            continue
+
+        t = tolerances[i] if tolerances is not None else None
+        n1 = points.node(segment[0][0], segment[0][1], t)
+        n2 = points.node(segment[1][0], segment[1][1], t)
+
+        ends[i] = (n1, n2)
+        links.setdefault(n1, []).append((i, n2))
+        links.setdefault(n2, []).append((i, n1))
+
+    for node in sorted(links):
+        if len(links[node]) == 1:
+            item = links[node][0][0]
+            contours.open_ends.append((item, points.points[node]))
+
+    used = set()
+
+    def follow(item, node):
+        """
+        Walk from node along item through all following unbranched nodes
+        """
+        chain = []
+
+        while True:
+            chain.append(item)
+            used.add(item)
+
+            n1, n2 = ends[item]
+            node = n2 if node == n1 else n1
+
+            if len(links[node]) != 2:
+                break
+
+            unused = [l[0] for l in links[node] if l[0] not in used]
+            if not unused:
+                break
+            item = unused[0]
+
+        return chain
+
+    # Chains start at open ends and branch points
+    for node in sorted(links):
+        if len(links[node]) == 2:
+            continue
+        for item, other in links[node]:
+            if item not in used:
+                contours.chains.append(follow(item, node))
+
+    # Everything left forms closed loops
+    for i in sorted(ends):
+        if i not in used:
+            contours.loops.append(follow(i, ends[i][0]))
+
+    return contours
+
+if __name__ == '__main__':
+    # Timing of arcBoundingBox, compared to sampling the arc in small steps.
+    # The results are compared in test_geometry.py
+    import random
+    import timeit
+
+    from test_geometry import sampledArcBoundingBox
+
+    random.seed(0)
+    arcs = []
+    for i in range(200):
+        arcs.append((random.uniform(-10, 10), random.uniform(-10, 10),
+                     random.uniform(-10, 10), random.uniform(-10, 10),
+                     random.choice([90, -90, 180, 360, -360, random.uniform(-400, 400), random.uniform(-1, 1)])))
+
+    t_exact = timeit.timeit(lambda: [arcBoundingBox(*arc) for arc in arcs], number=10)
+    t_sampled = timeit.timeit(lambda: [sampledArcBoundingBox(*arc, steps=360) for arc in arcs], number=10)
+
+    print("arcBoundingBox: {t:.2f}ms, sampled (1 degree steps): {s:.2f}ms per 1000 arcs".format(
+        t=t_exact * 1000 / len(arcs) / 10 * 1000,
+        s=t_sampled * 1000 / len(arcs) / 10 * 1000))
@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Execution engine of the KLC checkers (schlib/checklib.py and pcb/check_kicad_mod.py).
+
+A checker provides an item source (see ItemSource), which loads the items
+(symbols, footprints) of a task (a library or footprint file) and knows how
+to create rules for them and how to save fixed items. The engine checks all
+items against the selected rules and passes the results to output sinks
+(console output, JSON log).
+
+Tasks can be checked in a process pool; the results are reported in the
+order of the tasks, so the output is the same as of a sequential run.
+
+Results are cached per task, like parsed files (see parsecache.py): a task
+whose files did not change is not checked again as long as the rules,
+the checker code and the options are the same.
+
+A run can be split into shards (e.g. on several CI machines): every shard
+checks a part of the tasks, balanced by the size of the files or by the
+timings of a previous run. The JSON reports of the shards (see ReportSink)
+are combined by merge_results.py.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from contextlib import redirect_stdout
+
+from parsecache import cacheDir, sourceFiles, sourceHash, sourceStat
+from rulebase import logError
+
+# Increment when the layout of cached results changes
+RESULT_CACHE_VERSION = 2
+
+class TaskError(Exception):
+    """
+    Raised by an item source if a task can't be checked.
+    The message is printed, failed tells if the task counts as failed.
+    """
+    def __init__(self, message, failed=True):
+        super(TaskError, self).__init__(message)
+        self.failed = failed
+
+class ItemResult(object):
+    """
+    Result of checking one item: its printed output, the number of
+    violations and the names of the rules with errors.
+    Output of a task which belongs to no item has no name.
+    """
+    def __init__(self, library, name, output, violations=0, failed_rules=None):
+        self.library = library
+        self.name = name
+        self.output = output
+        self.violations = violations
+        self.failed_rules = failed_rules or []
+
+class TaskResult(object):
+    """
+    Results of all items of a task, the number of failed items
+    and the time it took to check them
+    """
+    def __init__(self, task, results, failed, seconds):
+        self.task = task
+        self.results = results
+        self.failed = failed
+        self.seconds = seconds
+
+class ItemSource(object):
+    """
+    Base class of the item sources. A task is a file, which holds one or more items.
+    """
+
+    # kind of items, used in the output ('symbol', 'footprint')
+    kind = 'item'
+
+    def libraryName(self, task):
+        return os.path.splitext(os.path.basename(task))[0]
+
+    def load(self, task):
+        """
+        Load a task, returns (container, list of items).
+        The container is passed to finish(). Raises TaskError if the task can't be loaded.
+        """
+        raise NotImplementedError('The load method must be implemented')
+
+    def itemName(self, item):
+        return item.name
+
+    def createRule(self, rule, item):
+        """
+        Create a rule instance for an item
+        """
+        return rule(item)
+
+    def finish(self, task, container, items, violations):
+        """
+        Called after all items of a task are checked (e.g. to save fixed items)
+        """
+        pass
+
+    def cacheable(self):
+        """
+        True if results only depend on the task files (e.g. not when fixing)
+        """
+        return True
+
+    def cacheKey(self):
+        """
+        Options of the source which change the results
+        """
+        return ()
+
+    def taskSize(self, task):
+        """
+        Size of the files of a task in bytes, used to balance shards
+        """
+        return sum(os.path.getsize(f) for f in sourceFiles(task) if os.path.isfile(f))
+
+class OutputSink(object):
+    """
+    Base class of the output sinks
+    """
+    def report(self, result):
+        """
+        Called for every ItemResult
+        """
+        pass
+
+    def reportTask(self, task_result):
+        """
+        Called for every TaskResult, after its items are reported
+        """
+        pass
+
+    def finish(self):
+        pass
+
+class ConsoleSink(OutputSink):
+    """
+    Prints the output of every result
+    """
+    def report(self, result):
+        sys.stdout.write(result.output)
+
+    def finish(self):
+        sys.stdout.flush()
+
+class LogSink(OutputSink):
+    """
+    Logs the rules with errors of every item to a JSON file (see logError)
+    """
+    def __init__(self, log_file):
+        self.log_file = log_file
+
+    def report(self, result):
+        for rule_name in result.failed_rules:
+            logError(self.log_file, rule_name, result.library, result.name)
+
+class ReportSink(OutputSink):
+    """
+    Writes a JSON report of a (sharded) run: the totals, the errors (in the
+    format of logError) and the timing of every task. The reports of all
+    shards are combined by merge_results.py.
+    """
+    def __init__(self, report_file, kind, shard=None):
+        self.report_file = report_file
+        self.data = {
+            'kind': kind,
+            'shard': list(shard) if shard else None,
+            'tasks': 0,
+            'items': 0,
+            'failed': 0,
+            'violations': 0,
+            'errors': {},
+            'timings': {},
+            }
+
+    def report(self, result):
+        if result.name is None:
+            return
+
+        self.data['items'] += 1
+        self.data['violations'] += result.violations
+
+        for rule_name in result.failed_rules:
+            self.data['errors'].setdefault(rule_name, []).append({'library': result.library, 'item': result.name})
+
+    def reportTask(self, task_result):
+        self.data['tasks'] += 1
+        self.data['failed'] += task_result.failed
+        self.data['timings'][taskKey(task_result.task)] = round(task_result.seconds, 4)
+
+    def finish(self):
+        with open(self.report_file, 'w') as f:
+            f.write(json.dumps(self.data, indent=4, sort_keys=True, separators=(',', ':')))
+
+def taskKey(task):
+    """
+    Name of a task in reports and timings, the path as given (normalized)
+    """
+    return os.path.normpath(task).replace(os.sep, '/')
+
+def parseShard(text):
+    """
+    Parse a shard argument 'K/N' (shard K of N, counted from 1), returns (K, N)
+    """
+    try:
+        shard, count = [int(n) for n in text.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard must be given as K/N, e.g. 2/4: '{s}'".format(s=text))
+
+    if count < 1 or shard < 1 or shard > count:
+        raise argparse.ArgumentTypeError("shard K/N needs 1 <= K <= N: '{s}'".format(s=text))
+
+    return shard, count
+
+def loadTimings(filename):
+    """
+    Map of { task : seconds } of a report (see ReportSink)
+    """
+    with open(filename, 'r') as f:
+        return json.loads(f.read()).get('timings', {})
+
+def shardTasks(tasks, shard, count, weights):
+    """
+    Tasks of shard (1 .. count). Every task is assigned to the shard with the
+    lowest total weight so far, the heaviest tasks first, so all shards
+    need about the same time. The partition only depends on the tasks and
+    their weights, the tasks of a shard keep their order.
+    """
+    order = sorted(range(len(tasks)), key=lambda i: (-weights[i], taskKey(tasks[i]), i))
+
+    totals = [0] * count
+    selected = set()
+    for i in order:
+        lightest = totals.index(min(totals))
+        totals[lightest] += weights[i]
+        if lightest == shard - 1:
+            selected.add(i)
+
+    return [task for i, task in enumerate(tasks) if i in selected]
+
+def capture(function, *args):
+    """
+    Call a function, returns (result, printed output)
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        value = function(*args)
+    return value, output.getvalue()
+
+def codeHash(rules):
+    """
+    Hash of the checker code: the rules package, its checker directory and common
+    """
+    rules_dir = os.path.dirname(os.path.abspath(sys.modules[rules[0].__module__].__file__)) if rules else ''
+    directories = [rules_dir, os.path.dirname(rules_dir), os.path.dirname(os.path.abspath(__file__))]
+
+    files = []
+    for directory in directories:
+        if os.path.isdir(directory):
+            files += sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.py'))
+
+    return sourceHash(files)
+
+# Engine of the current (worker) process
+_engine = None
+
+def _initWorker(engine):
+    global _engine
+    _engine = engine
+
+def _runTask(task):
+    return _engine.runCachedTask(task)
+
+class KLCEngine(object):
+    """
+    Checks the items of an item source against a list of rule classes.
+    """
+
+    def __init__(self, source, rules, printer, verbosity=0, nowarnings=False, silent=False,
+                 fix=False, fixmore=False, cache=True):
+        self.source = source
+        self.rules = rules
+        self.printer = printer
+        self.verbosity = verbosity
+        self.nowarnings = nowarnings
+        self.silent = silent
+        self.fix = fix or fixmore
+        self.fixmore = fixmore
+        self.cache = cache
+        self.sinks = [ConsoleSink()]
+
+        # Map of { files : (stat, hash) }, all footprints of a pack share the pack file
+        self._hashes = {}
+
+    def __getstate__(self):
+        # the sinks are only used by the main process
+        state = self.__dict__.copy()
+        state['sinks'] = []
+        return state
+
+    def addSink(self, sink):
+        self.sinks.append(sink)
+
+    def _checkItem(self, item, library):
+        printer = self.printer
+        verbosity = self.verbosity
+        kind = self.source.kind
+        name = self.source.itemName(item)
+
+        n_violations = 0
+        failed_rules = []
+
+        first = True
+
+        for rule in self.rules:
+            rule = self.source.createRule(rule, item)
+
+            if verbosity > 2:
+                printer.white("Checking rule " + rule.name)
+
+            rule.check()
+
+            if self.nowarnings and not rule.hasErrors():
+                continue
+
+            if rule.hasOutput():
+                if first:
+                    printer.green("Checking {kind} '{name}':".format(kind=kind, name=name))
+                    first = False
+
+                printer.yellow("Violating " + rule.name, indentation=2)
+                rule.processOutput(printer, verbosity, self.silent)
+
+            if self.fixmore and getattr(rule, 'needsFixMore', False):
+                if rule.hasErrors():
+                    n_violations += rule.errorCount
+                if rule.hasWarnings:
+                    n_violations += rule.warningCount()
+                rule.fixmore()
+                rule.fix()
+                # Derived data of the item is outdated after fixing
+                rule.analysis.invalidate()
+                rule.processOutput(printer, verbosity, self.silent)
+            elif rule.hasErrors():
+                n_violations += rule.errorCount
+                if self.fixmore and rule.hasWarnings:
+                    n_violations += rule.warningCount()
+
+                failed_rules.append(rule.name)
+
+                if self.fix:
+                    rule.fix()
+                    # Derived data of the item is outdated after fixing
+                    rule.analysis.invalidate()
+                    rule.processOutput(printer, verbosity, self.silent)
+                    rule.recheck()
+
+        # No messages?
+        if first:
+            if not self.silent:
+                printer.green("Checking {kind} '{name}' - No errors".format(kind=kind, name=name))
+
+        return n_violations, failed_rules
+
+    def checkItem(self, item, library):
+        """
+        Check a single item against the rules, returns an ItemResult
+        """
+        (violations, failed_rules), output = capture(self._checkItem, item, library)
+        return ItemResult(library, self.source.itemName(item), output, violations, failed_rules)
+
+    def runTask(self, task):
+        """
+        Check all items of a task.
+        Returns a TaskResult, nothing is reported to the sinks.
+        """
+        library = self.source.libraryName(task)
+        results = []
+        start = time.time()
+
+        try:
+            (container, items), output = capture(self.source.load, task)
+        except TaskError as e:
+            _, output = capture(self.printer.red, str(e))
+            return TaskResult(task, [ItemResult(library, None, output)], 1 if e.failed else 0, time.time() - start)
+
+        results.append(ItemResult(library, None, output))
+
+        n_failed = 0
+        n_violations = 0
+
+        for item in items:
+            result = self.checkItem(item, library)
+            results.append(result)
+
+            if result.violations > 0:
+                n_failed += 1
+            n_violations += result.violations
+
+        _, output = capture(self.source.finish, task, container, items, n_violations)
+        results.append(ItemResult(library, None, output))
+
+        return TaskResult(task, results, n_failed, time.time() - start)
+
+    def _cacheFile(self, task):
+        directory = cacheDir()
+        if not self.cache or self.fix or not directory or not self.source.cacheable():
+            return None
+
+        if not hasattr(self, '_cache_key'):
+            self._cache_key = repr((RESULT_CACHE_VERSION, sys.version_info[:2], codeHash(self.rules),
+                                    [rule.__module__ for rule in self.rules], self.verbosity, self.nowarnings,
+                                    self.silent, self.printer._use_color, self.source.cacheKey()))
+
+        key = repr((os.path.abspath(task), self._cache_key))
+        return os.path.join(directory, 'klc', hashlib.md5(key.encode('utf-8')).hexdigest() + '.pickle'), key
+
+    def _sourceHash(self, task):
+        files = tuple(sourceFiles(os.path.abspath(task)))
+        stat = sourceStat(files)
+        if not files in self._hashes or self._hashes[files][0] != stat:
+            self._hashes[files] = (stat, sourceHash(files))
+        return self._hashes[files][1]
+
+    def runCachedTask(self, task):
+        """
+        runTask, using the result cache if possible
+        """
+        cache = self._cacheFile(task)
+        if cache is None:
+            return self.runTask(task)
+
+        cache_file, key = cache
+        md5 = self._sourceHash(task)
+
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['key'] == key and cached['hash'] == md5:
+                return cached['result']
+        except Exception:
+            pass
+
+        result = self.runTask(task)
+
+        # Write to a temporary file first, so other processes never read a partial cache
+        try:
+            if not os.path.isdir(os.path.dirname(cache_file)):
+                os.makedirs(os.path.dirname(cache_file))
+            temp_file = '{f}.{pid}'.format(f=cache_file, pid=os.getpid())
+            with open(temp_file, 'wb') as f:
+                pickle.dump({'key': key, 'hash': md5, 'result': result}, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except Exception:
+            pass
+
+        return result
+
+    def report(self, results):
+        """
+        Pass results to the output sinks
+        """
+        for result in results:
+            for sink in self.sinks:
+                sink.report(result)
+
+    def shardTasks(self, tasks, shard, timings=None):
+        """
+        Tasks of a shard (K, N), balanced by the timings (map of { task : seconds })
+        of a previous run if given, otherwise by the size of the files.
+        Tasks without timing are estimated from their size.
+        """
+        sizes = [self.source.taskSize(task) for task in tasks]
+        timings = timings or {}
+
+        known = [(timings[taskKey(task)], size) for task, size in zip(tasks, sizes) if taskKey(task) in timings]
+
+        if known:
+            # seconds per byte of the tasks with timing
+            rate = sum(t for t, size in known) / max(sum(size for t, size in known), 1)
+            weights = [timings.get(taskKey(task), size * rate) for task, size in zip(tasks, sizes)]
+        else:
+            weights = sizes
+
+        return shardTasks(tasks, shard[0], shard[1], weights)
+
+    def checkTasks(self, tasks, jobs=1):
+        """
+        Check the items of all tasks and report the results in order.
+        Returns the number of failed items.
+        """
+        pool = None
+        if jobs > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(jobs, _initWorker, (self,))
+            task_results = pool.imap(_runTask, tasks)
+        else:
+            task_results = map(self.runCachedTask, tasks)
+
+        n_failed = 0
+
+        for task_result in task_results:
+            self.report(task_result.results)
+            for sink in self.sinks:
+                sink.reportTask(task_result)
+            n_failed += task_result.failed
+
+        if pool:
+            pool.close()
+            pool.join()
+
+        for sink in self.sinks:
+            sink.finish()
+
+        return n_failed
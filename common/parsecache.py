@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Cache of parsed library files.
+
+load_cached(path) returns the parsed SchLib (.lib) or KicadMod (.kicad_mod)
+of a file. The parsed object is pickled into a cache directory together
+with the hash of the source file(s), and loaded from there as long as the
+sources did not change. The cache is ignored (and rewritten) if it was
+written by another cache or parser version (the parser module and the
+modules it imports), or can't be read at all.
+
+The cache directory is ~/.cache/kicad-library-utils, it can be changed with
+the environment variable KICAD_LIBRARY_CACHE (an empty value disables it).
+
+"""
+
+import os
+import sys
+import ast
+import hashlib
+import importlib.util
+import pickle
+import gc
+
+# Increment when the cache layout changes
+CACHE_VERSION = 1
+
+def cacheDir():
+    default = os.path.join(os.path.expanduser('~'), '.cache', 'kicad-library-utils')
+    return os.environ.get('KICAD_LIBRARY_CACHE', default)
+
+def sourceFiles(path):
+    """
+    Files the parsed object depends on (a symbol library includes its .dcm file,
+    a footprint in a pack depends on the pack file)
+    """
+    if os.path.isfile(os.path.dirname(path)):
+        return [os.path.dirname(path)]
+    files = [path]
+    if path.endswith('.lib'):
+        files.append(path[:-4] + '.dcm')
+    return files
+
+def sourceStat(files):
+    stat = []
+    for f in files:
+        try:
+            s = os.stat(f)
+            stat.append((s.st_mtime, s.st_size))
+        except OSError:
+            stat.append(None)
+    return stat
+
+def sourceHash(files):
+    md5 = hashlib.md5()
+    for f in files:
+        if os.path.isfile(f):
+            with open(f, 'rb') as data:
+                md5.update(data.read())
+        md5.update(b'\0')
+    return md5.hexdigest()
+
+def parserFor(path):
+    """
+    Parser class and its module file for a library file
+    """
+    if path.endswith('.lib'):
+        from schlib import SchLib
+        return SchLib, sys.modules[SchLib.__module__].__file__
+    if path.endswith('.kicad_mod'):
+        from kicad_mod import KicadMod
+        return KicadMod, sys.modules[KicadMod.__module__].__file__
+    raise ValueError("No parser for '{f}'".format(f=path))
+
+# Root of the repository, only modules below it are hashed with the parser
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parserFiles(filename):
+    """
+    Sorted list of the parser module file and the files of all modules of the
+    repository it imports (recursively, e.g. sexpr.py and geometry.py of kicad_mod.py)
+    """
+    files = set()
+    todo = [os.path.abspath(filename)]
+
+    while todo:
+        f = todo.pop()
+        if f in files:
+            continue
+        files.add(f)
+
+        with open(f, 'rb') as source:
+            tree = ast.parse(source.read(), f)
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+
+            for name in names:
+                try:
+                    spec = importlib.util.find_spec(name)
+                except (ImportError, ValueError):
+                    continue
+                if spec and spec.origin and spec.origin.endswith('.py') and os.path.abspath(spec.origin).startswith(_root + os.sep):
+                    todo.append(os.path.abspath(spec.origin))
+
+    return sorted(files)
+
+_parser_hashes = {}
+
+def parserHash(filename):
+    """
+    Hash of the parser source and the modules it imports,
+    so changes to the parser invalidate the cache
+    """
+    if not filename in _parser_hashes:
+        _parser_hashes[filename] = sourceHash(parserFiles(filename))
+    return _parser_hashes[filename]
+
+def unpickle(f):
+    """
+    Load a pickled object. The garbage collector is paused meanwhile,
+    it would otherwise run many times while the objects are created.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.load(f)
+    finally:
+        if enabled:
+            gc.enable()
+
+def load_cached(path, **kwargs):
+    """
+    Parse a library file, using the cache if possible.
+    Keyword arguments are passed to the parser (e.g. keep_sexpr of KicadMod).
+    """
+    parser, parser_file = parserFor(path)
+
+    directory = cacheDir()
+    if not directory:
+        return parser(path, **kwargs)
+
+    path = os.path.abspath(path)
+    files = sourceFiles(path)
+
+    key = repr((path, sorted(kwargs.items())))
+    cache_file = os.path.join(directory, hashlib.md5(key.encode('utf-8')).hexdigest() + '.pickle')
+
+    version = (CACHE_VERSION, sys.version_info[:2], parserHash(parser_file))
+    stat = sourceStat(files)
+    md5 = None
+
+    # Cached object, if the header matches the current sources
+    try:
+        with open(cache_file, 'rb') as f:
+            header = pickle.load(f)
+            if header['version'] == version and header['key'] == key:
+                if header['stat'] != stat:
+                    md5 = sourceHash(files)
+                if md5 is None or header['hash'] == md5:
+                    return unpickle(f)
+    except Exception:
+        pass
+
+    item = parser(path, **kwargs)
+
+    # Write to a temporary file first, so other processes never read a partial cache
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        header = {'version': version, 'key': key, 'stat': stat, 'hash': md5 or sourceHash(files)}
+        temp_file = '{f}.{pid}'.format(f=cache_file, pid=os.getpid())
+        with open(temp_file, 'wb') as f:
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, cache_file)
+    except Exception:
+        pass
+
+    return item
@@ -3,7 +3,7 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
-import sys, platform
+import sys
 
 class PrintColor(object):
     """
@@ -35,7 +35,7 @@ class PrintColor(object):
         self._max_width = max_width
         self._indentation = indentation
 
-        if platform.system() == 'Windows':
+        if sys.platform == 'win32':
             try:
                 import colorama
                 colorama.init()
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import inspect, os, sys
+import importlib, os, sys
 import json
 
 def logError(log_file, rule_name, lib_name, item_name, warning=False):
@@ -66,11 +66,12 @@ def isValidName(name, checkForGraphicSymbol=False, checkForPowerSymbol=False):
 
         return True
 
-def checkLineEndings(filename):
+def checkLineEndings(filename, opener=open):
     """
     Check for proper (Unix) line endings
+    The file is opened with opener(filename, 'rb')
     """
-    filecontentsraw = open(filename, 'rb').readline()
+    filecontentsraw = opener(filename, 'rb').readline()
 
     LE1 = ord(chr(filecontentsraw[-2]))
     LE2 = ord(chr(filecontentsraw[-1]))
@@ -83,6 +84,43 @@ def checkLineEndings(filename):
 
     return True
 
+class AnalysisContext(object):
+    """
+    Memoizes data derived from a library item (symbol or footprint),
+    shared by all rules which check that item.
+
+    Values are computed on first use and kept until invalidate() is called,
+    which the checkers do whenever a rule has fixed (modified) the item.
+    Use attach() to get the context of an item, it is created on first use.
+    """
+
+    def __init__(self, item):
+        self.item = item
+        self.cache = {}
+
+    @classmethod
+    def attach(cls, item):
+        context = getattr(item, 'analysis', None)
+        if context is None:
+            context = cls(item)
+            item.analysis = context
+        return context
+
+    def get(self, key, compute, *args):
+        """
+        Return the cached value for key (and args), calling compute(*args) on first use
+        """
+        if args:
+            key = (key,) + args
+
+        if not key in self.cache:
+            self.cache[key] = compute(*args)
+
+        return self.cache[key]
+
+    def invalidate(self):
+        self.cache = {}
+
 class Verbosity:
     NONE=0
     NORMAL=1
@@ -94,6 +132,45 @@ class Severity:
     ERROR=2
     SUCCESS=3
 
+class RuleRegistry(object):
+    """
+    The rules of a rules package (e.g. schlib/rules), by name.
+    Rule modules are only imported when their rules are selected.
+    """
+
+    def __init__(self, package, modules):
+        # module names as listed in the __all__ of the package, e.g. S4_1
+        self.package = package
+        self.modules = modules
+
+    def names(self):
+        """
+        All rule names, e.g. S4.1
+        """
+        return [module.replace('_', '.') for module in self.modules]
+
+    def select(self, selected=None, excluded=None):
+        """
+        Rule classes of the selected rule names (default = all rules),
+        without the excluded rule names
+        """
+        rules = []
+
+        for module, name in zip(self.modules, self.names()):
+            if selected is not None and name not in selected:
+                continue
+            if excluded is not None and name in excluded:
+                continue
+            rules.append(self.load(module))
+
+        return rules
+
+    def load(self, module):
+        """
+        Rule class of a rule module
+        """
+        return importlib.import_module(self.package + '.' + module).Rule
+
 class KLCRuleBase(object):
     """
     A base class to represent a KLC rule
@@ -103,10 +180,8 @@ class KLCRuleBase(object):
 
     @property
     def name(self):
-        path = inspect.getfile(self.__class__)
-        path = os.path.basename(path)
-        path = "".join(path.split(".")[:-1])
-        return path.replace('_', '.')
+        # the rule name is the name of its module, e.g. rules.S4_1 -> S4.1
+        return self.__class__.__module__.split('.')[-1].replace('_', '.')
 
     def __init__(self, description):
         self.description = description
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Similarity search over sets of features (MinHash and locality sensitive hashing).
+
+Every item (e.g. a symbol or a footprint) is described by a set of
+features. The MinHash signature of a set estimates the Jaccard similarity
+of two sets. The signatures are cut into bands, items with an equal band
+are candidates, so similar items are found without comparing all pairs.
+Candidates are verified with the exact Jaccard similarity.
+
+All items of a band are paired with each other, unless the band holds more
+than BAND_LIMIT items. The items of such a band (sorted by key) are only
+paired with the next BAND_LIMIT - 1 items, so a large group of similar items
+costs linear instead of quadratic time. Pairs of these bands may be missed,
+their number is reported by findClusters.
+
+findClusters and printClusters hold the common part of the tools looking
+for identical and similar items (schlib/find_similar.py, pcb/find_similar.py),
+the tools only provide a loader for their items and a name formatter.
+
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import multiprocessing
+import random
+
+# Number of MinHash values per signature and number of values per band
+SIGNATURE_SIZE = 32
+BAND_ROWS = 4
+
+# Maximum number of items of a band which are all paired with each other
+BAND_LIMIT = 200
+
+# Hash permutations (XOR masks), seeded so that signatures are reproducible
+_MASKS = [random.Random(SIGNATURE_SIZE * 1000 + i).getrandbits(64) for i in range(SIGNATURE_SIZE)]
+
+def featureSet(features):
+    """
+    Set of 64 bit hashes of a list of features (any value with a stable repr).
+    Repeated features are counted, so [a, a] and [a] are different sets.
+    """
+    counts = {}
+    hashes = set()
+    for feature in features:
+        key = repr(feature)
+        n = counts.get(key, 0)
+        counts[key] = n + 1
+        hashes.add(int(hashlib.md5('{k}#{n}'.format(k=key, n=n).encode('utf-8')).hexdigest()[:16], 16))
+    return frozenset(hashes)
+
+def signature(hashes):
+    """
+    MinHash signature of a set of feature hashes (None for an empty set)
+    """
+    if not hashes:
+        return None
+    return tuple(min([h ^ mask for h in hashes]) for mask in _MASKS)
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / float(len(a | b))
+
+def candidatePairs(signatures):
+    """
+    Set of (key, key) pairs whose signatures share at least one band.
+    signatures is a map of { key : signature }, keys must be sortable.
+    Returns (pairs, number of bands with more than BAND_LIMIT items).
+    """
+    buckets = {}
+    for key, sig in signatures.items():
+        if sig is None:
+            continue
+        for band in range(0, SIGNATURE_SIZE, BAND_ROWS):
+            buckets.setdefault((band, sig[band:band + BAND_ROWS]), []).append(key)
+
+    pairs = set()
+    capped = 0
+    for keys in buckets.values():
+        if len(keys) < 2:
+            continue
+        if len(keys) > BAND_LIMIT:
+            capped += 1
+        keys = sorted(keys)
+        for i, a in enumerate(keys):
+            for b in keys[i+1:i+BAND_LIMIT]:
+                pairs.add((a, b))
+
+    return pairs, capped
+
+def similarPairs(feature_sets, threshold, signatures=None):
+    """
+    Sorted list of (key, key, similarity) of all pairs with a similarity of at least threshold.
+    feature_sets is a map of { key : featureSet }, the signatures are computed if not given.
+    Returns (pairs, number of capped bands, see candidatePairs).
+    """
+    if signatures is None:
+        signatures = dict((key, signature(hashes)) for key, hashes in feature_sets.items())
+
+    candidates, capped = candidatePairs(signatures)
+
+    pairs = []
+    for a, b in candidates:
+        similarity = jaccard(feature_sets[a], feature_sets[b])
+        if similarity >= threshold:
+            pairs.append((a, b, similarity))
+
+    return sorted(pairs), capped
+
+def groupPairs(pairs):
+    """
+    Group the keys of (key, key, ...) pairs into clusters of connected keys.
+    Returns a sorted list of sorted lists.
+    """
+    parent = {}
+
+    def root(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for pair in pairs:
+        a, b = root(pair[0]), root(pair[1])
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    clusters = {}
+    for key in parent:
+        clusters.setdefault(root(key), []).append(key)
+
+    return sorted(sorted(cluster) for cluster in clusters.values())
+
+def findClusters(tasks, loader, threshold, jobs, chunksize=1):
+    """
+    Find identical and similar items, the tasks are loaded in a process pool if jobs > 1.
+    loader(task) returns (items, errors): items is a list of (item, content hash,
+    feature set, signature) where item is a sortable key (e.g. (library, name)),
+    errors is a list of (name, error) of items which could not be loaded.
+    Returns (identical, similar, errors, capped):
+    identical is a list of clusters of items,
+    similar is a list of (similarity, cluster) where every cluster member is a list of identical items,
+    errors is the list of all load errors,
+    capped is the number of bands which were not fully compared (see BAND_LIMIT).
+    """
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap(loader, tasks, chunksize=chunksize)
+    else:
+        results = map(loader, tasks)
+
+    # global map of { content hash : [item] }
+    hashes = {}
+    feature_sets = {}
+    signatures = {}
+    errors = []
+
+    for items, task_errors in results:
+        errors += task_errors
+        for item, content_hash, features, sig in items:
+            if not content_hash in hashes:
+                hashes[content_hash] = []
+                feature_sets[content_hash] = features
+                signatures[content_hash] = sig
+            hashes[content_hash].append(item)
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    identical = sorted(sorted(items) for items in hashes.values() if len(items) > 1)
+
+    similar = []
+    capped = 0
+    if threshold < 1.0:
+        # compare one item per hash, identical items are merged afterwards
+        pairs, capped = similarPairs(feature_sets, threshold, signatures)
+
+        clusters = groupPairs(pairs)
+
+        # lowest similarity within each cluster
+        index = {}
+        for i, cluster in enumerate(clusters):
+            for h in cluster:
+                index[h] = i
+        lowest = [1.0] * len(clusters)
+        for a, b, s in pairs:
+            lowest[index[a]] = min(lowest[index[a]], s)
+
+        for i, cluster in enumerate(clusters):
+            similar.append((lowest[i], sorted(sorted(hashes[h]) for h in cluster)))
+
+        similar.sort(key=lambda s: (-s[0], s[1]))
+
+    return identical, similar, errors, capped
+
+def printClusters(printer, identical, similar, errors, capped, name, kind, as_json=False, silent=False):
+    """
+    Print the results of findClusters, as text or as JSON.
+    name(item) formats an item, kind is the kind of items ('symbol', 'footprint').
+    """
+    for item, error in errors:
+        printer.red("Could not parse '{i}': {e}".format(i=item, e=error))
+
+    if as_json:
+        output = {
+            'identical': [[name(item) for item in cluster] for cluster in identical],
+            'similar': [{'similarity': round(s, 3), kind + 's': [[name(item) for item in member] for member in cluster]}
+                        for s, cluster in similar],
+            'capped': capped,
+            }
+        print(json.dumps(output, indent=4))
+    else:
+        if not silent:
+            for cluster in identical:
+                printer.yellow("Identical {k}s:".format(k=kind))
+                for item in cluster:
+                    print("  " + name(item))
+
+            for s, cluster in similar:
+                printer.yellow("Similar {k}s (similarity {s:.2f}):".format(k=kind, s=s))
+                for member in cluster:
+                    print("  " + " = ".join(name(item) for item in member))
+
+        if capped:
+            printer.yellow("{n} groups of more than {m} candidate {k}s were not fully compared, some similar {k}s may be missing".format(
+                n=capped, m=BAND_LIMIT, k=kind))
+
+        printer.green("{i} clusters of identical {k}s, {s} clusters of similar {k}s".format(i=len(identical), s=len(similar), k=kind))
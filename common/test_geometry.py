@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of the indexed / sorted algorithms of geometry.py against
+brute force implementations. Run with pytest.
+"""
+
+import math
+import random
+
+from geometry import boxOfPoints, boxesOverlap, arcBoundingBox, GridIndex
+from geometry import collinearOverlaps, arcOverlaps, buildContours, TOLERANCE
+
+def sampledArcBoundingBox(cx, cy, x, y, angle, steps=3600):
+    """
+    Bounding box of an arc sampled in small steps
+    """
+    points = []
+    for i in range(steps + 1):
+        a = math.radians(angle * i / steps)
+        points.append((cx + (x - cx) * math.cos(a) - (y - cy) * math.sin(a),
+                       cy + (x - cx) * math.sin(a) + (y - cy) * math.cos(a)))
+    return boxOfPoints(points)
+
+def randomBox(rng, size):
+    x = rng.uniform(-20, 20)
+    y = rng.uniform(-20, 20)
+    return (x, y, x + rng.uniform(0, size), y + rng.uniform(0, size))
+
+def test_arc_bounding_box():
+    rng = random.Random(0)
+
+    for i in range(200):
+        arc = (rng.uniform(-10, 10), rng.uniform(-10, 10),
+               rng.uniform(-10, 10), rng.uniform(-10, 10),
+               rng.choice([90, -90, 180, 360, -360, rng.uniform(-400, 400), rng.uniform(-1, 1)]))
+
+        exact = arcBoundingBox(*arc)
+        sampled = sampledArcBoundingBox(*arc)
+
+        assert max(abs(a - b) for a, b in zip(exact, sampled)) < 1e-3, arc
+
+def test_grid_index():
+    rng = random.Random(1)
+
+    boxes = [randomBox(rng, 3) for i in range(300)]
+    index = GridIndex(boxes)
+
+    # small queries use the cells of the box, large ones scan all cells
+    for size in [0, 1, 5, 100]:
+        for i in range(100):
+            query = randomBox(rng, size)
+            assert index.query(query) == [j for j, box in enumerate(boxes) if boxesOverlap(box, query)]
+
+def pairwiseCollinearOverlaps(segments):
+    """
+    Segments (with integer coordinates) which overlap another collinear segment
+    """
+    overlaps = set()
+
+    for i, (a1, a2) in enumerate(segments):
+        dx, dy = a2[0] - a1[0], a2[1] - a1[1]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            continue
+
+        for j, (b1, b2) in enumerate(segments):
+            if i == j or b1 == b2:
+                continue
+
+            # both ends of b on the line of a
+            if any(dx * (p[1] - a1[1]) - dy * (p[0] - a1[0]) != 0 for p in [b1, b2]):
+                continue
+
+            # overlap of the intervals along the line
+            t = [((p[0] - a1[0]) * dx + (p[1] - a1[1]) * dy) / length for p in [b1, b2]]
+            if min(length, max(t)) - max(0, min(t)) > TOLERANCE:
+                overlaps.add(i)
+
+    return sorted(overlaps)
+
+def test_collinear_overlaps():
+    rng = random.Random(2)
+
+    for n in [2, 5, 20, 60]:
+        for i in range(50):
+            # few distinct lines, so that many segments are collinear
+            segments = []
+            for j in range(n):
+                p1 = (rng.randint(0, 4), rng.randint(0, 4))
+                p2 = (rng.randint(0, 4), rng.randint(0, 4))
+                segments.append((p1, p2))
+
+            assert collinearOverlaps(segments) == pairwiseCollinearOverlaps(segments), segments
+
+def pairwiseArcOverlaps(arcs):
+    """
+    Arcs (angles in multiples of 30 degrees) which overlap another arc of the same circle
+    """
+    def steps(arc):
+        start, sweep = arc[3], arc[4]
+        if sweep < 0:
+            start, sweep = start + sweep, -sweep
+        return set(((start + 30 * k) % 360) for k in range(min(sweep, 360) // 30))
+
+    overlaps = set()
+
+    for i, a in enumerate(arcs):
+        for j, b in enumerate(arcs):
+            if i != j and a[:3] == b[:3] and a[2] > 0 and steps(a) & steps(b):
+                overlaps.add(i)
+
+    return sorted(overlaps)
+
+def test_arc_overlaps():
+    rng = random.Random(3)
+
+    for n in [2, 5, 20, 60]:
+        for i in range(50):
+            arcs = []
+            for j in range(n):
+                arcs.append((rng.randint(0, 2), rng.randint(0, 2), rng.randint(0, 2),
+                             30 * rng.randint(-12, 12), 30 * rng.choice([-13, -6, -1, 1, 2, 5, 12, 13])))
+
+            assert arcOverlaps(arcs) == pairwiseArcOverlaps(arcs), arcs
+
+def test_contour_tolerances():
+    # square with a gap of 0.003 at (1, 0)
+    square = [((0, 0), (1, 0)), ((1, 0.003), (1, 1)), ((1, 1), (0, 1)), ((0, 1), (0, 0))]
+
+    assert buildContours(square).open_ends == [(0, (1, 0)), (1, (1, 0.003))]
+    assert buildContours(square, 0.01).closed
+
+    # the gap is only closed if one of the two items has the larger tolerance
+    assert not buildContours(square, 0.01, [0, 0, 0.01, 0.01]).closed
+    assert buildContours(square, 0.01, [0, 0.01, 0, 0]).closed
+    assert len(buildContours(square, 0.01, [0.01, 0, 0, 0]).loops) == 1
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of the sharding and the result cache of klcengine.py. Run with pytest.
+"""
+
+import argparse
+import random
+
+import pytest
+
+from klcengine import parseShard, shardTasks, taskKey, ItemSource, KLCEngine
+from print_color import PrintColor
+from rulebase import KLCRuleBase
+
+def test_parse_shard():
+    assert parseShard('1/1') == (1, 1)
+    assert parseShard('3/4') == (3, 4)
+
+    for text in ['', '1', '1/2/3', 'a/b', '0/2', '3/2', '1/0', '-1/2']:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parseShard(text)
+
+def randomTasks(rng, n):
+    tasks = ['lib/L{i}.lib'.format(i=i) for i in range(n)]
+    weights = [rng.choice([0, 1, 1, 5, rng.randint(1, 1000)]) for i in range(n)]
+    return tasks, weights
+
+def test_shard_partition():
+    rng = random.Random(0)
+
+    for n in [0, 1, 7, 100]:
+        for count in [1, 2, 3, 8]:
+            tasks, weights = randomTasks(rng, n)
+            shards = [shardTasks(tasks, k, count, weights) for k in range(1, count + 1)]
+
+            # every task in exactly one shard, in the order of the tasks
+            assert sorted(sum(shards, [])) == sorted(tasks)
+            for shard in shards:
+                assert shard == [task for task in tasks if task in shard]
+
+            # greedy assignment: no shard is heavier than the lightest one by more than the heaviest task
+            weight = dict(zip(tasks, weights))
+            totals = [sum(weight[task] for task in shard) for shard in shards]
+            assert max(totals) - min(totals) <= max(weights or [0])
+
+def test_shard_order():
+    rng = random.Random(1)
+
+    # the partition does not depend on the order of the tasks (e.g. of the command line)
+    tasks, weights = randomTasks(rng, 50)
+    shuffled = list(zip(tasks, weights))
+    rng.shuffle(shuffled)
+
+    for k in range(1, 5):
+        expected = shardTasks(tasks, k, 4, weights)
+        shard = shardTasks([t for t, w in shuffled], k, 4, [w for t, w in shuffled])
+        assert sorted(shard) == sorted(expected)
+
+def test_task_key():
+    assert taskKey('./lib//A.lib') == 'lib/A.lib'
+
+class LineSource(ItemSource):
+    """
+    Items are the lines of a text file, loads are counted
+    """
+    kind = 'line'
+
+    def __init__(self):
+        self.loads = 0
+        self.key = ()
+
+    def load(self, task):
+        self.loads += 1
+        with open(task, 'r') as f:
+            lines = f.read().splitlines()
+        return lines, lines
+
+    def itemName(self, item):
+        return item
+
+    def cacheKey(self):
+        return self.key
+
+class EmptyLineRule(KLCRuleBase):
+    def __init__(self, line):
+        super(EmptyLineRule, self).__init__('Lines are not empty')
+        self.line = line
+
+    def check(self):
+        if not self.line.strip():
+            self.error("Empty line")
+
+def checkTwice(engine, task):
+    """
+    Number of loads of two runs, and whether their results are the same
+    """
+    loads = engine.source.loads
+    first = engine.runCachedTask(task)
+    second = engine.runCachedTask(task)
+    same = [r.__dict__ for r in first.results] == [r.__dict__ for r in second.results] and first.failed == second.failed
+    return engine.source.loads - loads, same
+
+def test_result_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('KICAD_LIBRARY_CACHE', str(tmp_path / 'cache'))
+
+    task = str(tmp_path / 'items.txt')
+    with open(task, 'w') as f:
+        f.write('a\n\nb\n')
+
+    printer = PrintColor(use_color=False)
+    source = LineSource()
+    engine = KLCEngine(source, [EmptyLineRule], printer)
+
+    assert checkTwice(engine, task) == (1, True)
+    assert engine.runCachedTask(task).failed == 1
+
+    # a new engine with the same options uses the cache
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer), task) == (0, True)
+
+    # changed file
+    with open(task, 'w') as f:
+        f.write('a\n\n\nb\n')
+    assert checkTwice(engine, task) == (1, True)
+    assert engine.runCachedTask(task).failed == 2
+
+    # other options of the engine or the source
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer, verbosity=2), task) == (1, True)
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], PrintColor(use_color=True)), task) == (1, True)
+    assert checkTwice(KLCEngine(source, [], printer), task) == (1, True)
+    source.key = ('other',)
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer), task) == (1, True)
+
+def test_result_cache_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv('KICAD_LIBRARY_CACHE', str(tmp_path / 'cache'))
+
+    task = str(tmp_path / 'items.txt')
+    with open(task, 'w') as f:
+        f.write('a\n')
+
+    printer = PrintColor(use_color=False)
+    source = LineSource()
+
+    # fixing modifies the files, results are not cached
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer, fix=True), task) == (2, True)
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer, cache=False), task) == (2, True)
+
+    source.cacheable = lambda: False
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer), task) == (2, True)
+
+    monkeypatch.setenv('KICAD_LIBRARY_CACHE', '')
+    source = LineSource()
+    assert checkTwice(KLCEngine(source, [EmptyLineRule], printer), task) == (2, True)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of the invalidation of the parse cache (parsecache.py). Run with pytest.
+"""
+
+import os
+import sys
+
+import parsecache
+from parsecache import load_cached, parserFiles
+
+schlib = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'schlib'))
+
+if not schlib in sys.path:
+    sys.path.append(schlib)
+
+LIBRARY = """EESchema-LIBRARY Version 2.3
+#encoding utf-8
+#
+# R
+#
+DEF R R 0 0 N Y 1 F N
+F0 "R" 80 0 50 V V C CNN
+F1 "{value}" 0 0 50 V V C CNN
+F2 "" 0 0 50 H I C CNN
+F3 "" 0 0 50 H I C CNN
+DRAW
+S -40 -100 40 100 0 1 10 N
+X ~ 1 0 150 50 D 50 50 1 1 P
+X ~ 2 0 -150 50 U 50 50 1 1 P
+ENDDRAW
+ENDDEF
+#
+#End Library
+"""
+
+DOCUMENTATION = """EESchema-DOCLIB  Version 2.0
+#
+$CMP R
+D {description}
+K R res
+F ~
+$ENDCMP
+#
+#End Doc Library
+"""
+
+def write(filename, text):
+    with open(str(filename), 'w') as f:
+        f.write(text)
+
+def countingParser(monkeypatch):
+    """
+    Count the parses of load_cached, returns the list of parsed paths
+    """
+    parsed = []
+    parser_for = parsecache.parserFor
+
+    def parserFor(path):
+        parser, parser_file = parser_for(path)
+        def parse(path, **kwargs):
+            parsed.append(path)
+            return parser(path, **kwargs)
+        return parse, parser_file
+
+    monkeypatch.setattr(parsecache, 'parserFor', parserFor)
+    return parsed
+
+def test_load_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('KICAD_LIBRARY_CACHE', str(tmp_path / 'cache'))
+    parsed = countingParser(monkeypatch)
+
+    lib = str(tmp_path / 'Test.lib')
+    write(lib, LIBRARY.format(value='R'))
+    write(tmp_path / 'Test.dcm', DOCUMENTATION.format(description='Resistor'))
+
+    def load():
+        n = len(parsed)
+        library = load_cached(lib)
+        return len(parsed) - n, library.components[0].fields[1]['name'], library.documentation.components['R']['description']
+
+    assert load() == (1, '"R"', 'Resistor')
+    assert load() == (0, '"R"', 'Resistor')
+
+    # changed library, changed documentation
+    write(lib, LIBRARY.format(value='Res'))
+    assert load() == (1, '"Res"', 'Resistor')
+    write(tmp_path / 'Test.dcm', DOCUMENTATION.format(description='Resistor, small'))
+    assert load() == (1, '"Res"', 'Resistor, small')
+    assert load() == (0, '"Res"', 'Resistor, small')
+
+    # other parser version
+    monkeypatch.setattr(parsecache, 'parserHash', lambda filename: 'changed')
+    assert load() == (1, '"Res"', 'Resistor, small')
+    assert load() == (0, '"Res"', 'Resistor, small')
+
+    # touched, but not changed
+    os.utime(lib, (0, 0))
+    assert load() == (0, '"Res"', 'Resistor, small')
+
+    # no cache
+    monkeypatch.setenv('KICAD_LIBRARY_CACHE', '')
+    assert load() == (1, '"Res"', 'Resistor, small')
+    assert load() == (1, '"Res"', 'Resistor, small')
+
+def test_parser_files(tmp_path, monkeypatch):
+    # parser module which imports modules of the repository (recursively) and others
+    monkeypatch.setattr(parsecache, '_root', str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    write(tmp_path / 'parser_a.py', 'import os\nfrom parser_b import b\n')
+    write(tmp_path / 'parser_b.py', 'import sys, parser_c\nb = 1\n')
+    write(tmp_path / 'parser_c.py', 'import parser_a\n')
+    write(tmp_path / 'other.py', '')
+
+    files = parserFiles(str(tmp_path / 'parser_a.py'))
+    assert files == [str(tmp_path / name) for name in ['parser_a.py', 'parser_b.py', 'parser_c.py']]
+
+    # the repository parsers depend on the common modules
+    monkeypatch.undo()
+    kicad_mod = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pcb', 'kicad_mod.py')
+    names = [os.path.basename(f) for f in parserFiles(kicad_mod)]
+    assert 'kicad_mod.py' in names and 'sexpr.py' in names
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of the similarity search of similarity.py against comparing all
+pairs. Run with pytest.
+"""
+
+import itertools
+import random
+
+import similarity
+from similarity import featureSet, signature, jaccard, candidatePairs, similarPairs, groupPairs, SIGNATURE_SIZE
+
+def bandPairs(signatures):
+    """
+    All pairs of keys with an equal band, by comparing every pair
+    """
+    pairs = set()
+    for a, b in itertools.combinations(sorted(signatures), 2):
+        if signatures[a] is None or signatures[b] is None:
+            continue
+        bands = range(0, SIGNATURE_SIZE, similarity.BAND_ROWS)
+        if any(signatures[a][i:i + similarity.BAND_ROWS] == signatures[b][i:i + similarity.BAND_ROWS] for i in bands):
+            pairs.add((a, b))
+    return pairs
+
+def randomFeatureSets(rng, n):
+    """
+    Feature sets of n items, as variations of a few base items
+    """
+    bases = [[rng.randint(0, 1000) for i in range(rng.randint(1, 30))] for j in range(5)]
+
+    feature_sets = {}
+    for i in range(n):
+        features = list(rng.choice(bases))
+        for j in range(rng.randint(0, 4)):
+            features[rng.randrange(len(features))] = rng.randint(0, 1000)
+        feature_sets['K{i:03}'.format(i=i)] = featureSet(features)
+    feature_sets['Empty'] = featureSet([])
+    return feature_sets
+
+def test_candidate_pairs():
+    rng = random.Random(0)
+    feature_sets = randomFeatureSets(rng, 150)
+    signatures = dict((key, signature(hashes)) for key, hashes in feature_sets.items())
+
+    pairs, capped = candidatePairs(signatures)
+    assert pairs == bandPairs(signatures)
+    assert capped == 0
+
+    # all pairs above the threshold which share a band are found
+    found, capped = similarPairs(feature_sets, 0.5)
+    expected = sorted((a, b, jaccard(feature_sets[a], feature_sets[b])) for a, b in bandPairs(signatures))
+    assert found == [pair for pair in expected if pair[2] >= 0.5]
+
+def test_capped_bands(monkeypatch):
+    rng = random.Random(1)
+    feature_sets = randomFeatureSets(rng, 150)
+    signatures = dict((key, signature(hashes)) for key, hashes in feature_sets.items())
+
+    monkeypatch.setattr(similarity, 'BAND_LIMIT', 10)
+    pairs, capped = candidatePairs(signatures)
+
+    # large bands are reported, their pairs are a subset of all pairs
+    assert capped > 0
+    assert pairs < bandPairs(signatures)
+
+    # but all items of a band are still connected
+    assert len(groupPairs(pairs)) == len(groupPairs(bandPairs(signatures)))
+
+def test_feature_set():
+    # repeated features are counted
+    assert featureSet(['a', 'a']) != featureSet(['a'])
+    assert featureSet(['a', 'b']) == featureSet(['b', 'a'])
+    assert signature(featureSet([])) is None
+    assert jaccard(featureSet(['a', 'b']), featureSet(['a', 'c'])) == 1 / 3.0
+
+def test_group_pairs():
+    assert groupPairs([('c', 'd', 0.9), ('a', 'b', 0.8), ('b', 'e', 0.9)]) == [['a', 'b', 'e'], ['c', 'd']]
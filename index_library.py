@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This script indexes symbol libraries (.lib) and footprint libraries
+(.pretty folders) into a SQLite database, so the whole library can be
+queried without parsing it again. Tables:
+
+* files - indexed files with mtime, size and hash
+* symbols, aliases, fields, pins, fplist - from .lib / .dcm files
+* footprints, pads, models - from .kicad_mod files
+* documents, terms - inverted index of the names, descriptions and
+  keywords of symbols, aliases and footprints (see search_library.py)
+
+Files are parsed in parallel. Running the script again only re-parses
+files whose contents changed and removes files which no longer exist.
+
+Example query:
+    ./index_library.py -d lib.sqlite -q "SELECT library, name FROM footprints WHERE pad_count > 200"
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import os
+import re
+import hashlib
+import multiprocessing
+import sqlite3
+import time
+
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+for directory in ['schlib', 'pcb', 'common']:
+    path = os.path.abspath(os.path.join(sys.path[0], directory))
+    if not path in sys.path:
+        sys.path.append(path)
+
+from schlib import SchLib
+from kicad_mod import KicadMod
+
+# Increment when the tables change, the database is then rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE, kind TEXT,
+    mtime REAL, size INTEGER, hash TEXT, error TEXT);
+
+CREATE TABLE symbols (
+    id INTEGER PRIMARY KEY, file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
+    library TEXT, name TEXT, reference TEXT, value TEXT, footprint TEXT, datasheet TEXT,
+    description TEXT, keywords TEXT, unit_count INTEGER, units_locked INTEGER,
+    power INTEGER, pin_count INTEGER);
+
+CREATE TABLE aliases (
+    symbol_id INTEGER REFERENCES symbols(id) ON DELETE CASCADE,
+    name TEXT, description TEXT, keywords TEXT, datasheet TEXT);
+
+CREATE TABLE fields (
+    symbol_id INTEGER REFERENCES symbols(id) ON DELETE CASCADE,
+    number INTEGER, name TEXT, value TEXT, visible INTEGER);
+
+CREATE TABLE pins (
+    symbol_id INTEGER REFERENCES symbols(id) ON DELETE CASCADE,
+    name TEXT, number TEXT, posx INTEGER, posy INTEGER, length INTEGER, direction TEXT,
+    unit INTEGER, convert INTEGER, electrical_type TEXT, pin_type TEXT);
+
+CREATE TABLE fplist (
+    symbol_id INTEGER REFERENCES symbols(id) ON DELETE CASCADE,
+    filter TEXT);
+
+CREATE TABLE footprints (
+    id INTEGER PRIMARY KEY, file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
+    library TEXT, name TEXT, description TEXT, tags TEXT, attribute TEXT,
+    pad_count INTEGER);
+
+CREATE TABLE pads (
+    footprint_id INTEGER REFERENCES footprints(id) ON DELETE CASCADE,
+    number TEXT, type TEXT, shape TEXT, posx REAL, posy REAL,
+    sizex REAL, sizey REAL, drill REAL, layers TEXT);
+
+CREATE TABLE models (
+    footprint_id INTEGER REFERENCES footprints(id) ON DELETE CASCADE,
+    file TEXT);
+
+CREATE TABLE documents (
+    id INTEGER PRIMARY KEY, file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
+    kind TEXT, library TEXT, name TEXT, description TEXT, keywords TEXT);
+
+CREATE TABLE terms (
+    term TEXT, document_id INTEGER REFERENCES documents(id) ON DELETE CASCADE,
+    weight REAL);
+
+CREATE INDEX symbols_file ON symbols(file_id);
+CREATE INDEX symbols_name ON symbols(name);
+CREATE INDEX symbols_footprint ON symbols(footprint);
+CREATE INDEX aliases_symbol ON aliases(symbol_id);
+CREATE INDEX aliases_name ON aliases(name);
+CREATE INDEX fields_symbol ON fields(symbol_id);
+CREATE INDEX pins_symbol ON pins(symbol_id);
+CREATE INDEX pins_name ON pins(name);
+CREATE INDEX fplist_symbol ON fplist(symbol_id);
+CREATE INDEX footprints_file ON footprints(file_id);
+CREATE INDEX footprints_name ON footprints(library, name);
+CREATE INDEX pads_footprint ON pads(footprint_id);
+CREATE INDEX models_footprint ON models(footprint_id);
+CREATE INDEX models_file ON models(file);
+CREATE INDEX documents_file ON documents(file_id);
+CREATE INDEX terms_term ON terms(term);
+CREATE INDEX terms_document ON terms(document_id);
+"""
+
+# Tables created by SCHEMA
+SCHEMA_TABLES = set(re.findall(r'CREATE TABLE (\w+)', SCHEMA))
+
+# Tables every schema version has, a database without them is not an index
+INDEX_TABLES = set(['files', 'symbols', 'footprints'])
+
+# Names of the fields F0 - F3, other fields have their own name
+FIELD_NAMES = ['Reference', 'Value', 'Footprint', 'Datasheet']
+
+# Weight of a term by the part of the document it was found in
+TERM_WEIGHTS = {'name': 3.0, 'keywords': 2.0, 'description': 1.0}
+
+def tokenize(text):
+    """
+    Lowercase words (letters and digits, numbers like 2.54mm are kept) of a text
+    """
+    return re.findall(r'[^\W_]+(?:\.[^\W_]+)*', (text or '').lower(), re.UNICODE)
+
+def documentTerms(name, description, keywords):
+    """
+    Map of { term : weight } of a document.
+    The whole name is a term as well, so names can be searched exactly.
+    """
+    terms = {}
+    for part, text in [('name', name), ('keywords', keywords), ('description', description)]:
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + TERM_WEIGHTS[part]
+
+    if name:
+        terms[name.lower()] = terms.get(name.lower(), 0) + TERM_WEIGHTS['name']
+
+    return terms
+
+def findFiles(paths):
+    """
+    List of (path, kind) of all .lib and .kicad_mod files.
+    Paths can be files, .pretty folders or folders which are searched recursively.
+    """
+    files = []
+
+    for path in paths:
+        path = os.path.abspath(path)
+
+        if os.path.isfile(path):
+            if path.endswith('.lib'):
+                files.append((path, 'lib'))
+            elif path.endswith('.kicad_mod'):
+                files.append((path, 'kicad_mod'))
+            continue
+
+        for root, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.lib'):
+                    files.append((os.path.join(root, filename), 'lib'))
+                elif filename.endswith('.kicad_mod') and root.endswith('.pretty'):
+                    files.append((os.path.join(root, filename), 'kicad_mod'))
+
+    return files
+
+def fileHash(path):
+    """
+    md5 of a file, including the .dcm file for symbol libraries
+    """
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        md5.update(f.read())
+
+    if path.endswith('.lib'):
+        dcm = path[:-4] + '.dcm'
+        if os.path.isfile(dcm):
+            with open(dcm, 'rb') as f:
+                md5.update(f.read())
+
+    return md5.hexdigest()
+
+def fileStat(path):
+    """
+    (mtime, size) of a file, for symbol libraries the latest of .lib and .dcm
+    """
+    stat = os.stat(path)
+    mtime = stat.st_mtime
+    size = stat.st_size
+
+    if path.endswith('.lib'):
+        dcm = path[:-4] + '.dcm'
+        if os.path.isfile(dcm):
+            stat = os.stat(dcm)
+            mtime = max(mtime, stat.st_mtime)
+            size += stat.st_size
+
+    return mtime, size
+
+def number(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return None
+
+def unquote(value):
+    if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    return value
+
+def symbolRows(libfile):
+    """
+    Parsed symbols of a .lib file as a list of (symbol row, { table : rows })
+    """
+    library = os.path.basename(libfile)[:-4]
+    lib = SchLib(libfile)
+
+    symbols = []
+    for component in lib.components:
+        fields = []
+        for i, field in enumerate(component.fields):
+            if i < len(FIELD_NAMES):
+                name = FIELD_NAMES[i]
+            else:
+                name = unquote(field['fieldname'])
+            value = field['reference'] if i == 0 else field['name']
+            fields.append((i, name, unquote(value), int(field['visibility'] == 'V')))
+
+        values = dict((name, value) for i, name, value, visible in fields)
+        doc = component.documentation
+
+        symbol = (library, component.name, component.reference,
+                  values.get('Value'), values.get('Footprint'), values.get('Datasheet'),
+                  doc.get('description'), doc.get('keywords'),
+                  number(component.definition['unit_count']),
+                  int(component.definition['units_locked'] == 'L'),
+                  int(component.isPowerSymbol()), len(component.pins))
+
+        aliases = [(name, alias.get('description'), alias.get('keywords'), alias.get('datasheet'))
+                   for name, alias in component.aliases.items()]
+
+        pins = [(pin['name'], pin['num'], number(pin['posx']), number(pin['posy']),
+                 number(pin['length']), pin['direction'], number(pin['unit']),
+                 number(pin['convert']), pin['electrical_type'], pin['pin_type'])
+                for pin in component.pins]
+
+        fplist = [(fp,) for fp in component.fplist]
+
+        symbols.append((symbol, {'aliases': aliases, 'fields': fields, 'pins': pins, 'fplist': fplist}))
+
+    return symbols
+
+def footprintRows(filename):
+    """
+    Parsed footprint of a .kicad_mod file as a list of (footprint row, { table : rows })
+    """
+    library = os.path.splitext(os.path.basename(os.path.dirname(filename)))[0]
+    module = KicadMod(filename, keep_sexpr=False)
+
+    pads = []
+    for pad in module.pads:
+        drill = pad['drill'].get('size', {}).get('x') if pad['drill'] else None
+        pads.append((str(pad['number']), pad['type'], pad['shape'],
+                     pad['pos']['x'], pad['pos']['y'], pad['size']['x'], pad['size']['y'],
+                     drill, ' '.join(str(layer) for layer in pad['layers'])))
+
+    models = [(model['file'],) for model in module.models]
+
+    footprint = (library, str(module.name), module.description, module.tags,
+                 module.attribute, len(pads))
+
+    return [(footprint, {'pads': pads, 'models': models})]
+
+def indexFile(task):
+    """
+    Parse a single file (run in worker processes).
+    Returns (path, kind, mtime, size, hash, rows, error), rows is None if
+    the hash did not change.
+    """
+    path, kind, old_hash = task
+    mtime, size = fileStat(path)
+    md5 = fileHash(path)
+
+    if md5 == old_hash:
+        return (path, kind, mtime, size, md5, None, None)
+
+    try:
+        if kind == 'lib':
+            rows = symbolRows(path)
+        else:
+            rows = footprintRows(path)
+    except Exception as e:
+        return (path, kind, mtime, size, md5, [], str(e) or e.__class__.__name__)
+
+    return (path, kind, mtime, size, md5, rows, None)
+
+class IndexDatabaseError(Exception):
+    """
+    The database file is not an index or can't be used as it is
+    """
+    pass
+
+def openDatabase(filename, readonly=False):
+    """
+    Open an index, a new or empty file is set up as index. An index of an
+    older schema is rebuilt, unless it is opened read only.
+    Raises IndexDatabaseError if the file is not an index.
+    """
+    if readonly:
+        db = sqlite3.connect('file:{p}?mode=ro'.format(p=pathname2url(os.path.abspath(filename))), uri=True)
+    else:
+        db = sqlite3.connect(filename)
+    db.execute('PRAGMA foreign_keys = ON')
+
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    tables = set(row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+
+    # Never touch a database of something else
+    if tables and (version == 0 or not INDEX_TABLES <= tables):
+        db.close()
+        raise IndexDatabaseError("'{f}' is not a library index".format(f=filename))
+
+    if version != SCHEMA_VERSION:
+        if readonly:
+            db.close()
+            raise IndexDatabaseError("index '{f}' is outdated, re-run index_library.py".format(f=filename))
+
+        # (re)create the tables of the index
+        db.execute('PRAGMA foreign_keys = OFF')
+        for table in sorted(tables & SCHEMA_TABLES):
+            db.execute('DROP TABLE {t}'.format(t=table))
+        db.executescript(SCHEMA)
+        db.execute('PRAGMA user_version = {v}'.format(v=SCHEMA_VERSION))
+        db.execute('PRAGMA foreign_keys = ON')
+        db.commit()
+
+    return db
+
+# Columns of the item tables and their child tables
+TABLES = {
+    'lib': ('symbols', 'symbol_id', ['library', 'name', 'reference', 'value', 'footprint', 'datasheet',
+        'description', 'keywords', 'unit_count', 'units_locked', 'power', 'pin_count'], {
+        'aliases': ['name', 'description', 'keywords', 'datasheet'],
+        'fields': ['number', 'name', 'value', 'visible'],
+        'pins': ['name', 'number', 'posx', 'posy', 'length', 'direction', 'unit', 'convert',
+                 'electrical_type', 'pin_type'],
+        'fplist': ['filter'],
+        }),
+    'kicad_mod': ('footprints', 'footprint_id', ['library', 'name', 'description', 'tags', 'attribute',
+        'pad_count'], {
+        'pads': ['number', 'type', 'shape', 'posx', 'posy', 'sizex', 'sizey', 'drill', 'layers'],
+        'models': ['file'],
+        }),
+    }
+
+def insertSql(table, columns):
+    return 'INSERT INTO {t} ({c}) VALUES ({v})'.format(
+        t=table, c=', '.join(columns), v=', '.join(['?'] * len(columns)))
+
+def storeFile(db, file_id, result):
+    """
+    Replace the indexed contents of a file by the result of indexFile
+    """
+    path, kind, mtime, size, md5, rows, error = result
+
+    if file_id is None:
+        file_id = db.execute('INSERT INTO files (path, kind, mtime, size, hash, error) VALUES (?, ?, ?, ?, ?, ?)',
+            (path, kind, mtime, size, md5, error)).lastrowid
+    else:
+        db.execute('UPDATE files SET mtime = ?, size = ?, hash = ?, error = ? WHERE id = ?',
+            (mtime, size, md5, error, file_id))
+
+    if rows is None:
+        return
+
+    table, key, columns, children = TABLES[kind]
+    db.execute('DELETE FROM {t} WHERE file_id = ?'.format(t=table), (file_id,))
+    db.execute('DELETE FROM documents WHERE file_id = ?', (file_id,))
+
+    for item, child_rows in rows:
+        item_id = db.execute(insertSql(table, ['file_id'] + columns), (file_id,) + item).lastrowid
+        for child in children:
+            db.executemany(insertSql(child, [key] + children[child]),
+                [(item_id,) + row for row in child_rows[child]])
+
+        values = dict(zip(columns, item))
+        if kind == 'lib':
+            documents = [('symbol', values['name'], values['description'], values['keywords'])]
+            documents += [('alias', name, description, keywords)
+                          for name, description, keywords, datasheet in child_rows['aliases']]
+        else:
+            documents = [('footprint', values['name'], values['description'], values['tags'])]
+
+        for document in documents:
+            document_id = db.execute(insertSql('documents', ['file_id', 'kind', 'library', 'name', 'description', 'keywords']),
+                (file_id, document[0], values['library']) + document[1:]).lastrowid
+            db.executemany('INSERT INTO terms (term, document_id, weight) VALUES (?, ?, ?)',
+                [(term, document_id, weight) for term, weight in documentTerms(*document[1:]).items()])
+
+def indexFiles(db, paths, jobs):
+    """
+    Update the index with all files found in paths.
+    Returns a dict with the number of 'parsed', 'unchanged' and 'removed' files and the parse 'errors'.
+    """
+    files = findFiles(paths)
+    known = dict((row[0], row[1:]) for row in db.execute('SELECT path, id, mtime, size, hash FROM files'))
+
+    stats = {'parsed': 0, 'unchanged': 0, 'removed': 0, 'errors': []}
+
+    tasks = []
+    for path, kind in files:
+        if path in known:
+            file_id, mtime, size, md5 = known[path]
+            if (mtime, size) == fileStat(path):
+                stats['unchanged'] += 1
+                continue
+            tasks.append((path, kind, md5))
+        else:
+            tasks.append((path, kind, None))
+
+    # Remove files which no longer exist below the given paths
+    found = set(path for path, kind in files)
+    roots = [os.path.abspath(path) for path in paths]
+    for path in known:
+        if path in found:
+            continue
+        if any(path == root or path.startswith(os.path.join(root, '')) for root in roots):
+            db.execute('DELETE FROM files WHERE id = ?', (known[path][0],))
+            stats['removed'] += 1
+
+    pool = None
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(indexFile, tasks, chunksize=8)
+    else:
+        results = map(indexFile, tasks)
+
+    for result in results:
+        path = result[0]
+        storeFile(db, known[path][0] if path in known else None, result)
+
+        if result[5] is None:
+            stats['unchanged'] += 1
+        else:
+            stats['parsed'] += 1
+        if result[6]:
+            stats['errors'].append((path, result[6]))
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    db.commit()
+
+    return stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index symbol libraries (.lib) and footprint libraries (.pretty) into a SQLite database')
+    parser.add_argument('paths', nargs='*', help='.lib files, .pretty folders or folders containing them')
+    parser.add_argument('-d', '--database', help='SQLite database file (default = library.sqlite)', default='library.sqlite')
+    parser.add_argument('-q', '--query', help='SQL query to run after indexing, rows are printed tab separated')
+    parser.add_argument('-j', '--jobs', help='Number of processes used for parsing files (default = number of CPUs)', type=int, default=multiprocessing.cpu_count())
+
+    args = parser.parse_args()
+
+    try:
+        db = openDatabase(args.database)
+    except (IndexDatabaseError, sqlite3.DatabaseError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    if args.paths:
+        start = time.time()
+        stats = indexFiles(db, args.paths, args.jobs)
+
+        for path, error in stats['errors']:
+            print("Could not parse '{f}': {e}".format(f=path, e=error), file=sys.stderr)
+
+        print("Indexed {p} files ({u} unchanged, {r} removed) in {t:.1f}s".format(
+            p=stats['parsed'], u=stats['unchanged'], r=stats['removed'], t=time.time() - start),
+            file=sys.stderr)
+
+    if args.query:
+        try:
+            for row in db.execute(args.query):
+                print('\t'.join('' if value is None else str(value) for value in row))
+        except sqlite3.Error as e:
+            print("Query failed: {e}".format(e=e), file=sys.stderr)
+            sys.exit(1)
+
+    db.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This script combines the results of a KLC check which was split into
+shards (see --shard of checklib.py and check_kicad_mod.py) into one report.
+
+The inputs are the JSON reports of the shards (--report) or their JSON logs
+(-l, see logError). The totals and the exit code are the same as of a run
+on a single machine: the exit code is the number of failed items. Logs don't
+record items which could not be parsed, so reports should be preferred.
+
+The merged report (-o) holds the timings of all tasks, it can be given to
+--shard-timings of the next run to balance the shards.
+
+Example:
+    ./merge_results.py shard1.json shard2.json shard3.json -o report.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+
+common = os.path.abspath(os.path.join(sys.path[0], 'common'))
+
+if not common in sys.path:
+    sys.path.append(common)
+
+from print_color import *
+
+def isReport(data):
+    """
+    Reports have a kind, logs only have errors (and warnings)
+    """
+    return 'kind' in data
+
+def mergeResults(inputs):
+    """
+    Merge the data of reports or logs (list of (filename, data)).
+    Returns (merged report, list of problems), the failed items of logs are
+    the items with errors.
+    """
+    merged = {
+        'kind': None,
+        'shard': None,
+        'tasks': 0,
+        'items': 0,
+        'failed': 0,
+        'violations': 0,
+        'errors': {},
+        'timings': {},
+        }
+
+    problems = []
+    shards = {}
+    kinds = set()
+    logged_items = set()
+
+    if len(set(isReport(data) for filename, data in inputs)) > 1:
+        problems.append("Reports and logs can't be merged together")
+
+    for filename, data in inputs:
+        for rule_name, entries in data.get('errors', {}).items():
+            merged['errors'].setdefault(rule_name, []).extend(entries)
+
+        if not isReport(data):
+            for entries in data.get('errors', {}).values():
+                logged_items.update((entry['library'], entry['item']) for entry in entries)
+            continue
+
+        kinds.add(data['kind'])
+
+        for key in ['tasks', 'items', 'failed', 'violations']:
+            merged[key] += data[key]
+        merged['timings'].update(data['timings'])
+
+        if data['shard']:
+            shard, count = data['shard']
+            if shard in shards.setdefault(count, {}):
+                problems.append("'{a}' and '{b}' are both shard {k}/{n}".format(a=shards[count][shard], b=filename, k=shard, n=count))
+            shards[count][shard] = filename
+
+    if len(kinds) > 1:
+        problems.append("Reports of different checkers: {k}".format(k=', '.join(sorted(kinds))))
+    merged['kind'] = kinds.pop() if len(kinds) == 1 else None
+
+    if len(shards) > 1:
+        problems.append("Reports of different shard counts: {n}".format(n=', '.join(str(n) for n in sorted(shards))))
+    for count in shards:
+        missing = [str(k) for k in range(1, count + 1) if not k in shards[count]]
+        if missing:
+            problems.append("Missing shards of {n}: {k}".format(n=count, k=', '.join(missing)))
+
+    merged['failed'] += len(logged_items)
+
+    # sorted, so the merged report does not depend on the order of the shards
+    for rule_name in merged['errors']:
+        merged['errors'][rule_name].sort(key=lambda entry: (entry['library'], entry['item']))
+
+    return merged, problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Combine the JSON reports (or logs) of sharded KLC checks into one report')
+    parser.add_argument('files', help='JSON reports (--report) or logs (-l) of checklib.py or check_kicad_mod.py', nargs='+')
+    parser.add_argument('-o', '--output', help='Path to JSON file to write the merged report to')
+    parser.add_argument('-v', '--verbose', help='List the items violating each rule', action='store_true')
+    parser.add_argument('--nocolor', help='does not use color', action='store_true')
+
+    args = parser.parse_args()
+
+    printer = PrintColor(use_color = not args.nocolor)
+
+    inputs = []
+    for filename in args.files:
+        try:
+            with open(filename, 'r') as f:
+                inputs.append((filename, json.loads(f.read())))
+        except (IOError, OSError, ValueError) as e:
+            printer.red("Could not read '{f}': {e}".format(f=filename, e=e))
+            sys.exit(1)
+
+    merged, problems = mergeResults(inputs)
+
+    for problem in problems:
+        printer.red(problem)
+
+    for rule_name in sorted(merged['errors']):
+        entries = merged['errors'][rule_name]
+        printer.yellow("Violating {r}: {n} items".format(r=rule_name, n=len(entries)))
+        if args.verbose:
+            for entry in entries:
+                print("  {l}:{i}".format(l=entry['library'], i=entry['item']))
+
+    if merged['kind']:
+        printer.green("{t} files, {i} {k}s checked: {f} failed, {v} violations".format(
+            t=merged['tasks'], i=merged['items'], k=merged['kind'], f=merged['failed'], v=merged['violations']))
+    else:
+        printer.green("{f} items with errors".format(f=merged['failed']))
+
+    if args.output:
+        if not merged['kind']:
+            merged = {'errors': merged['errors']}
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(merged, indent=4, sort_keys=True, separators=(',', ':')))
+
+    # exit code of a single run
+    exit_code = merged['failed']
+    if problems:
+        exit_code = max(exit_code, 1)
+
+    sys.exit(exit_code)
@@ -12,6 +12,9 @@ common = os.path.abspath(os.path.join(sys.path[0], '..', 'common'))
 if not common in sys.path:
     sys.path.append(common)
 
+from parsecache import load_cached
+from prettypack import PACK_EXTENSION, isPack, listFootprints
+
 
 # For Python 2 compatibility
 try:
@@ -45,11 +48,15 @@ class Config:
         return os.path.join(self.model_root, pretty_name + '.3dshapes/')
 
     def footprint_dir_name(self, pretty_name):
+        # a packed library is used if there is no .pretty folder
+        pack = os.path.join(self.pretty_root, pretty_name + PACK_EXTENSION)
+        if isPack(pack) and not os.path.isdir(os.path.join(self.pretty_root, pretty_name + '.pretty')):
+            return pack
         return os.path.join(self.pretty_root, pretty_name + '.pretty/')
 
     def valid_pretty_names(self):
         try:
-            prettys = sorted([f.split('.')[0] for f in os.listdir(self.pretty_root) if os.path.isdir(os.path.join(self.pretty_root, f)) and f.endswith('.pretty')])
+            prettys = sorted(set([f.split('.')[0] for f in os.listdir(self.pretty_root) if (os.path.isdir(os.path.join(self.pretty_root, f)) and f.endswith('.pretty')) or isPack(os.path.join(self.pretty_root, f))]))
         except FileNotFoundError:
             printer.red('EXIT: problem reading from module root: {mr:s}'.format(mr=self.pretty_root))
             sys.exit(1)
@@ -72,6 +79,8 @@ class Config:
     def valid_modules(self, pretty_name):
         dir_name = self.footprint_dir_name(pretty_name)
         try:
+            if isPack(dir_name):
+                return [os.path.basename(f) for f in listFootprints(dir_name)]
             return sorted([f for f in os.listdir(dir_name) if os.path.isfile(os.path.join(dir_name, f)) and f.endswith('.kicad_mod')])
         except FileNotFoundError:
             printer.red('EXIT: problem reading from module directory: {d:s}'.format(d=dir_name))
@@ -109,7 +118,7 @@ def parse_module(filename, warnings):
     if config.verbose:
         printer.green('Parsing: {f:s}'.format(f=filename))
     try:
-        module = KicadMod(filename)
+        module = load_cached(filename, keep_sexpr=False)
     except FileNotFoundError:
         printer.red('EXIT: problem reading module file {fn:s}'.format(fn=filename))
         sys.exit(1)
@@ -8,11 +8,13 @@ import sys,os
 import re
 import glob
 
+from prettypack import isPack, listFootprints, openFootprint
+
 regex_str = "\(\s*pad\s*[^\s]+\s*(?:smd|thru_hole)\s*(?:roundrect|custom)"
 regex_pattern = re.compile(regex_str)
 
 parser = argparse.ArgumentParser(description='Checks KiCad footprint libs for compatibility with version 4. Outputs a list of incompatible footprints. (optionally removes them to allow the lib to be used with KiCad version 4)')
-parser.add_argument('libs', nargs='+')
+parser.add_argument('libs', nargs='+', help='footprint libraries (.pretty dirs or .prettypack files)')
 parser.add_argument('-r', '--remove', help='remove incompatible footprints', action='store_true')
 
 args = parser.parse_args()
@@ -20,12 +22,19 @@ args = parser.parse_args()
 invalid = []
 
 for lib in args.libs:
-    if not lib.endswith(os.sep):
-        lib += os.sep
-
-    #print(glob.glob('{:}*.kicad_mod'.format(lib)))
-    for fp in glob.glob('{:}*.kicad_mod'.format(lib)):
-        with open(fp, 'r') as fp_file:
+    if isPack(lib):
+        if args.remove:
+            print("Footprints can't be removed from a pack: {:}".format(lib))
+            sys.exit(1)
+        footprints = listFootprints(lib)
+    else:
+        if not lib.endswith(os.sep):
+            lib += os.sep
+        footprints = glob.glob('{:}*.kicad_mod'.format(lib))
+
+    #print(footprints)
+    for fp in footprints:
+        with openFootprint(fp) as fp_file:
             for line in fp_file.readlines():
                 if re.search(regex_pattern, line):
                     invalid.append(fp)
@@ -3,7 +3,9 @@
 from __future__ import print_function
 
 import argparse
+import multiprocessing
 import traceback
+import hashlib
 
 import sys,os
 
@@ -15,152 +17,243 @@ from kicad_mod import *
 
 from print_color import *
 from rules import __all__ as all_rules
-from rules import *
 from rules.rule import KLCRule
-from rulebase import logError
+from rulebase import RuleRegistry
+from klcengine import KLCEngine, ItemSource, TaskError, LogSink, ReportSink, parseShard, loadTimings
+from filewatcher import FileWatcher
+from prettypack import isPack, isPacked, listFootprints, footprintSize
 
 # enable windows wildcards
 from glob import glob
 
 parser = argparse.ArgumentParser(description='Checks KiCad footprint files (.kicad_mod) against KiCad Library Convention (KLC) rules. You can find the KLC at http://kicad-pcb.org/libraries/klc/')
-parser.add_argument('kicad_mod_files', nargs='+')
+parser.add_argument('kicad_mod_files', nargs='+', help='Footprint files (.kicad_mod) or footprint libraries (.pretty dirs or .prettypack files)')
 parser.add_argument('--fix', help='fix the violations if possible', action='store_true')
 parser.add_argument('--fixmore', help='fix additional violations, not covered by --fix (e.g. rectangular courtyards), implies --fix!', action='store_true')
 parser.add_argument('--rotate', help='rotate the whole symbol clockwise by the given number of degrees', action='store', default=0)
 parser.add_argument('-r', '--rule', help='specify single rule to check (default = check all rules)', action='store')
+parser.add_argument('--exclude', help='Exclude a particular rule (or rules) to check against. Use comma separated values to select multiple rules. e.g. "--exclude F5.1,F7.2"', action='store')
 parser.add_argument('--nocolor', help='does not use colors to show the output', action='store_true')
 parser.add_argument('-v', '--verbose', help='Enable verbose output. -v shows brief information, -vv shows complete information', action='count')
 parser.add_argument('-s', '--silent', help='skip output for symbols passing all checks', action='store_true')
 parser.add_argument('-e', '--errors', help='Do not suppress fatal parsing errors', action='store_true')
 parser.add_argument('-l', '--log', help="Path to JSON file to log error information")
 parser.add_argument('-w', '--nowarnings', help='Hide warnings (only show errors)', action='store_true')
+parser.add_argument('--watch', help='Keep running and re-check footprints whenever they change', action='store_true')
+parser.add_argument('--watch-interval', help='Polling interval in seconds for --watch (default = 0.5)', type=float, default=0.5)
+parser.add_argument('--shard', help='Only check shard K of N of the footprints (e.g. 2/4), the shards are balanced by file size or by --shard-timings', type=parseShard)
+parser.add_argument('--shard-timings', help='JSON report of a previous run (see --report), its timings are used to balance the shards')
+parser.add_argument('--report', help='Path to JSON file to write a report to, the reports of all shards are combined by merge_results.py')
+parser.add_argument('-j', '--jobs', help='Number of processes used for checking footprints (default = number of CPUs)', type=int, default=multiprocessing.cpu_count())
 
-args = parser.parse_args()
-if args.fixmore:
-    args.fix=True
+def expandPath(path):
+    """
+    Expand a path argument into a list of footprint files.
+    A .pretty directory or a pack is expanded to all the footprints it contains.
+    """
+    if os.path.isdir(path):
+        return sorted(glob(os.path.join(path, '*.kicad_mod')))
 
-printer = PrintColor(use_color=not args.nocolor)
+    if isPack(path):
+        return listFootprints(path)
 
-# Set verbosity globally
-verbosity = 0
-if args.verbose:
-    verbosity = args.verbose
+    # A footprint in a pack (e.g. passed on by comparepretty.py)
+    if isPacked(path):
+        return [path]
 
-KLCRule.verbosity = verbosity
+    return glob(path)
 
-exit_code = 0
+def fileChecksum(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
 
-if args.rule:
-    selected_rules = args.rule.split(",")
-else:
-    selected_rules = None
+class FootprintSource(ItemSource):
+    """
+    Footprint files, one footprint per file
+    """
 
-rules = []
+    kind = 'footprint'
 
-for r in all_rules:
-    r_name = r.replace('_', '.')
-    if selected_rules == None or r_name in selected_rules:
-        rules.append(globals()[r].Rule)
+    def __init__(self, args, printer):
+        self.args = args
+        self.printer = printer
 
-files = []
+    def libraryName(self, filename):
+        return os.path.splitext(os.path.basename(os.path.dirname(filename)))[0]
 
-for f in args.kicad_mod_files:
-    files += glob(f)
+    def load(self, filename):
+        args = self.args
 
-if len(files) == 0:
-    printer.red("File argument invalid: {f}".format(f=args.kicad_mod_files))
-    sys.exit(1)
+        if not os.path.exists(filename) and not isPacked(filename):
+            raise TaskError('File does not exist: %s' % filename, failed=False)
 
-for filename in files:
+        if not filename.endswith('.kicad_mod'):
+            raise TaskError('File is not a .kicad_mod : %s' % filename, failed=False)
 
-    if not os.path.exists(filename):
-        printer.red('File does not exist: %s' % filename)
-        continue
+        if args.errors:
+            module = KicadMod(filename)
+        else:
+            try:
+                module = KicadMod(filename)
+            except Exception as e:
+                if args.verbose:
+                    #printer.red("Error: " + str(e))
+                    traceback.print_exc()
+                raise TaskError('could not parse module: %s' % filename)
+
+        if args.rotate!=0:
+            module.rotateFootprint(int(args.rotate))
+            self.printer.green('rotated footprint by {deg} degrees'.format(deg=int(args.rotate)))
+
+        return module, [module]
+
+    def createRule(self, rule, module):
+        return rule(module, self.args)
+
+    def finish(self, filename, module, modules, n_violations):
+        if ((self.args.fix or self.args.fixmore) and n_violations > 0) or self.args.rotate!=0:
+            module.save()
+
+    def cacheable(self):
+        return self.args.rotate == 0
+
+    def taskSize(self, filename):
+        return footprintSize(filename) if os.path.exists(filename) or isPacked(filename) else 0
+
+class FootprintChecker(object):
+    """
+    Checks footprint files against the KLC rules selected by the command line
+    arguments and prints the results.
+    """
+
+    def __init__(self, args, printer):
+        if args.fixmore:
+            args.fix = True
 
-    if not filename.endswith('.kicad_mod'):
-        printer.red('File is not a .kicad_mod : %s' % filename)
-        continue
+        self.args = args
+        self.printer = printer
 
-    lib_name = os.path.dirname(filename).split(os.path.sep)[-1].replace('.pretty', '')
+        # Set verbosity globally
+        self.verbosity = 0
+        if args.verbose:
+            self.verbosity = args.verbose
 
-    if args.errors:
-        module = KicadMod(filename)
-    else:
-        try:
-            module = KicadMod(filename)
-        except Exception as e:
-            printer.red('could not parse module: %s' % filename)
-            if args.verbose:
-                #printer.red("Error: " + str(e))
-                traceback.print_exc()
-            exit_code += 1
-            continue
+        KLCRule.verbosity = self.verbosity
+
+        if args.rule:
+            selected_rules = args.rule.split(",")
+        else:
+            selected_rules = None
+
+        if args.exclude:
+            excluded_rules = args.exclude.split(",")
+        else:
+            excluded_rules = None
+
+        # only the modules of the selected rules are imported
+        self.rules = RuleRegistry('rules', all_rules).select(selected_rules, excluded_rules)
+
+        self.engine = KLCEngine(FootprintSource(args, printer), self.rules, printer, verbosity=self.verbosity,
+                                nowarnings=args.nowarnings, silent=args.silent, fix=args.fix, fixmore=args.fixmore)
+
+        if args.log:
+            self.engine.addSink(LogSink(args.log))
+
+        if args.report:
+            self.engine.addSink(ReportSink(args.report, 'footprint', args.shard))
+
+        # Map of { footprint file : content checksum } from the last run
+        self.checksums = {}
+
+    def checkFootprint(self, filename):
+        """
+        Check a single footprint file against the selected rules.
+        Returns 1 if the footprint has violations (or could not be parsed), otherwise 0.
+        """
+        return self.engine.checkTasks([filename])
+
+    def checkFiles(self, files, jobs=1):
+        """
+        Check footprint files, in a process pool if jobs > 1.
+        Returns the number of footprints with violations (or which could not be parsed).
+        """
+        if self.args.watch:
+            for filename in files:
+                if os.path.exists(filename):
+                    self.checksums[filename] = fileChecksum(filename)
+
+        return self.engine.checkTasks(files, jobs)
+
+    def footprintsChanged(self, changed):
+        """
+        Re-check footprints whose contents changed since they were last checked
+        """
+        n_checked = 0
+
+        for filename in changed:
+            if not os.path.exists(filename):
+                if self.checksums.pop(filename, None) is not None:
+                    self.printer.red('Removed footprint: %s' % filename)
+                continue
 
-    if args.rotate!=0:
-        module.rotateFootprint(int(args.rotate))
-        printer.green('rotated footprint by {deg} degrees'.format(deg=int(args.rotate)))
+            checksum = fileChecksum(filename)
 
-    n_violations = 0
+            # Only the timestamp changed
+            if self.checksums.get(filename) == checksum:
+                continue
 
-    no_warnings = True
+            self.checksums[filename] = checksum
+            self.checkFootprint(filename)
+            n_checked += 1
 
-    output = []
+        if n_checked > 0 and self.args.fix:
+            self.printer.light_red('Some files were updated - ensure that they still load correctly in KiCad')
 
-    first = True
+    def watch(self, paths):
+        """
+        Re-check footprints whenever they change
+        """
+        watcher = FileWatcher(paths, ['.kicad_mod'], interval=self.args.watch_interval)
 
-    for rule in rules:
-        rule = rule(module,args)
+        # Checksums after fixing files on the first run
+        for filename in self.checksums:
+            self.checksums[filename] = fileChecksum(filename)
 
-        if verbosity > 2:
-            printer.white("Checking rule " + rule.name)
+        self.printer.regular("Watching {n} footprints for changes (press Ctrl-C to stop)".format(n=len(self.checksums)))
+        watcher.watch(self.footprintsChanged)
 
-        rule.check()
+if __name__ == '__main__':
+    args = parser.parse_args()
 
-        if args.nowarnings and not rule.hasErrors():
-            continue
+    printer = PrintColor(use_color=not args.nocolor)
 
-        if rule.hasOutput():
-            if first:
-                printer.green("Checking footprint '{fp}':".format(fp=module.name))
-                first = False
+    checker = FootprintChecker(args, printer)
 
-            printer.yellow("Violating " + rule.name, indentation=2)
-            rule.processOutput(printer, args.verbose, args.silent)
+    files = []
 
-        if args.fixmore and rule.needsFixMore:
-            if rule.hasErrors():
-                n_violations += rule.errorCount
-            if rule.hasWarnings:
-                n_violations += rule.warningCount()
-            rule.fixmore()
-            rule.fix()
-            rule.processOutput(printer, args.verbose, args.silent)
-        elif rule.hasErrors():
-            n_violations += rule.errorCount
-            if args.fixmore and rule.hasWarnings:
-                n_violations += rule.warningCount()
+    for f in args.kicad_mod_files:
+        files += expandPath(f)
 
-            if args.log:
-                logError(args.log, rule.name, lib_name, module.name)
+    if len(files) == 0:
+        printer.red("File argument invalid: {f}".format(f=args.kicad_mod_files))
+        sys.exit(1)
 
-            if args.fix:
-                rule.fix()
-                rule.processOutput(printer, args.verbose, args.silent)
-                rule.recheck()
+    # Packs are read only
+    if (args.fix or args.rotate != 0) and any(isPacked(f) for f in files):
+        printer.red("Footprints in a pack can't be fixed or rotated, unpack the library first (see prettypack.py)")
+        sys.exit(1)
 
-    # No messages?
-    if first:
-        if not args.silent:
-            printer.green("Checking footprint '{fp}' - No errors".format(fp=module.name))
+    if args.shard:
+        files = checker.engine.shardTasks(files, args.shard, loadTimings(args.shard_timings) if args.shard_timings else None)
 
-    # increment the number of violations
-    if n_violations > 0:
-        exit_code += 1
+    exit_code = checker.checkFiles(files, args.jobs)
 
-    if ((args.fix or args.fixmore) and n_violations > 0) or args.rotate!=0:
-        module.save()
+    if args.fix:
+        printer.light_red('Some files were updated - ensure that they still load correctly in KiCad')
 
-if args.fix:
-    printer.light_red('Some files were updated - ensure that they still load correctly in KiCad')
+    if args.watch:
+        # Watch directories (to catch new footprints) and explicitly given files
+        dirs = [os.path.normpath(f) for f in args.kicad_mod_files if os.path.isdir(f)]
+        checker.watch(dirs + [f for f in files if os.path.normpath(os.path.dirname(f)) not in dirs])
 
-sys.exit(exit_code)
+    sys.exit(exit_code)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+"""
+
+This file compares two sets of footprint libraries (.pretty folders or packs) and generates a list of deleted / added / updated footprints.
+This is to be used to compare updated footprint libraries with a previous version to determine which footprints have been changed.
+
+Footprints are compared by a fingerprint of their parsed contents, so changes to formatting only are ignored.
+
+"""
+
+import argparse
+import sys
+import os
+import multiprocessing
+
+# Path to common directory
+common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
+
+if not common in sys.path:
+    sys.path.append(common)
+
+from print_color import *
+from fingerprint import FootprintInfo
+from prettypack import FOOTPRINT_EXTENSION, findLibraries, listFootprints, openFootprint, isPacked
+from check_kicad_mod import parser as check_parser, FootprintChecker
+
+def ExitError( msg ):
+    print(msg)
+    sys.exit(-1)
+
+def uniqueLibraries(libs):
+    """
+    Map of { library name : path } of the result of findLibraries,
+    a library name must only be found once
+    """
+    for lib_name in sorted(libs):
+        if len(libs[lib_name]) > 1:
+            ExitError("Library '{lib}' found more than once: {paths}".format(lib=lib_name, paths=', '.join(libs[lib_name])))
+
+    return dict((lib_name, paths[0]) for lib_name, paths in libs.items())
+
+def libraryFootprints(path):
+    """
+    Map of { footprint name : file } of a .pretty folder or a pack
+    """
+    return dict((os.path.basename(f)[:-len(FOOTPRINT_EXTENSION)], f) for f in listFootprints(path))
+
+def readFile(filename):
+    with openFootprint(filename, 'rb') as f:
+        return f.read()
+
+def compareFootprint(task):
+    """
+    Compare the new and old version (either can be None) of a footprint file.
+    Returns (name, new FootprintInfo, old FootprintInfo).
+    Byte-identical files are not parsed, both infos are None in that case.
+    """
+    name, new_file, old_file = task
+
+    if new_file and old_file and readFile(new_file) == readFile(old_file):
+        return name, None, None
+
+    new = FootprintInfo(new_file) if new_file else None
+    old = FootprintInfo(old_file) if old_file else None
+
+    return name, new, old
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two sets of footprint libraries (.pretty folders or packs) to determine which footprints have changed")
+
+    parser.add_argument("--new", help="New (updated) .pretty folder(s) or pack(s), or folder containing them", nargs='+')
+    parser.add_argument("--old", help="Old (original) .pretty folder(s) or pack(s), or folder containing them, for comparison", nargs='+')
+    parser.add_argument("-v", "--verbose", help="Enable extra verbose output", action="store_true")
+    parser.add_argument("--check", help="Perform KLC check on updated/added footprints", action='store_true')
+    parser.add_argument("--nocolor", help="Does not use colors to show the output", action='store_true')
+    parser.add_argument("--design-breaking-changes", help="Checks if there have been changes made that would break existing designs using a particular footprint.", action='store_true')
+    parser.add_argument("--shownochanges", help="Show libraries that have not changed", action="store_true")
+    parser.add_argument("-j", "--jobs", help="Number of processes used for comparing footprints (default = number of CPUs)", type=int, default=multiprocessing.cpu_count())
+
+    args,extra = parser.parse_known_args()
+
+    if not args.new:
+        ExitError("New folder(s) not supplied")
+
+    if not args.old:
+        ExitError("Original folder(s) not supplied")
+
+    printer = PrintColor(use_color = not args.nocolor)
+
+    new_libs = uniqueLibraries(findLibraries(args.new))
+    old_libs = uniqueLibraries(findLibraries(args.old))
+
+    pool = None
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs)
+
+    new_names = sorted(new_libs)
+
+    if pool:
+        new_footprints = pool.map(libraryFootprints, [new_libs[lib] for lib in new_names])
+        old_footprints = pool.map(libraryFootprints, [old_libs[lib] for lib in new_names if lib in old_libs])
+    else:
+        new_footprints = [libraryFootprints(new_libs[lib]) for lib in new_names]
+        old_footprints = [libraryFootprints(old_libs[lib]) for lib in new_names if lib in old_libs]
+
+    new_footprints = dict(zip(new_names, new_footprints))
+    old_footprints = dict(zip([lib for lib in new_names if lib in old_libs], old_footprints))
+
+    # One task per footprint, in library order
+    tasks = []
+    for lib_name in new_names:
+        new_fps = new_footprints[lib_name]
+        old_fps = old_footprints.get(lib_name, {})
+
+        for fp in sorted(set(new_fps) | set(old_fps)):
+            tasks.append(((lib_name, fp), new_fps.get(fp), old_fps.get(fp)))
+
+    if pool:
+        results = pool.imap(compareFootprint, tasks, chunksize=16)
+    else:
+        results = map(compareFootprint, tasks)
+
+    errors = 0
+    design_breaking_changes = 0
+
+    # Footprints to be checked
+    check_files = []
+
+    # Changed footprints per library
+    lib_changes = dict((lib_name, 0) for lib_name in new_names)
+
+    for (lib_name, fp), new, old in results:
+
+        name = '{lib}:{fp}'.format(lib=lib_name, fp=fp)
+
+        # New library has been created!
+        if not lib_name in old_libs:
+            if lib_changes[lib_name] == 0 and args.verbose:
+                printer.light_green("Created library '{lib}'".format(lib=lib_name))
+            lib_changes[lib_name] += 1
+
+            # Check all the footprints!
+            check_files.append(new.filename)
+            continue
+
+        # Identical files
+        if new is None and old is None:
+            continue
+
+        for info in [new, old]:
+            if info and info.error:
+                errors += 1
+                printer.red("Could not parse '{file}': {error}".format(file=info.filename, error=info.error))
+
+        if (new and new.error) or (old and old.error):
+            lib_changes[lib_name] += 1
+            if new and not new.error:
+                check_files.append(new.filename)
+            continue
+
+        # Footprint has been deleted from library
+        if new is None:
+            lib_changes[lib_name] += 1
+            if args.verbose:
+                printer.red("Removed '{name}'".format(name=name))
+            if args.design_breaking_changes:
+                design_breaking_changes += 1
+            continue
+
+        # Footprint is 'new' (not in old library)
+        if old is None:
+            lib_changes[lib_name] += 1
+            if args.verbose:
+                printer.light_green("New '{name}'".format(name=name))
+            check_files.append(new.filename)
+            continue
+
+        sections = new.changedSections(old)
+
+        # Only the formatting has changed
+        if not sections:
+            continue
+
+        lib_changes[lib_name] += 1
+
+        if args.verbose:
+            printer.yellow("Changed '{name}' ({sections})".format(name=name, sections=', '.join(sections)))
+
+        if args.design_breaking_changes:
+            pads = new.padChanges(old)
+            if pads['moved'] > 0 or pads['missing'] > 0:
+                design_breaking_changes += 1
+                printer.light_purple("Pads have been moved, renumbered or removed in footprint '{name}'".format(name=name))
+
+        check_files.append(new.filename)
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    for lib_name in new_names:
+        if lib_changes[lib_name] == 0 and args.verbose and args.shownochanges:
+            printer.yellow("No changes to library '{lib}'".format(lib=lib_name))
+
+    # Entire lib has been deleted?
+    for lib_name in sorted(old_libs):
+        if not lib_name in new_libs:
+            if args.verbose:
+                printer.red("Removed library '{lib}'".format(lib=lib_name))
+            if args.design_breaking_changes:
+                design_breaking_changes += 1
+
+    if args.check and check_files:
+        # Remaining arguments are passed on to the checker, as for check_kicad_mod.py
+        check_args = check_parser.parse_args(['-vv', '-s'] + (['--nocolor'] if args.nocolor else []) + extra + ['--'] + check_files)
+        checker = FootprintChecker(check_args, printer)
+
+        # Packs are read only
+        if (check_args.fix or check_args.rotate != 0) and any(isPacked(f) for f in check_files):
+            ExitError("Footprints in a pack can't be fixed or rotated, unpack the library first (see prettypack.py)")
+
+        errors += checker.checkFiles(check_files, args.jobs)
+
+    # Return the number of errors found ( zero if --check is not set )
+    sys.exit(errors + design_breaking_changes)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+This file looks for footprints which are identical (or nearly identical)
+across footprint libraries, independent of their names, descriptions,
+3D models and the order of their items.
+
+Footprints are reduced to a canonical form (see fingerprint.py) and hashed,
+identical footprints have the same hash. Similar footprints are found by
+comparing the sets of their canonical items, a similarity of 1.0 means
+that all items are the same.
+
+Example:
+    ./find_similar.py path/to/footprints
+    ./find_similar.py Lib1.pretty Lib2.prettypack -t 0.9 --json > clusters.json
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import sys, os
+
+# Path to common directory
+common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
+
+if not common in sys.path:
+    sys.path.append(common)
+
+from print_color import *
+from parsecache import load_cached
+from similarity import featureSet, signature, findClusters, printClusters
+from fingerprint import canonicalFootprint, contentHash
+from prettypack import findLibraries, listFootprints
+
+def footprintInfo(task):
+    """
+    Canonical form of a footprint file, the loader of findClusters
+    """
+    library, filename = task
+    name = os.path.basename(filename)[:-10]
+
+    try:
+        module = load_cached(filename, keep_sexpr=False)
+    except Exception as e:
+        return [], [(footprintName((library, name)), str(e) or e.__class__.__name__)]
+
+    items = canonicalFootprint(module)
+    hashes = featureSet(items)
+
+    return [((library, name), contentHash(items), hashes, signature(hashes))], []
+
+def libraryLabels(libs):
+    """
+    List of (label, path) of all libraries (map of { name : list of paths }).
+    The label is the library name, or the path if several libraries have the same name.
+    """
+    labels = []
+    for name in sorted(libs):
+        for path in libs[name]:
+            labels.append((name if len(libs[name]) == 1 else path, path))
+    return labels
+
+def footprintName(footprint):
+    return '{lib}:{fp}'.format(lib=footprint[0], fp=footprint[1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find identical and similar footprints across footprint libraries")
+
+    parser.add_argument('libs', help=".pretty folder(s), .prettypack file(s) or folder(s) containing them", nargs="+")
+    parser.add_argument('-t', '--threshold', help='Minimum similarity of similar footprints, 1 = only identical footprints (default = 0.8)', type=float, default=0.8)
+    parser.add_argument('-j', '--jobs', help='Number of processes used for parsing files (default = number of CPUs)', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--json', help='Print the clusters as JSON', action='store_true')
+    parser.add_argument('-s', '--silent', help='only show the number of clusters', action='store_true')
+    parser.add_argument('--nocolor', help='does not use color', action='store_true')
+
+    args = parser.parse_args()
+
+    printer = PrintColor(use_color = not args.nocolor)
+
+    # one task per footprint, the footprints are streamed through the pool
+    tasks = ((label, filename) for label, path in libraryLabels(findLibraries(args.libs)) for filename in listFootprints(path))
+
+    identical, similar, errors, capped = findClusters(tasks, footprintInfo, args.threshold, args.jobs, chunksize=16)
+
+    printClusters(printer, identical, similar, errors, capped, footprintName, 'footprint', args.json, args.silent)
+
+    sys.exit(1 if identical or similar or errors else 0)
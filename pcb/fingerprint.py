@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Content fingerprints of footprints.
+
+The parsed KicadMod data is normalized (numbers rounded, draw order of
+graphics and pads ignored) and hashed per section, so that two footprints
+have the same fingerprint if they describe the same footprint,
+independent of how the file is formatted.
+
+For finding duplicates, a footprint is also reduced to a canonical list of
+its pads and graphic items (canonicalFootprint). The name, description,
+value text and 3D models are left out, coordinates are rounded, layers
+normalized and items put in a defined order (pads by position), so copies
+of a footprint in different libraries have the same contentHash.
+
+"""
+
+import hashlib
+import math
+
+from kicad_mod import KicadMod
+
+# Number of decimals (mm) used when comparing coordinates
+PRECISION = 6
+
+# Number of decimals (mm) of the coordinates of canonical footprints
+CANONICAL_PRECISION = 3
+
+# Pad shapes which look the same when rotated by 180 degrees
+SYMMETRIC_PADS = ['rect', 'oval', 'circle', 'roundrect']
+
+# Layer names of older KiCad versions
+LAYER_ALIASES = {'F&B.Cu': '*.Cu'}
+
+# Sections of a footprint which are fingerprinted
+SECTIONS = ['pads', 'graphics', 'models', 'text', 'properties']
+
+def normalize(value):
+    """
+    Convert parsed footprint data into a hashable, canonical form.
+    Dicts (and footprint items) become sorted tuples of (key, value) pairs,
+    numbers are rounded.
+    """
+    if hasattr(value, 'items'):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), PRECISION) + 0.0
+    return value
+
+def hashItems(items, ordered=False):
+    """
+    md5 hash of a list of normalized items.
+    Unless ordered is set, the order of the items is ignored.
+    """
+    items = [repr(item) for item in items]
+    if not ordered:
+        items.sort()
+    return hashlib.md5('\n'.join(items).encode('utf-8')).hexdigest()
+
+def padPosition(pad):
+    return (normalize(pad['pos']['x']), normalize(pad['pos']['y']))
+
+def padPositions(module):
+    """
+    Map of { pad number : sorted list of pad positions }
+    Pads without a number (e.g. mounting holes) are not included.
+    """
+    pads = {}
+    for pad in module.pads:
+        number = str(pad['number'])
+        if not number:
+            continue
+        pads.setdefault(number, []).append(padPosition(pad))
+
+    for number in pads:
+        pads[number].sort()
+
+    return pads
+
+def moduleFingerprint(module):
+    """
+    Map of { section : hash } of a parsed KicadMod
+    """
+    graphics = []
+    for line in module.lines:
+        graphics.append(('line', normalize(line)))
+    for circle in module.circles:
+        graphics.append(('circle', normalize(circle)))
+    for arc in module.arcs:
+        graphics.append(('arc', normalize(arc)))
+
+    texts = [module.reference, module.value] + module.userText
+
+    properties = [
+        module.layer, module.locked, module.description, module.tags,
+        module.autoplace_cost90, module.autoplace_cost180,
+        module.clearance, module.solder_mask_margin,
+        module.solder_paste_margin, module.solder_paste_ratio,
+        module.attribute,
+        ]
+
+    return {
+        'pads': hashItems([normalize(pad) for pad in module.pads]),
+        'graphics': hashItems(graphics),
+        'models': hashItems([normalize(model) for model in module.models]),
+        'text': hashItems([normalize(text) for text in texts]),
+        'properties': hashItems([normalize(properties)], ordered=True),
+        }
+
+class FootprintInfo(object):
+    """
+    Fingerprint and pad positions of a single footprint file.
+    If the file can't be parsed, error is set and the rest is empty.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.name = None
+        self.error = None
+        self.fingerprint = {}
+        self.pads = {}
+
+        try:
+            module = KicadMod(filename, keep_sexpr=False)
+        except Exception as e:
+            self.error = str(e) or e.__class__.__name__
+            return
+
+        self.name = module.name
+        self.fingerprint = moduleFingerprint(module)
+        self.pads = padPositions(module)
+
+    def changedSections(self, other):
+        """
+        List of sections which differ from another FootprintInfo
+        """
+        return [s for s in SECTIONS if self.fingerprint.get(s) != other.fingerprint.get(s)]
+
+    def padChanges(self, old):
+        """
+        Compare pads by number with an older version of the footprint.
+        Returns a dict with the number of moved and missing pad numbers.
+        """
+        changes = {'moved': 0, 'missing': 0}
+
+        for number in old.pads:
+            if not number in self.pads:
+                changes['missing'] += 1
+            elif self.pads[number] != old.pads[number]:
+                changes['moved'] += 1
+
+        return changes
+
+def coordinate(value):
+    return round(float(value), CANONICAL_PRECISION) + 0.0
+
+def point(p):
+    return (coordinate(p['x']), coordinate(p['y']))
+
+def normalizeLayers(layers):
+    """
+    Sorted tuple of the unique layer names
+    """
+    return tuple(sorted(set(LAYER_ALIASES.get(str(layer), str(layer)) for layer in layers)))
+
+def canonicalPad(pad):
+    orientation = coordinate(pad['pos'].get('orientation', 0)) % 360
+    size = point(pad['size'])
+
+    drill = ()
+    offset = (0.0, 0.0)
+    if pad['drill']:
+        if pad['drill'].get('offset'):
+            offset = point(pad['drill']['offset'])
+        drill_size = point(pad['drill']['size']) if pad['drill'].get('size') else ()
+        drill = (pad['drill'].get('shape'), drill_size, offset)
+
+    # a symmetric pad rotated by 90 degrees is the same as the pad with swapped sizes
+    if pad['shape'] in SYMMETRIC_PADS and offset == (0.0, 0.0):
+        orientation %= 180
+        if orientation == 90:
+            orientation = 0.0
+            size = size[::-1]
+            if drill and drill[1]:
+                drill = (drill[0], drill[1][::-1], drill[2])
+        if pad['shape'] == 'circle':
+            orientation = 0.0
+
+    options = tuple(normalize(pad.get(key)) for key in [
+        'rect_delta', 'die_length', 'clearance', 'solder_mask_margin', 'solder_paste_margin',
+        'solder_paste_margin_ratio', 'zone_connect', 'thermal_width', 'thermal_gap', 'primitives'])
+
+    return ('pad', point(pad['pos']), str(pad['number']), pad['type'], pad['shape'],
+            orientation, size, normalizeLayers(pad['layers']), drill, options)
+
+def canonicalArc(arc):
+    # start is the center, end the start point of the arc
+    cx, cy = point(arc['start'])
+    sx, sy = point(arc['end'])
+    angle = coordinate(arc['angle'])
+
+    # an arc drawn backwards starts at the other end
+    if angle < 0:
+        a = math.radians(angle)
+        dx, dy = sx - cx, sy - cy
+        sx = coordinate(cx + dx * math.cos(a) - dy * math.sin(a))
+        sy = coordinate(cy + dx * math.sin(a) + dy * math.cos(a))
+        angle = -angle
+
+    return ('arc', (cx, cy), (sx, sy), angle, arc['layer'], coordinate(arc['width']))
+
+def canonicalText(text, kind):
+    # the value is the footprint name, only its placement is compared
+    content = None if kind == 'value' else text[kind]
+    return ('text', kind, content, point(text['pos']), coordinate(text['pos'].get('orientation', 0)),
+            text['layer'], normalize(text['font']), text['hide'])
+
+def canonicalFootprint(module):
+    """
+    List of the canonical items of a parsed KicadMod (see module docstring),
+    the pads ordered by position first, then all other items
+    """
+    # pads ordered by position
+    pads = sorted((canonicalPad(pad) for pad in module.pads), key=lambda pad: (pad[1], pad[2], repr(pad)))
+
+    items = [('attr', module.attribute, module.layer)]
+
+    for line in module.lines:
+        items.append(('line',) + tuple(sorted([point(line['start']), point(line['end'])])) +
+                     (line['layer'], coordinate(line['width'])))
+
+    for circle in module.circles:
+        center = point(circle['center'])
+        end = point(circle['end'])
+        radius = coordinate(math.hypot(end[0] - center[0], end[1] - center[1]))
+        items.append(('circle', center, radius, circle['layer'], coordinate(circle['width'])))
+
+    for arc in module.arcs:
+        items.append(canonicalArc(arc))
+
+    items.append(canonicalText(module.reference, 'reference'))
+    items.append(canonicalText(module.value, 'value'))
+    for text in module.userText:
+        items.append(canonicalText(text, 'user'))
+
+    return pads + sorted(items, key=repr)
+
+def contentHash(items):
+    """
+    md5 hash of the canonical items of a footprint
+    """
+    return hashItems(items, ordered=True)
@@ -4,12 +4,16 @@
 from __future__ import division
 
 import time
-import re, math
+import re, math, cmath
 import sys, os
+import copy
 sys.path.append(os.path.join('..','common'))
 
 import sexpr
 from boundingbox import BoundingBox
+from geometry import boxOfPoints, mergeBoxes, arcBoundingBox, GridIndex
+from geometry import rotatePoints, translatePoints, rectanglesBoundingBox
+from prettypack import readFootprint
 
 # Rotate a point by given angle (in degrees)
 def _rotatePoint(point, degrees):
@@ -46,16 +50,109 @@ def _movePoint(point, offset):
 
     return p
 
+class _Item(object):
+    """
+    Base class for footprint items.
+
+    Fields are stored in __slots__ (much less memory than a dict per item),
+    but can be accessed like a dict: item['pos']['x'], 'angle' in item, ...
+    Only fields which have been set are considered present.
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for key in fields:
+            setattr(self, key, fields[key])
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        try:
+            delattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def values(self):
+        return [getattr(self, key) for key in self.keys()]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def update(self, other):
+        for key in other:
+            self[key] = other[key]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if not hasattr(other, 'items'):
+            return False
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+class Point(_Item):
+    __slots__ = ('x', 'y', 'z', 'orientation')
+
+class Text(_Item):
+    __slots__ = ('reference', 'value', 'user', 'pos', 'layer', 'font', 'hide')
+
+class Line(_Item):
+    __slots__ = ('start', 'end', 'layer', 'width')
+
+class Circle(_Item):
+    __slots__ = ('center', 'end', 'layer', 'width')
+
+class Arc(_Item):
+    __slots__ = ('start', 'end', 'angle', 'layer', 'width')
+
+class Pad(_Item):
+    __slots__ = ('number', 'type', 'shape', 'pos', 'size', 'layers', 'rect_delta', 'drill',
+                 'die_length', 'clearance', 'solder_mask_margin', 'solder_paste_margin',
+                 'solder_paste_margin_ratio', 'zone_connect', 'thermal_width', 'thermal_gap',
+                 'options', 'primitives')
+
+class Model(_Item):
+    __slots__ = ('file', 'pos', 'scale', 'rotate')
+
 class KicadMod(object):
     """
     A class to parse kicad_mod files format of the KiCad
     """
-    def __init__(self, filename):
+    def __init__(self, filename, keep_sexpr=True):
         self.filename = filename
 
-        # read the s-expression data
-        f = open(filename)
-        sexpr_data = ''.join(f.readlines())
+        # read the s-expression data (the file may be located in a pack, see prettypack)
+        sexpr_data = readFootprint(filename)
 
         # parse s-expr
         sexpr_data = sexpr.parse_sexp(sexpr_data)
@@ -119,6 +216,18 @@ class KicadMod(object):
         # models
         self.models = self._getModels()
 
+        # the raw s-expression tree is not needed anymore after extraction,
+        # drop it to save memory when loading many footprints
+        if not keep_sexpr:
+            self.sexpr_data = None
+
+        # spatial index of the pads, built on first use
+        self._pad_index = None
+
+        # graphics and bounding boxes per layer, built on first use
+        self._layer_index = None
+        self._layer_bounds = {}
+
     # check if value exists in any element of data
     def _hasValue(self, data, value):
         for i in data:
@@ -186,12 +295,12 @@ class KicadMod(object):
         result = []
         for text in self._getArray(self.sexpr_data, 'fp_text'):
             if text[1] == which_text:
-                text_dict = {}
+                text_dict = Text()
                 text_dict[which_text] = text[2]
 
                 # text position
                 a = self._getArray(text, 'at')[0]
-                text_dict['pos'] = {'x':a[1], 'y':a[2], 'orientation':0}
+                text_dict['pos'] = Point(x=a[1], y=a[2], orientation=0)
                 if len(a) > 3: text_dict['pos']['orientation'] = a[3]
 
                 # text layer
@@ -234,13 +343,13 @@ class KicadMod(object):
     def _getLines(self, layer=None):
         lines = []
         for line in self._getArray(self.sexpr_data, 'fp_line'):
-            line_dict = {}
+            line_dict = Line()
             if self._hasValue(line, layer) or layer == None:
                 a = self._getArray(line, 'start')[0]
-                line_dict['start'] = {'x':a[1], 'y':a[2]}
+                line_dict['start'] = Point(x=a[1], y=a[2])
 
                 a = self._getArray(line, 'end')[0]
-                line_dict['end'] = {'x':a[1], 'y':a[2]}
+                line_dict['end'] = Point(x=a[1], y=a[2])
 
                 try:
                     a = self._getArray(line, 'layer')[0]
@@ -261,14 +370,14 @@ class KicadMod(object):
     def _getCircles(self, layer=None):
         circles = []
         for circle in self._getArray(self.sexpr_data, 'fp_circle'):
-            circle_dict = {}
+            circle_dict = Circle()
             # filter layers, None = all layers
             if self._hasValue(circle, layer) or layer == None:
                 a = self._getArray(circle, 'center')[0]
-                circle_dict['center'] = {'x':a[1], 'y':a[2]}
+                circle_dict['center'] = Point(x=a[1], y=a[2])
 
                 a = self._getArray(circle, 'end')[0]
-                circle_dict['end'] = {'x':a[1], 'y':a[2]}
+                circle_dict['end'] = Point(x=a[1], y=a[2])
 
                 try:
                     a = self._getArray(circle, 'layer')[0]
@@ -289,14 +398,14 @@ class KicadMod(object):
     def _getArcs(self, layer=None):
         arcs = []
         for arc in self._getArray(self.sexpr_data, 'fp_arc'):
-            arc_dict = {}
+            arc_dict = Arc()
             # filter layers, None = all layers
             if self._hasValue(arc, layer) or layer == None:
                 a = self._getArray(arc, 'start')[0]
-                arc_dict['start'] = {'x':a[1], 'y':a[2]}
+                arc_dict['start'] = Point(x=a[1], y=a[2])
 
                 a = self._getArray(arc, 'end')[0]
-                arc_dict['end'] = {'x':a[1], 'y':a[2]}
+                arc_dict['end'] = Point(x=a[1], y=a[2])
 
                 a = self._getArray(arc, 'angle')[0]
                 arc_dict['angle'] = a[1]
@@ -321,16 +430,16 @@ class KicadMod(object):
         pads = []
         for pad in self._getArray(self.sexpr_data, 'pad'):
             # number, type, shape
-            pad_dict = {'number':pad[1], 'type':pad[2], 'shape':pad[3]}
+            pad_dict = Pad(number=pad[1], type=pad[2], shape=pad[3])
 
             # position
             a = self._getArray(pad, 'at')[0]
-            pad_dict['pos'] = {'x':a[1], 'y':a[2], 'orientation':0}
+            pad_dict['pos'] = Point(x=a[1], y=a[2], orientation=0)
             if len(a) > 3: pad_dict['pos']['orientation'] = a[3]
 
             # size
             a = self._getArray(pad, 'size')[0]
-            pad_dict['size'] = {'x':a[1], 'y':a[2]}
+            pad_dict['size'] = Point(x=a[1], y=a[2])
 
             # layers
             a = self._getArray(pad, 'layers')[0]
@@ -482,22 +591,22 @@ class KicadMod(object):
 
         models = []
         for model in models_array:
-            model_dict = {'file':model[1]}
+            model_dict = Model(file=model[1])
 
             # position
             offset = self._getArray(model, 'at')
             if len(offset) < 1:
                 offset = self._getArray(model, 'offset')
             xyz = self._getArray(offset, 'xyz')[0]
-            model_dict['pos'] = {'x':xyz[1], 'y':xyz[2], 'z':xyz[3]}
+            model_dict['pos'] = Point(x=xyz[1], y=xyz[2], z=xyz[3])
 
             # scale
             xyz = self._getArray(self._getArray(model, 'scale'), 'xyz')[0]
-            model_dict['scale'] = {'x':xyz[1], 'y':xyz[2], 'z':xyz[3]}
+            model_dict['scale'] = Point(x=xyz[1], y=xyz[2], z=xyz[3])
 
             # rotate
             xyz = self._getArray(self._getArray(model, 'rotate'), 'xyz')[0]
-            model_dict['rotate'] = {'x':xyz[1], 'y':xyz[2], 'z':xyz[3]}
+            model_dict['rotate'] = Point(x=xyz[1], y=xyz[2], z=xyz[3])
 
             models.append(model_dict)
 
@@ -505,23 +614,24 @@ class KicadMod(object):
 
     # Add a 3D model
     def addModel(self, filename, pos=[0,0,0], scale=[1,1,1], rotate=[0,0,0]):
-        model_dict = {'file':filename}
+        model_dict = Model(file=filename)
         # position
-        model_dict['pos'] = {'x':pos[0], 'y':pos[1], 'z':pos[2]}
+        model_dict['pos'] = Point(x=pos[0], y=pos[1], z=pos[2])
         # scale
-        model_dict['scale'] = {'x':scale[0], 'y':scale[1], 'z':scale[2]}
+        model_dict['scale'] = Point(x=scale[0], y=scale[1], z=scale[2])
         # rotate
-        model_dict['rotate'] = {'x':rotate[0], 'y':rotate[1], 'z':rotate[2]}
+        model_dict['rotate'] = Point(x=rotate[0], y=rotate[1], z=rotate[2])
         self.models.append(model_dict)
 
     def addLine(self, start, end, layer, width):
-        line={
-               'start': {'x': start[0], 'y': start[1]},
-               'end': {'x': end[0], 'y': end[1]},
-               'layer': layer,
-               'width': width
-             }
+        line=Line(
+               start=Point(x=start[0], y=start[1]),
+               end=Point(x=end[0], y=end[1]),
+               layer=layer,
+               width=width
+             )
         self.lines.append( line)
+        self.geometryChanged()
 
     def addRectangle(self, start, end, layer, width):
         self.addLine( [ start[0], start[1] ], [ end[0], start[1] ], layer, width)
@@ -530,117 +640,106 @@ class KicadMod(object):
         self.addLine( [ end[0], end[1] ], [ start[0], end[1] ], layer, width)
 
 
-    def setAnchor(self, anchor_point):
-        # change reference position
-        self.reference['pos']['x'] -= anchor_point[0]
-        self.reference['pos']['y'] -= anchor_point[1]
+    # Must be called after pads or graphics have been added, removed, moved or resized
+    def geometryChanged(self):
+        self._pad_index = None
+        self._layer_index = None
+        self._layer_bounds = {}
 
-        # change value position
-        self.value['pos']['x'] -= anchor_point[0]
-        self.value['pos']['y'] -= anchor_point[1]
+    # All points which move with the footprint (text, graphics and pad positions)
+    def _footprintPoints(self):
+        points = [self.reference['pos'], self.value['pos']]
 
-        # change user text position
         for text in self.userText:
-            text['pos']['x'] -= anchor_point[0]
-            text['pos']['y'] -= anchor_point[1]
+            points.append(text['pos'])
 
-        # change lines position
         for line in self.lines:
-            line['start']['x'] -= anchor_point[0]
-            line['end']['x'] -= anchor_point[0]
-            line['start']['y'] -= anchor_point[1]
-            line['end']['y'] -= anchor_point[1]
+            points += [line['start'], line['end']]
 
-        # change circles position
         for circle in self.circles:
-            circle['center']['x'] -= anchor_point[0]
-            circle['end']['x'] -= anchor_point[0]
-            circle['center']['y'] -= anchor_point[1]
-            circle['end']['y'] -= anchor_point[1]
+            points += [circle['center'], circle['end']]
 
-        # change arcs position
         for arc in self.arcs:
-            arc['start']['x'] -= anchor_point[0]
-            arc['end']['x'] -= anchor_point[0]
-            arc['start']['y'] -= anchor_point[1]
-            arc['end']['y'] -= anchor_point[1]
+            points += [arc['start'], arc['end']]
 
-        # change pads positions
         for pad in self.pads:
-            pad['pos']['x'] -= anchor_point[0]
-            pad['pos']['y'] -= anchor_point[1]
+            points.append(pad['pos'])
+
+        # Each point only once, in case some are shared
+        unique = {}
+        for point in points:
+            unique[id(point)] = point
+
+        return list(unique.values())
+
+    def setAnchor(self, anchor_point):
+        # change positions of all texts, graphics and pads at once
+        points = self._footprintPoints()
+        moved = translatePoints([(p['x'], p['y']) for p in points], -anchor_point[0], -anchor_point[1])
+
+        for point, (x, y) in zip(points, moved):
+            point['x'] = x
+            point['y'] = y
 
         # change models
         for model in self.models:
             model['pos']['x'] -= anchor_point[0]/25.4
             model['pos']['y'] += anchor_point[1]/25.4
 
-
+        self.geometryChanged()
 
     def rotateFootprint(self, degrees):
-        # change reference position
-        self.reference['pos']=_rotatePoint(self.reference['pos'], degrees)
-
-        # change value position
-        self.value['pos']=_rotatePoint(self.value['pos'], degrees)
-
-        # change user text position
-        for text in self.userText:
-            text['pos']=_rotatePoint(text['pos'], degrees)
-
+        # change positions of all texts, graphics and pads at once
+        points = self._footprintPoints()
+        rotated = rotatePoints([(p['x'], p['y']) for p in points], degrees)
 
-        # change lines position
-        for line in self.lines:
-            line['start']=_rotatePoint(line['start'], degrees)
-            line['end']=_rotatePoint(line['end'], degrees)
-
-        # change circles position
-        for circle in self.circles:
-            circle['center']=_rotatePoint(circle['center'], degrees)
-            circle['end']=_rotatePoint(circle['end'], degrees)
-
-        # change arcs position
-        for arc in self.arcs:
-            arc['start']=_rotatePoint(arc['start'], degrees)
-            arc['end']=_rotatePoint(arc['end'], degrees)
-
-        # change pads positions
-        for pad in self.pads:
-            pad['pos']=_rotatePoint(pad['pos'], degrees)
+        for point, (x, y) in zip(points, rotated):
+            point['x'] = x
+            point['y'] = y
+            if 'orientation' in point:
+                point['orientation'] -= degrees
 
         # change models
         for model in self.models:
             model['pos']=_rotatePoint(model['pos'], -degrees)
             model['rotate']['z']=model['rotate']['z']-degrees
 
-    def filterLines(self, layer):
-        lines = []
-        for line in self.lines:
-            if line['layer'] == layer:
-                lines.append(line)
+        self.geometryChanged()
 
-        return lines
+    # Map of { layer : {'lines': [...], 'circles': [...], 'arcs': [...]} }
+    def _layerGraphs(self, layer):
+        if self._layer_index is None:
+            self._layer_index = {}
 
-    def filterCircles(self, layer):
-        circles = []
-        for circle in self.circles:
-            if circle['layer'] == layer:
-                circles.append(circle)
+            for key, graphs in [('lines', self.lines), ('circles', self.circles), ('arcs', self.arcs)]:
+                for graph in graphs:
+                    if not graph['layer'] in self._layer_index:
+                        self._layer_index[graph['layer']] = {'lines': [], 'circles': [], 'arcs': []}
+                    self._layer_index[graph['layer']][key].append(graph)
 
-        return circles
+        return self._layer_index.get(layer, {'lines': [], 'circles': [], 'arcs': []})
 
-    def filterArcs(self, layer):
-        arcs = []
-        for arc in self.arcs:
-            if arc['layer'] == layer:
-                arcs.append(arc)
+    def filterLines(self, layer):
+        return list(self._layerGraphs(layer)['lines'])
 
-        return arcs
+    def filterCircles(self, layer):
+        return list(self._layerGraphs(layer)['circles'])
+
+    def filterArcs(self, layer):
+        return list(self._layerGraphs(layer)['arcs'])
 
     # Return the geometric bounds for a given layer
     # Includes lines, arcs, circles
     def geometricBoundingBox(self, layer):
 
+        if not layer in self._layer_bounds:
+            self._layer_bounds[layer] = self._geometricBoundingBox(layer)
+
+        # Copy, so that the cached box can't be modified
+        return copy.copy(self._layer_bounds[layer])
+
+    def _geometricBoundingBox(self, layer):
+
         bb = BoundingBox()
 
         # Add all lines
@@ -667,35 +766,9 @@ class KicadMod(object):
         # Add all arcs
         arcs=self.filterArcs(layer)
         for c in arcs:
-            cx = c['start']['x']
-            cy = c['start']['y']
-            ex = c['end']['x']
-            ey = c['end']['y']
-
-            dx = ex - cx
-            dy = ey - cy
-
-            r = math.sqrt(dx*dx + dy*dy)
-
-            dalpha=1
-            alphaend=c['angle']
-            if math.fabs(alphaend)<1:
-                dalpha=math.fabs(alphaend)/5
-            if alphaend<0:
-                dalpha=-dalpha
-            if math.fabs(alphaend)>0:
-                a=0
-                c0=[ ex - cx, ey - cy ]
-                #print("c0 = ",c0)
-                while (alphaend>0 and a<=alphaend) or (alphaend<0 and a>=alphaend):
-                    c1=[0,0]
-                    c1[0]=math.cos(a/180*3.1415)*c0[0]-math.sin(a/180*3.1415)*c0[1]
-                    c1[1]=math.sin(a/180*3.1415)*c0[0]+math.cos(a/180*3.1415)*c0[1]
-
-                    bb.addPoint(cx + c1[0], cy + c1[1])
-                    a=a+dalpha
-
-            bb.addPoint(ex, None)
+            box = arcBoundingBox(c['start']['x'], c['start']['y'], c['end']['x'], c['end']['y'], c['angle'])
+            bb.addPoint(box[0], box[1])
+            bb.addPoint(box[2], box[3])
 
         return bb
 
@@ -713,6 +786,42 @@ class KicadMod(object):
 
         return pads
 
+    # Corners of the pad rectangle (including drill offset), as complex numbers
+    def padCorners(self, pad):
+        center = complex(pad['pos']['x'], pad['pos']['y'])
+        offset = 0 + 0j
+        if 'offset' in pad['drill']:
+            if 'x' in pad['drill']['offset']:
+                offset = complex(pad['drill']['offset']['x'], pad['drill']['offset']['y'])
+
+        sx = pad['size']['x'] / 2.0
+        sy = pad['size']['y'] / 2.0
+
+        corners = [complex(sx, sy), complex(-sx, -sy), complex(sx, -sy), complex(-sx, sy)]
+        corners = [c + center + offset for c in corners]
+
+        rotation = cmath.rect(1, cmath.pi / 180 * pad['pos']['orientation'])
+
+        return [(c - center) * rotation + center for c in corners]
+
+    # Bounding box (xmin, ymin, xmax, ymax) of a pad
+    # Covers the pad rectangle as well as a circle with diameter size x around the pad position
+    def padBoundingBox(self, pad):
+        box = boxOfPoints([(c.real, c.imag) for c in self.padCorners(pad)])
+
+        x = pad['pos']['x']
+        y = pad['pos']['y']
+        r = pad['size']['x'] / 2.0
+
+        return mergeBoxes(box, (x - r, y - r, x + r, y + r))
+
+    # Return all pads whose bounding box overlaps the given box, in pad order
+    def padsInBox(self, box):
+        if self._pad_index is None:
+            self._pad_index = GridIndex([self.padBoundingBox(pad) for pad in self.pads])
+
+        return [self.pads[i] for i in self._pad_index.query(box)]
+
     def filterPads(self, pad_type):
         pads = []
         for pad in self.pads:
@@ -750,25 +859,22 @@ class KicadMod(object):
         if pads == None:
             pads = self.pads
 
+        # Add each "corner" of the pads (even for oval shapes), for all pads at once
+        box = rectanglesBoundingBox([(pad['pos']['x'], pad['pos']['y'],
+                                      pad['size']['x'], pad['size']['y'],
+                                      -pad['pos']['orientation']) for pad in pads])
+        if box:
+            bb.addPoint(box[0], box[1])
+            bb.addPoint(box[2], box[3])
+
         for pad in pads:
             pos = pad['pos']
             px = pos['x']
             py = pos['y']
 
-            # Pad outer dimensions
-            sx = pad['size']['x']
-            sy = pad['size']['y']
-
             angle = -pad['pos']['orientation']
 
-            # Add each "corner" of the pad (even for oval shapes)
-
-            p1 = _rotatePoint({'x': -sx/2, 'y': -sy/2}, angle)
-            p2 = _rotatePoint({'x': -sx/2, 'y': +sy/2}, angle)
-            p3 = _rotatePoint({'x': +sx/2, 'y': +sy/2}, angle)
-            p4 = _rotatePoint({'x': +sx/2, 'y': -sy/2}, angle)
-
-            points = [p1, p2, p3, p4]
+            points = []
 
             # Add more points for custom pad shapes
             if pad['shape'] == 'custom':
@@ -791,9 +897,13 @@ class KicadMod(object):
                         points.append(_movePoint(e, {'x': +w/2, 'y': +w/2}))
                         points.append(_movePoint(e, {'x': +w/2, 'y': -w/2}))
                     elif p['type'] == 'gr_arc':
-                        # Add arc points
-                        # TODO
-                        pass
+                        # Add arc bounds
+                        c = _rotatePoint(p['start'], angle)
+                        e = _rotatePoint(p['end'], angle)
+                        w = p['width']
+                        box = arcBoundingBox(c['x'], c['y'], e['x'], e['y'], p['angle'])
+                        points.append({'x': box[0] - w/2, 'y': box[1] - w/2})
+                        points.append({'x': box[2] + w/2, 'y': box[3] + w/2})
                     elif p['type'] == 'gr_circle':
                         # Add circle points
                         c = _rotatePoint(p['center'], angle)
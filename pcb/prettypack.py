@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+Packed footprint libraries.
+
+A pack holds all footprints of a .pretty folder in a single file, so tools
+which read a whole library do one sequential read instead of opening
+thousands of small files. Footprints in a pack are addressed like files
+in a folder: Library.prettypack/Footprint.kicad_mod
+
+File layout:
+    magic (8 bytes) | index size (4 bytes, big endian) | index | data
+The index is JSON: a list of [name, offset, size, compressed] per footprint,
+offsets are relative to the start of the data. Compressed entries use zlib.
+
+Usage:
+    ./prettypack.py pack Library.pretty [-z]
+    ./prettypack.py unpack Library.prettypack
+    ./prettypack.py list Library.prettypack
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import struct
+import sys
+import zlib
+from glob import glob
+
+MAGIC = b'KIPACK01'
+PACK_EXTENSION = '.prettypack'
+FOOTPRINT_EXTENSION = '.kicad_mod'
+
+class PrettyPack(object):
+    """
+    Read only access to a pack, the whole file is read at once
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a footprint pack: '{f}'".format(f=filename))
+
+        start = len(MAGIC) + 4
+        index_size = struct.unpack('>I', data[len(MAGIC):start])[0]
+        index = json.loads(data[start:start + index_size].decode('utf-8'))
+
+        # names are joined into paths (see unpack), so only plain file names are accepted
+        for entry in index:
+            if not isPlainName(entry[0]):
+                raise ValueError("Invalid footprint name {n!r} in pack '{f}'".format(n=entry[0], f=filename))
+
+        self.data = data
+        self.data_start = start + index_size
+        self.index = dict((entry[0], entry[1:]) for entry in index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def names(self):
+        """
+        Sorted footprint names (without extension)
+        """
+        return sorted(self.index)
+
+    def readBytes(self, name):
+        """
+        Contents of a footprint file as stored
+        """
+        offset, size, compressed = self.index[name]
+        offset += self.data_start
+        data = self.data[offset:offset + size]
+        if compressed:
+            data = zlib.decompress(data)
+        return data
+
+    def read(self, name):
+        """
+        Contents of a footprint file as text (line endings converted like a file opened as text)
+        """
+        return self.readBytes(name).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def isPlainName(name):
+    """
+    Check if a footprint name is a plain file name (no folders, no '..')
+    """
+    return (isinstance(name, type(u'')) and name not in ['', '.', '..'] and
+            not any(c in name for c in ['/', '\\', '\0', ':']))
+
+# Opened packs by filename: (mtime, size, pack), so every pack is read only once
+# as long as the file is not changed
+_packs = {}
+
+def openPack(filename):
+    filename = os.path.abspath(filename)
+    stat = os.stat(filename)
+    key = (stat.st_mtime, stat.st_size)
+    if not filename in _packs or _packs[filename][:2] != key:
+        _packs[filename] = key + (PrettyPack(filename),)
+    return _packs[filename][2]
+
+def isPack(path):
+    return path.endswith(PACK_EXTENSION) and os.path.isfile(path)
+
+def isPacked(filename):
+    """
+    Check if a footprint path points into a pack
+    """
+    return isPack(os.path.dirname(filename))
+
+def openFootprint(filename, mode='r'):
+    """
+    Open a footprint file for reading, which may be located in a pack
+    """
+    if isPacked(filename):
+        name = os.path.basename(filename)[:-len(FOOTPRINT_EXTENSION)]
+        pack = openPack(os.path.dirname(filename))
+        if 'b' in mode:
+            return io.BytesIO(pack.readBytes(name))
+        return io.StringIO(pack.read(name))
+
+    return open(filename, mode)
+
+def readFootprint(filename):
+    """
+    Contents of a footprint file, which may be located in a pack
+    """
+    with openFootprint(filename) as f:
+        return f.read()
+
+def footprintSize(filename):
+    """
+    Size of a footprint file in bytes (as stored), which may be located in a pack
+    """
+    if isPacked(filename):
+        name = os.path.basename(filename)[:-len(FOOTPRINT_EXTENSION)]
+        return openPack(os.path.dirname(filename)).index[name][1]
+
+    return os.path.getsize(filename)
+
+def listFootprints(path):
+    """
+    Sorted paths of all footprints in a .pretty folder or a pack
+    """
+    if isPack(path):
+        return [os.path.join(path, name + FOOTPRINT_EXTENSION) for name in openPack(path).names()]
+
+    return sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(FOOTPRINT_EXTENSION))
+
+def findLibraries(paths):
+    """
+    Map of { library name : sorted list of paths } of all .pretty folders and packs
+    in the given paths. Paths can be .pretty folders, packs or folders containing them.
+    Libraries of the same name in different folders are all listed.
+    """
+    libs = {}
+
+    def add(name, path):
+        path = os.path.abspath(path)
+        if not path in libs.setdefault(name, []):
+            libs[name].append(path)
+
+    for path in paths:
+        for p in glob(path):
+            p = os.path.normpath(p)
+
+            if isPack(p):
+                add(os.path.basename(p)[:-len(PACK_EXTENSION)], p)
+                continue
+
+            if not os.path.isdir(p):
+                continue
+
+            if p.endswith('.pretty'):
+                add(os.path.basename(p)[:-7], p)
+                continue
+
+            for root, dirnames, filenames in os.walk(p):
+                for dirname in dirnames:
+                    if dirname.endswith('.pretty'):
+                        add(dirname[:-7], os.path.join(root, dirname))
+                for filename in filenames:
+                    if filename.endswith(PACK_EXTENSION):
+                        add(filename[:-len(PACK_EXTENSION)], os.path.join(root, filename))
+
+    for name in libs:
+        libs[name].sort()
+
+    return libs
+
+def pack(directory, filename, compress=False):
+    """
+    Pack all footprints of a .pretty folder into a single file.
+    Returns the number of footprints.
+    """
+    index = []
+    blobs = []
+    offset = 0
+
+    for path in listFootprints(directory):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        compressed = False
+        if compress:
+            packed = zlib.compress(data, 9)
+            if len(packed) < len(data):
+                data = packed
+                compressed = True
+
+        index.append([os.path.basename(path)[:-len(FOOTPRINT_EXTENSION)], offset, len(data), compressed])
+        blobs.append(data)
+        offset += len(data)
+
+    index = json.dumps(index, separators=(',', ':')).encode('utf-8')
+
+    with open(filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('>I', len(index)))
+        f.write(index)
+        for data in blobs:
+            f.write(data)
+
+    return len(blobs)
+
+def unpack(filename, directory):
+    """
+    Write all footprints of a pack into a folder.
+    Returns the number of footprints.
+    """
+    pack = PrettyPack(filename)
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    for name in pack.names():
+        with open(os.path.join(directory, name + FOOTPRINT_EXTENSION), 'wb') as f:
+            f.write(pack.readBytes(name))
+
+    return len(pack)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack footprint libraries (.pretty folders) into single files, or unpack them')
+    parser.add_argument('command', choices=['pack', 'unpack', 'list'])
+    parser.add_argument('libs', nargs='+', help='.pretty folders (pack) or packs (unpack, list)')
+    parser.add_argument('-o', '--output', help='Output folder (default = next to the input)')
+    parser.add_argument('-z', '--compress', help='Compress the footprints (pack)', action='store_true')
+
+    args = parser.parse_args()
+
+    for lib in args.libs:
+        lib = os.path.normpath(lib)
+        name = os.path.splitext(os.path.basename(lib))[0]
+        output = args.output or os.path.dirname(lib)
+
+        try:
+            if args.command == 'pack':
+                if not os.path.isdir(lib):
+                    raise ValueError("Not a folder: '{f}'".format(f=lib))
+                if output and not os.path.isdir(output):
+                    os.makedirs(output)
+                target = os.path.join(output, name + PACK_EXTENSION)
+                n = pack(lib, target, args.compress)
+                print("Packed {n} footprints into '{f}'".format(n=n, f=target))
+            elif args.command == 'unpack':
+                target = os.path.join(output, name + '.pretty')
+                n = unpack(lib, target)
+                print("Unpacked {n} footprints into '{f}'".format(n=n, f=target))
+            else:
+                for footprint in PrettyPack(lib).names():
+                    print(footprint)
+        except (OSError, IOError, ValueError) as e:
+            print("Error: {e}".format(e=e), file=sys.stderr)
+            sys.exit(1)
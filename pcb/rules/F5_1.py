@@ -5,6 +5,7 @@ from __future__ import division
 from rules.rule import *
 from rules.klc_constants import *
 import cmath
+from geometry import boxOfPoints, expandBox
 
 class Rule(KLCRule):
     """
@@ -71,35 +72,45 @@ class Rule(KLCRule):
             elif graph['width'] != KLC_SILK_WIDTH:
                 self.non_nominal_width.append(graph)
 
+    """
+    Pads which might intersect with a graphical item (silkscreen lines must
+    keep 0.075mm distance to the pads), taken from the spatial index of the pads
+    """
+    def padCandidates(self, graph):
+        if 'center' in graph:
+            center = complex(graph['center']['x'], graph['center']['y'])
+            radius = abs(complex(graph['end']['x'], graph['end']['y']) - center)
+            box = (center.real - radius, center.imag - radius, center.real + radius, center.imag + radius)
+        else:
+            box = boxOfPoints([(graph['start']['x'], graph['start']['y']), (graph['end']['x'], graph['end']['y'])])
+
+        return self.module.padsInBox(expandBox(box, 0.075 + 1e-6))
+
+    """
+    Rotated corners of a pad, computed once per pad
+    """
+    def padCorners(self, pad):
+        key = id(pad)
+        if not key in self.pad_corners:
+            self.pad_corners[key] = self.module.padCorners(pad)
+        return self.pad_corners[key]
+
     """
     Check if any of the silkscreen intersects
     with pads, etc
     """
     def checkIntersections(self):
 
-        module = self.module
+        self.pad_corners = {}
 
         for graph in (self.f_silk + self.b_silk):
             if 'angle' in graph:
                 #TODO
                 pass
             elif 'center' in graph:
-                for pad in module.pads:
+                for pad in self.padCandidates(graph):
                     padComplex = complex(pad['pos']['x'], pad['pos']['y'])
-                    padOffset = 0 + 0j
-                    if 'offset' in pad['drill']:
-                        if 'x' in pad['drill']['offset']:
-                            padOffset = complex(pad['drill']['offset']['x'], pad['drill']['offset']['y'])
-
-                    edgesPad = {}
-                    edgesPad[0] = complex(pad['size']['x'] / 2.0, pad['size']['y'] / 2.0) + padComplex + padOffset
-                    edgesPad[1] = complex(-pad['size']['x'] / 2.0, -pad['size']['y'] / 2.0) + padComplex + padOffset
-                    edgesPad[2] = complex(pad['size']['x'] / 2.0, -pad['size']['y'] / 2.0) + padComplex + padOffset
-                    edgesPad[3] = complex(-pad['size']['x'] / 2.0, pad['size']['y'] / 2.0) + padComplex + padOffset
-
-                    vectorR = cmath.rect(1, cmath.pi / 180 * pad['pos']['orientation'])
-                    for i in range(4):
-                        edgesPad[i] = (edgesPad[i] - padComplex) * vectorR + padComplex
+                    edgesPad = self.padCorners(pad)
 
                     centerComplex = complex(graph['center']['x'], graph['center']['y'])
                     endComplex = complex(graph['end']['x'], graph['end']['y'])
@@ -121,27 +132,14 @@ class Rule(KLCRule):
                         if edgesInside and edgesOutside:
                             self.intersections.append({'pad':pad, 'graph':graph})
             else:
-                for pad in module.pads:
+                for pad in self.padCandidates(graph):
 
                     # Skip checks on NPTH and Connect holes
                     if pad['type'] in ['np_thru_hole', 'connect']:
                         continue
 
                     padComplex = complex(pad['pos']['x'], pad['pos']['y'])
-                    padOffset = 0 + 0j
-                    if 'offset' in pad['drill']:
-                        if 'x' in pad['drill']['offset']:
-                            padOffset = complex(pad['drill']['offset']['x'], pad['drill']['offset']['y'])
-
-                    edgesPad = {}
-                    edgesPad[0] = complex(pad['size']['x'] / 2.0, pad['size']['y'] / 2.0) + padComplex + padOffset
-                    edgesPad[1] = complex(-pad['size']['x'] / 2.0, -pad['size']['y'] / 2.0) + padComplex + padOffset
-                    edgesPad[2] = complex(pad['size']['x'] / 2.0, -pad['size']['y'] / 2.0) + padComplex + padOffset
-                    edgesPad[3] = complex(-pad['size']['x'] / 2.0, pad['size']['y'] / 2.0) + padComplex + padOffset
-
-                    vectorR = cmath.rect(1, cmath.pi / 180 * pad['pos']['orientation'])
-                    for i in range(4):
-                        edgesPad[i] = (edgesPad[i] - padComplex) * vectorR + padComplex
+                    edgesPad = list(self.padCorners(pad))
 
                     startComplex = complex(graph['start']['x'], graph['start']['y'])
                     endComplex = complex(graph['end']['x'], graph['end']['y'])
@@ -323,3 +321,5 @@ class Rule(KLCRule):
                         graph['start']['y'] = round(padComplex.imag, 3)
                     elif (padMax > length and padMin < 0):
                         module.lines.remove(graph)
+
+            module.geometryChanged()
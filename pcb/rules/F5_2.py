@@ -242,7 +242,7 @@ class Rule(KLCRule):
 
             # Can't get fab outline? Use pads
             if not bounds.valid:
-                bounds = module.overpadsBounds()
+                bounds = self.analysis.overpadsBounds()
 
             if bounds.valid:
                 pos = bounds.center
@@ -26,7 +26,7 @@ class Rule(KLCRule):
     def getFootprintBounds(self):
         module = self.module
 
-        padBounds = module.overpadsBounds()
+        padBounds = self.analysis.overpadsBounds()
 
         # Try getting bounds from these layers, in order
         layers = ['F.Fab', 'B.Fab', 'F.SilkS', 'B.SilkS']
@@ -97,49 +97,16 @@ class Rule(KLCRule):
             return None
 
 
+    # Return the items of a layer which have unconnected endpoints
     def isClosed(self, layer):
-      def isSame(p1, p2, tolerance):
-        s = abs(p1['x'] - p2['x']) <= tolerance and abs(p1['y'] - p2['y']) <= tolerance
-        return s
-
-      # no line is considered as closed
-      if len(layer) == 0:
-        return []
-
-      # clone the lines, so we can remove them from the list
-      lines = layer[0:]
-      curr_line = lines.pop()
-      curr_point = getStartPoint(curr_line)
-      end_point = getEndPoint(curr_line)
-      tolerance = 0
-
-      while len(lines) > 0:
-        tolerance = 0
-        match = False
-        for line in lines:
-          if 'angle' in line or 'angle' in curr_line:
-            tolerance = 0.01
-          if isSame(curr_point, getStartPoint(line), tolerance):
-            curr_line = line
-            curr_point = getEndPoint(line)
-            lines.remove(line)
-            match = True
-            break
-          if isSame(curr_point, getEndPoint(line), tolerance):
-            curr_line = line
-            curr_point = getStartPoint(line)
-            lines.remove(line)
-            match = True
-            break
-        # we should hit a continue
-        # if now, that means no line connects
-        if not match:
-          return [curr_line]
-      # now check the if the last points match
-      if isSame(curr_point, end_point, tolerance):
-        return []
-      else:
-        return [curr_line]
+      contours = graphContours(layer)
+
+      unconnected = []
+      for item, point in contours.open_ends:
+        if not layer[item] in unconnected:
+          unconnected.append(layer[item])
+
+      return unconnected
 
     def check(self):
         """
@@ -262,6 +229,9 @@ class Rule(KLCRule):
             item['end']['x'] = mapToGrid(item['end']['x'], KLC_CRTYD_GRID)
             item['end']['y'] = mapToGrid(item['end']['y'], KLC_CRTYD_GRID)
 
+        if len(self.bad_grid) > 0:
+            module.geometryChanged()
+
         # create courtyard if does not exists
         if len(self.fCourtyard) + len(self.bCourtyard) == 0:
             self.info("No courtyard detected - adding default courtyard")
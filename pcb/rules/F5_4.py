@@ -2,12 +2,12 @@
 
 from __future__ import division
 
-
 # math and comments from Michal script
 # https://github.com/michal777/KiCad_Lib_Check
 
 from rules.klc_constants import *
 from rules.rule import *
+from geometry import collinearOverlaps, arcOverlaps
 
 class Rule(KLCRule):
     """
@@ -16,87 +16,33 @@ class Rule(KLCRule):
     def __init__(self, module, args):
         super(Rule, self).__init__(module, args, "Elements on the graphic layer should not overlap")
 
-    def getCirclesOverlap(self,circles):
-      def is_same(c1, c2):
-        if c1['end'] == c2['end'] and c1['center'] == c2['center']:
-          return True
-        return False 
-       
-      overlap = []
-      for c in circles:
-        for c2 in circles:
-          if c is c2:
-            continue
-          if is_same(c, c2):
-            if not c in overlap:
-              overlap.append(c)
-
-      return overlap
-
-    def getLinesOverlap(self,lines):
-      # from https://stackoverflow.com/questions/328107/how-can-you-determine-a-point-is-between-two-other-points-on-a-line-segment
-      def distance(a,b):
-        return math.sqrt((a['x'] - b['x'])**2 + (a['y'] - b['y'])**2)
-
-      def is_between(a,b,c):
-        # check if c is the same as a or b, then c is not between a or b
-        if c == b or c == a:
-          return False
-        # c is between a and b if in a virtual triangle the distances AC + BC = AB
-        ac = distance(a,c)
-        cb = distance(c,b)
-        ab = distance(a,b)
-        d = ac + cb - ab
-        return d < 0.0001
-
-      def is_same(l1, l2):
-        if (getStartPoint(l1) == getStartPoint(l2)) and (getEndPoint(l1) == getEndPoint(l2)):
-          return True
-        if (getStartPoint(l1) == getEndPoint(l2)) and (getEndPoint(l1) == getStartPoint(l2)):
-          return True
-        return False
-
-      overlap = []
-      directions = {}
-      # sort lines by colinearity
+    def getArcsOverlap(self, graphs):
+      """
+      Circles and arcs which overlap another circle or arc (same center and radius)
+      """
+      arcs = []
+      for graph in graphs:
+        cx = graph['center']['x'] if 'center' in graph else graph['start']['x']
+        cy = graph['center']['y'] if 'center' in graph else graph['start']['y']
+        ex = graph['end']['x']
+        ey = graph['end']['y']
+        start = math.degrees(math.atan2(ey - cy, ex - cx))
+        sweep = graph['angle'] if 'angle' in graph else 360
+        arcs.append((cx, cy, math.hypot(ex - cx, ey - cy), start, sweep))
+
+      return [graphs[i] for i in arcOverlaps(arcs)]
+
+    def getLinesOverlap(self, lines):
+      """
+      Lines which overlap another collinear line (touching ends are fine)
+      """
+      segments = []
       for line in lines:
         start = getStartPoint(line)
         end = getEndPoint(line)
+        segments.append(((start['x'], start['y']), (end['x'], end['y'])))
 
-        if not start or not end:
-          # not sure if that can happen?
-          continue
-
-        dx = start['x'] - end['x']
-        dy = start['y'] - end['y']
-        line['l'] = distance(start, end)
-        if dx == 0:
-          d = 'h'
-        elif dy == 0:
-          d = 'v'
-        else:
-          d = round(dx/dy, 3)
-
-        if not d in directions:
-          directions[d] = []
-        directions[d].append(line)
-
-      for d, lines in directions.items():
-        for line in lines:
-          for line2 in lines:
-            if line is line2:
-              continue
-            if is_same(line, line2):
-              if not line in overlap:
-                overlap.append(line)
-                lines.remove(line)
-            if is_between(line['start'], line['end'], line2['start']):
-              if not line in overlap:
-                overlap.append(line)
-                lines.remove(line)
-
-      return overlap
-
+      return [lines[i] for i in collinearOverlaps(segments)]
 
     def check(self):
         """
@@ -114,7 +60,7 @@ class Rule(KLCRule):
         for layer in layers_to_check:
             self.overlaps[layer] = []
             self.overlaps[layer].extend(self.getLinesOverlap(module.filterLines(layer)))
-            self.overlaps[layer].extend(self.getCirclesOverlap(module.filterCircles(layer)))
+            self.overlaps[layer].extend(self.getArcsOverlap(module.filterCircles(layer) + module.filterArcs(layer)))
 
             # Display message if silkscreen has overlapping lines
             if len(self.overlaps[layer]) > 0:
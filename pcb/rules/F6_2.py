@@ -27,7 +27,7 @@ class Rule(KLCRule):
         if 'F6_2' in module.ruleExclude:
             return False
 
-        center = module.padMiddlePosition()
+        center = self.analysis.padMiddlePosition()
 
         err = False
 
@@ -53,6 +53,6 @@ class Rule(KLCRule):
         if self.check():
             self.info("Footprint anchor fixed")
 
-            center = module.padMiddlePosition()
+            center = self.analysis.padMiddlePosition()
 
             module.setAnchor([center['x'], center['y']])
@@ -139,7 +139,7 @@ class Rule(KLCRule):
         """
         module = self.module
 
-        return self.checkPads(module.filterPads("smd"))
+        return self.checkPads(self.analysis.filterPads("smd"))
 
     def fix(self):
         """
@@ -48,6 +48,6 @@ class Rule(KLCRule):
         """
         module = self.module
 
-        for pad in module.filterPads('thru_hole'):
+        for pad in self.analysis.filterPads('thru_hole'):
             self.info("Pad {n} - Setting required layers for THT pad".format(n=pad['number']))
             pad['layers'] = self.required_layers
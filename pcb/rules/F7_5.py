@@ -74,7 +74,7 @@ class Rule(KLCRule):
         """
         module = self.module
 
-        return any([self.checkPad(pad) for pad in module.filterPads('thru_hole')])
+        return any([self.checkPad(pad) for pad in self.analysis.filterPads('thru_hole')])
 
     def fix(self):
         """
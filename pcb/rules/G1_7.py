@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from rules.rule import *
+from prettypack import openFootprint
 import platform
 
 class Rule(KLCRule):
@@ -14,7 +15,7 @@ class Rule(KLCRule):
 
         # Only perform this check on linux systems (i.e. Travis)
         # Windows automatically checks out with CR+LF line endings
-        if 'linux' in platform.platform().lower() and not checkLineEndings(self.module.filename):
+        if 'linux' in platform.platform().lower() and not checkLineEndings(self.module.filename, openFootprint):
             self.error("Incorrect line endings")
             self.errorExtra("Library files must use Unix-style line endings (LF)")
             return True
@@ -5,6 +5,7 @@ import string
 import sys, os
 import math
 import re
+import copy
 
 common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
 
@@ -12,6 +13,7 @@ if not common in sys.path:
     sys.path.append(common)
 
 from rulebase import *
+from geometry import buildContours
 
 def mapToGrid(dimension, grid):
     return round(dimension / grid) * grid
@@ -60,6 +62,25 @@ def getEndPoint(graph):
     else:
         return None
 
+# Link graph items (lines, arcs) into contours by their endpoints
+# Circles are closed contours by themselves
+# Endpoints of lines must match exactly, endpoints of arcs (computed from the
+# angle) are connected to other items within arc_tolerance
+# Items of the result refer to the index in the graphs list (see geometry.buildContours)
+def graphContours(graphs, arc_tolerance=0.01):
+    segments = []
+    tolerances = []
+    for graph in graphs:
+        if 'center' in graph:
+            segments.append(None)
+        else:
+            start = getStartPoint(graph)
+            end = getEndPoint(graph)
+            segments.append(((start['x'], start['y']), (end['x'], end['y'])))
+        tolerances.append(arc_tolerance if 'angle' in graph else 0)
+
+    return buildContours(segments, arc_tolerance, tolerances)
+
 # Display string for a graph item
 # Line / Arc / Circle
 def graphItemString(graph, layer=False, width=False):
@@ -101,6 +122,28 @@ def graphItemString(graph, layer=False, width=False):
 
     return shapeText + layerText + widthText
 
+class FootprintAnalysis(AnalysisContext):
+    """
+    Data derived from a footprint, shared by all rules (see AnalysisContext)
+    Returned lists and bounding boxes are copies, so they may be modified.
+    """
+
+    def overpadsBounds(self):
+        return copy.copy(self.get('overpads_bounds', self.item.overpadsBounds))
+
+    def padsBounds(self):
+        return copy.copy(self.get('pads_bounds', self.item.padsBounds))
+
+    def padMiddlePosition(self):
+        return dict(self.get('pad_middle', self.item.padMiddlePosition))
+
+    # Pads of the given type, sorted by number (see KicadMod.filterPads)
+    def filterPads(self, pad_type):
+        return list(self.get('pads', self.item.filterPads, pad_type))
+
+    def padCount(self, pad_type):
+        return len(self.get('pads', self.item.filterPads, pad_type))
+
 class KLCRule(KLCRuleBase):
     """
     A base class to represent a KLC rule
@@ -110,6 +153,7 @@ class KLCRule(KLCRuleBase):
         KLCRuleBase.__init__(self, description)
     
         self.module = module
+        self.analysis = FootprintAnalysis.attach(module)
         self.args = args
         self.needsFixMore=False
 
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of the footprint fingerprints (fingerprint.py). Run with pytest.
+"""
+
+import os
+import sys
+
+common = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+if not common in sys.path:
+    sys.path.append(common)
+
+from fingerprint import FootprintInfo, canonicalFootprint, contentHash
+from kicad_mod import KicadMod
+
+FOOTPRINT = """(module R_0805 (layer F.Cu) (tedit 5A02FF1E)
+  (descr "Resistor SMD 0805")
+  (tags "resistor 0805")
+  (attr smd)
+  (fp_text reference REF** (at 0 -1.65) (layer F.SilkS)
+    (effects (font (size 1 1) (thickness 0.15)))
+  )
+  (fp_text value R_0805 (at 0 1.65) (layer F.Fab)
+    (effects (font (size 1 1) (thickness 0.15)))
+  )
+  (fp_line (start -1 -0.62) (end 1 -0.62) (layer F.Fab) (width 0.1))
+  (fp_line (start 1 0.62) (end -1 0.62) (layer F.Fab) (width 0.1))
+  (fp_line (start -1.68 0.95) (end -1.68 -0.95) (layer F.CrtYd) (width 0.05))
+  (fp_arc (start 0 0) (end 1 0) (angle 90) (layer F.Fab) (width 0.1))
+  (fp_circle (center 0 0) (end 0.3 0) (layer F.SilkS) (width 0.12))
+  (pad 1 smd rect (at -0.95 0) (size 0.7 1.3) (layers F.Cu F.Paste F.Mask))
+  (pad 2 smd rect (at 0.95 0) (size 0.7 1.3) (layers F.Cu F.Paste F.Mask))
+  (pad "" np_thru_hole circle (at 0 0) (size 1 1) (drill 1) (layers *.Cu *.Mask))
+  (model ${KISYS3DMOD}/Resistor_SMD.3dshapes/R_0805.wrl
+    (at (xyz 0 0 0))
+    (scale (xyz 1 1 1))
+    (rotate (xyz 0 0 0))
+  )
+)
+"""
+
+def variant(*replacements):
+    text = FOOTPRINT
+    for old, new in replacements:
+        assert old in text
+        text = text.replace(old, new)
+    return text
+
+def footprintInfo(tmp_path, text, name='R_0805'):
+    filename = str(tmp_path / (name + '.kicad_mod'))
+    with open(filename, 'w') as f:
+        f.write(text)
+    return FootprintInfo(filename)
+
+PAD_1 = '(pad 1 smd rect (at -0.95 0) (size 0.7 1.3) (layers F.Cu F.Paste F.Mask))'
+PAD_2 = '(pad 2 smd rect (at 0.95 0) (size 0.7 1.3) (layers F.Cu F.Paste F.Mask))'
+LINE = '(fp_line (start -1 -0.62) (end 1 -0.62) (layer F.Fab) (width 0.1))'
+
+def test_same_fingerprint(tmp_path):
+    base = footprintInfo(tmp_path, FOOTPRINT)
+    assert base.error is None and base.name == 'R_0805'
+
+    # formatting, number format and the order of pads and graphics don't matter
+    same = [
+        variant(('\n  ', '\n\t')),
+        variant(('(at -0.95 0)', '(at -0.950 0.0)'), ('(width 0.1)', '(width 0.10)')),
+        variant((PAD_1, 'PAD'), (PAD_2, PAD_1), ('PAD', PAD_2)),
+        variant((LINE + '\n', ''), ('  (fp_circle', '  ' + LINE + '\n  (fp_circle')),
+        ]
+
+    for text in same:
+        assert footprintInfo(tmp_path, text).changedSections(base) == []
+
+def test_changed_sections(tmp_path):
+    base = footprintInfo(tmp_path, FOOTPRINT)
+
+    changes = [
+        (variant(('(at 0.95 0)', '(at 1 0)')), ['pads']),
+        (variant(('(size 0.7 1.3) (layers F.Cu F.Paste F.Mask))\n  (pad ""', '(size 0.7 1.4) (layers F.Cu F.Paste F.Mask))\n  (pad ""')), ['pads']),
+        (variant(('(end 1 -0.62)', '(end 1.1 -0.62)')), ['graphics']),
+        (variant(('(angle 90)', '(angle 180)')), ['graphics']),
+        (variant(('R_0805.wrl', 'R_0603.wrl')), ['models']),
+        (variant(('(at 0 -1.65)', '(at 0 -1.7)')), ['text']),
+        (variant(('"Resistor SMD 0805"', '"Resistor"')), ['properties']),
+        (variant(('(attr smd)', '(attr virtual)')), ['properties']),
+        (variant(('(at 0.95 0)', '(at 1 0)'), ('(end 1 -0.62)', '(end 1.1 -0.62)')), ['pads', 'graphics']),
+        ]
+
+    for text, sections in changes:
+        assert footprintInfo(tmp_path, text).changedSections(base) == sections, sections
+
+def test_pad_changes(tmp_path):
+    base = footprintInfo(tmp_path, FOOTPRINT)
+
+    # pads without number are not compared
+    assert footprintInfo(tmp_path, variant(('(at 0 0) (size 1 1)', '(at 1 1) (size 1 1)'))).padChanges(base) == {'moved': 0, 'missing': 0}
+
+    assert footprintInfo(tmp_path, FOOTPRINT).padChanges(base) == {'moved': 0, 'missing': 0}
+    assert footprintInfo(tmp_path, variant(('(at 0.95 0)', '(at 1 0)'))).padChanges(base) == {'moved': 1, 'missing': 0}
+    assert footprintInfo(tmp_path, variant(('(pad 2 ', '(pad 3 '))).padChanges(base) == {'moved': 0, 'missing': 1}
+    assert footprintInfo(tmp_path, variant(('(pad 1 ', '(pad 2 '))).padChanges(base) == {'moved': 1, 'missing': 1}
+
+    # swapped pad numbers
+    swapped = footprintInfo(tmp_path, variant(('(pad 1 ', '(pad X '), ('(pad 2 ', '(pad 1 '), ('(pad X ', '(pad 2 ')))
+    assert swapped.padChanges(base) == {'moved': 2, 'missing': 0}
+    assert swapped.changedSections(base) == ['pads']
+
+    # more pads of the same number (e.g. thermal vias) in any order
+    via = PAD_2.replace('(at 0.95 0)', '(at 0.95 0.5)')
+    extra = footprintInfo(tmp_path, variant((PAD_2, PAD_2 + '\n  ' + via)))
+    reordered = footprintInfo(tmp_path, variant((PAD_2, via + '\n  ' + PAD_2)))
+    assert extra.padChanges(base) == {'moved': 1, 'missing': 0}
+    assert reordered.padChanges(extra) == {'moved': 0, 'missing': 0}
+
+def test_parse_error(tmp_path):
+    broken = footprintInfo(tmp_path, '(module R_0805 (layer F.Cu)')
+    assert broken.error is not None
+    assert broken.fingerprint == {} and broken.pads == {}
+
+def canonicalHash(tmp_path, text, name='R_0805'):
+    filename = str(tmp_path / (name + '.kicad_mod'))
+    with open(filename, 'w') as f:
+        f.write(text)
+    return contentHash(canonicalFootprint(KicadMod(filename, keep_sexpr=False)))
+
+def test_canonical_footprint(tmp_path):
+    base = canonicalHash(tmp_path, FOOTPRINT)
+
+    # copies of a footprint under another name, drawn in another way
+    same = [
+        variant(('R_0805', 'R_0805_Copy'), ('"Resistor SMD 0805"', '"Copy"'), ('"resistor 0805"', '""')),
+        variant((PAD_1, 'PAD'), (PAD_2, PAD_1), ('PAD', PAD_2)),
+        variant((LINE, '(fp_line (start 1 -0.62) (end -1 -0.62) (layer F.Fab) (width 0.1))')),
+        variant(('(at -0.95 0)', '(at -0.9501 0)')),
+        variant(('(fp_arc (start 0 0) (end 1 0) (angle 90)', '(fp_arc (start 0 0) (end 0 1) (angle -90)')),
+        variant(('(fp_circle (center 0 0) (end 0.3 0)', '(fp_circle (center 0 0) (end 0 -0.3)')),
+        variant(('(at 0.95 0) (size 0.7 1.3)', '(at 0.95 0 90) (size 1.3 0.7)')),
+        variant(('(at 0.95 0) (size 0.7 1.3)', '(at 0.95 0 180) (size 0.7 1.3)')),
+        variant(('(layers *.Cu *.Mask)', '(layers F&B.Cu *.Mask *.Mask)')),
+        ]
+
+    for i, text in enumerate(same):
+        assert canonicalHash(tmp_path, text, 'Same{i}'.format(i=i)) == base, i
+
+    different = [
+        variant(('(at 0.95 0)', '(at 0.96 0)')),
+        variant(('(pad 2 ', '(pad 3 ')),
+        variant(('(at 0.95 0) (size 0.7 1.3)', '(at 0.95 0 45) (size 0.7 1.3)')),
+        variant(('(layer F.CrtYd)', '(layer B.CrtYd)')),
+        variant(('(angle 90)', '(angle -90)')),
+        variant(('(at 0 -1.65)', '(at 0 -1.7)')),
+        variant(('(attr smd)', '(attr virtual)')),
+        ]
+
+    for i, text in enumerate(different):
+        assert canonicalHash(tmp_path, text, 'Different{i}'.format(i=i)) != base, i
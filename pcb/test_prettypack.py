@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of packed footprint libraries (prettypack.py). Run with pytest.
+"""
+
+import json
+import os
+import struct
+import sys
+
+import pytest
+
+common = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+if not common in sys.path:
+    sys.path.append(common)
+
+from prettypack import PrettyPack, MAGIC, pack, unpack, openFootprint, readFootprint, footprintSize
+from prettypack import listFootprints, findLibraries, isPacked
+from kicad_mod import KicadMod
+
+FOOTPRINT = """(module {name} (layer F.Cu) (tedit 5A02FF1E)
+  (descr "Resistor SMD 0805")
+  (fp_text reference REF** (at 0 -1.65) (layer F.SilkS)
+    (effects (font (size 1 1) (thickness 0.15)))
+  )
+  (fp_text value {name} (at 0 1.65) (layer F.Fab)
+    (effects (font (size 1 1) (thickness 0.15)))
+  )
+  (fp_line (start -1.68 0.95) (end -1.68 -0.95) (layer F.CrtYd) (width 0.05))
+  (fp_arc (start 0 0) (end 1 0) (angle 90) (layer F.Fab) (width 0.1))
+  (pad 1 smd rect (at -0.95 0) (size 0.7 1.3) (layers F.Cu F.Paste F.Mask))
+  (pad 2 smd rect (at 0.95 0) (size 0.7 1.3) (layers F.Cu F.Paste F.Mask))
+)
+"""
+
+def writeLibrary(directory, names, newline='\n'):
+    os.makedirs(directory)
+    for name in names:
+        with open(os.path.join(directory, name + '.kicad_mod'), 'wb') as f:
+            f.write(FOOTPRINT.format(name=name).replace('\n', newline).encode('utf-8'))
+
+def readBytes(filename):
+    with open(filename, 'rb') as f:
+        return f.read()
+
+@pytest.mark.parametrize('compress', [False, True])
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_round_trip(tmp_path, compress, newline):
+    library = str(tmp_path / 'Test.pretty')
+    filename = str(tmp_path / 'Test.prettypack')
+    names = ['R_0603', 'R_0805', 'R_1206_Metric']
+    writeLibrary(library, names, newline)
+
+    assert pack(library, filename, compress) == 3
+    assert unpack(filename, str(tmp_path / 'out')) == 3
+
+    for name in names:
+        original = os.path.join(library, name + '.kicad_mod')
+        packed = os.path.join(filename, name + '.kicad_mod')
+
+        # bytes as stored, text like a file opened as text
+        assert readBytes(os.path.join(str(tmp_path / 'out'), name + '.kicad_mod')) == readBytes(original)
+        assert openFootprint(packed, 'rb').read() == readBytes(original)
+        assert readFootprint(packed) == readFootprint(original)
+        assert footprintSize(packed) == (os.path.getsize(original) if not compress else PrettyPack(filename).index[name][1])
+
+        assert isPacked(packed) and not isPacked(original)
+        assert KicadMod(packed).__dict__.keys() == KicadMod(original).__dict__.keys()
+        assert KicadMod(packed).pads == KicadMod(original).pads
+
+    assert [os.path.basename(f) for f in listFootprints(filename)] == [os.path.basename(f) for f in listFootprints(library)]
+
+def test_find_libraries(tmp_path):
+    writeLibrary(str(tmp_path / 'a' / 'Test.pretty'), ['R_0805'])
+    writeLibrary(str(tmp_path / 'b' / 'Other.pretty'), ['R_0805'])
+    pack(str(tmp_path / 'b' / 'Other.pretty'), str(tmp_path / 'b' / 'Test.prettypack'))
+
+    libs = findLibraries([str(tmp_path)])
+    assert libs == {
+        'Test': [str(tmp_path / 'a' / 'Test.pretty'), str(tmp_path / 'b' / 'Test.prettypack')],
+        'Other': [str(tmp_path / 'b' / 'Other.pretty')],
+        }
+    assert findLibraries([str(tmp_path / 'b' / 'Test.prettypack')]) == {'Test': [str(tmp_path / 'b' / 'Test.prettypack')]}
+
+def test_changed_pack(tmp_path):
+    library = str(tmp_path / 'Test.pretty')
+    filename = str(tmp_path / 'Test.prettypack')
+    writeLibrary(library, ['R_0805'])
+    pack(library, filename)
+
+    assert len(listFootprints(filename)) == 1
+
+    # a rewritten pack is read again
+    writeLibrary(str(tmp_path / 'New.pretty'), ['R_0603', 'R_0805'])
+    pack(str(tmp_path / 'New.pretty'), filename)
+    assert len(listFootprints(filename)) == 2
+
+def writePack(filename, names):
+    index = json.dumps([[name, 0, 0, False] for name in names]).encode('utf-8')
+    with open(filename, 'wb') as f:
+        f.write(MAGIC + struct.pack('>I', len(index)) + index)
+
+@pytest.mark.parametrize('name', ['', '.', '..', '../R', 'a/R', 'a\\R', '/R', 'C:R', 'R\0'])
+def test_invalid_names(tmp_path, name):
+    filename = str(tmp_path / 'Bad.prettypack')
+    writePack(filename, ['R', name])
+
+    with pytest.raises(ValueError):
+        unpack(filename, str(tmp_path / 'out'))
+
+    assert not os.path.exists(str(tmp_path / 'out'))
+    assert not os.path.exists(str(tmp_path / 'R.kicad_mod'))
+
+def test_not_a_pack(tmp_path):
+    filename = str(tmp_path / 'Bad.prettypack')
+    with open(filename, 'wb') as f:
+        f.write(b'(module R)')
+
+    with pytest.raises(ValueError):
+        PrettyPack(filename)
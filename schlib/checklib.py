@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import multiprocessing
 import sys, os
 
 common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
@@ -14,9 +15,12 @@ from schlib import *
 from print_color import *
 import re
 from rules import __all__ as all_rules
-from rules import *
-from rules.rule import KLCRule
-from rulebase import logError
+from rules.rule import KLCRule, SymbolAnalysis
+from pintable import LazyPinTable
+from rulebase import RuleRegistry
+from klcengine import KLCEngine, ItemSource, LogSink, ReportSink, parseShard, loadTimings
+from filewatcher import FileWatcher
+from parsecache import load_cached
 
 #enable windows wildcards
 from glob import glob
@@ -33,142 +37,250 @@ parser.add_argument('-v', '--verbose', help='Enable verbose output. -v shows bri
 parser.add_argument('-s', '--silent', help='skip output for symbols passing all checks', action='store_true')
 parser.add_argument('-l', '--log', help='Path to JSON file to log error information')
 parser.add_argument('-w', '--nowarnings', help='Hide warnings (only show errors)', action='store_true')
+parser.add_argument('--watch', help='Keep running and re-check symbols whenever the library files change', action='store_true')
+parser.add_argument('--watch-interval', help='Polling interval in seconds for --watch (default = 0.5)', type=float, default=0.5)
+parser.add_argument('-j', '--jobs', help='Number of processes used for checking libraries (default = number of CPUs)', type=int, default=multiprocessing.cpu_count())
+parser.add_argument('--shard', help='Only check shard K of N of the libraries (e.g. 2/4), the shards are balanced by file size or by --shard-timings', type=parseShard)
+parser.add_argument('--shard-timings', help='JSON report of a previous run (see --report), its timings are used to balance the shards')
+parser.add_argument('--report', help='Path to JSON file to write a report to, the reports of all shards are combined by merge_results.py')
 parser.add_argument('--footprints', help='Path to footprint libraries (.pretty dirs). Specify with e.g. "~/kicad/footprints/"')
 
-args = parser.parse_args()
-
-printer = PrintColor(use_color = not args.nocolor)
-
-# Set verbosity globally
-verbosity = 0
-if args.verbose:
-    verbosity = args.verbose
-
-KLCRule.verbosity = verbosity
-
-if args.rule:
-    selected_rules = args.rule.split(',')
-else:
-    #ALL rules are used
-    selected_rules = None
-
-if args.exclude:
-    excluded_rules = args.exclude.split(',')
-else:
-    excluded_rules = None
-
-rules = []
-
-for r in all_rules:
-    r_name = r.replace('_', '.')
-    if selected_rules == None or r_name in selected_rules:
-        if excluded_rules == None or r_name not in excluded_rules:
-            rules.append(globals()[r].Rule)
-
-#grab list of libfiles (even on windows!)
-libfiles = []
-
-if len(all_rules)<=0:
-    printer.red("No rules selected for check!")
-    sys.exit(1)
-else:
-    if (verbosity>2):
-        printer.regular("checking rules:")
-        for rule in all_rules:
-            printer.regular("  - "+str(rule))
-        printer.regular("")
-
-for libfile in args.libfiles:
-    libfiles += glob(libfile)
-
-if len(libfiles) == 0:
-    printer.red("File argument invalid: {f}".format(f=args.libfiles))
-    sys.exit(1)
-
-exit_code = 0
-
-for libfile in libfiles:
-    lib = SchLib(libfile)
-
+def libName(libfile):
     # Remove .lib from end of name
-    lib_name = os.path.basename(libfile)[:-4]
+    return os.path.basename(libfile)[:-4]
 
-    n_components = 0
+def componentChecksum(component):
+    """
+    Checksum of everything the rules look at: the symbol definition and
+    the documentation of the symbol and its aliases
+    """
+    return component.checksum + str(component.documentation) + str(component.aliases)
 
-    # Print library name
-    if len(libfiles) > 1:
-        printer.purple('Library: %s' % libfile)
+class SymbolSource(ItemSource):
+    """
+    The (matching) symbols of .lib files
+    """
 
-    n_allviolations=0
+    kind = 'symbol'
 
-    for component in lib.components:
+    def __init__(self, args, printer, footprints_dir):
+        self.args = args
+        self.printer = printer
+        self.footprints_dir = footprints_dir
 
-        #simple match
-        match = True
-        if args.component:
-            match = match and args.component.lower() == component.name.lower()
+        # Print the library name before its symbols
+        self.print_name = False
 
-        #regular expression match
-        if args.pattern:
-            match = match and re.search(args.pattern, component.name, flags=re.IGNORECASE)
+        # Skip symbols whose checksum did not change since the previous run
+        self.only_changed = False
 
-        if not match: continue
+        # Per library map of { component name : checksum } from the last run
+        self.checksums = {}
 
-        n_components += 1
+    def libraryName(self, libfile):
+        return libName(libfile)
 
-        # check the rules
-        n_violations = 0
+    def load(self, libfile):
+        args = self.args
 
-        first = True
+        lib = load_cached(libfile)
 
-        for rule in rules:
-            rule = rule(component)
+        previous = self.checksums.get(libfile, {})
+        self.checksums[libfile] = {}
 
-            if args.footprints:
-                rule.footprints_dir = args.footprints.split(",")
-            else:
-                rule.footprints_dir = []
+        # Print library name
+        if self.print_name or self.only_changed:
+            self.printer.purple('Library: %s' % libfile)
 
-            if verbosity > 2:
-                printer.white("checking rule" + rule.name)
+        # Pin table of the whole library, shared by the rules of all symbols.
+        # It is only built if a selected rule asks for it (S4.1)
+        pin_table = LazyPinTable(lib.components)
 
-            rule.check()
+        components = []
 
-            if args.nowarnings and not rule.hasErrors():
-                continue
+        for index, component in enumerate(lib.components):
 
-            if rule.hasOutput():
-                if first:
-                    printer.green("Checking symbol '{sym}':".format(sym=component.name))
-                    first = False
+            #simple match
+            match = True
+            if args.component:
+                match = match and args.component.lower() == component.name.lower()
 
-                printer.yellow("Violating " + rule.name, indentation=2)
-                rule.processOutput(printer, verbosity, args.silent)
+            #regular expression match
+            if args.pattern:
+                match = match and re.search(args.pattern, component.name, flags=re.IGNORECASE)
 
-            # Specifically check for errors
-            if rule.hasErrors():
-                n_violations += rule.errorCount
+            if not match: continue
 
-                if args.log:
-                    logError(args.log, rule.name, lib_name, component.name)
+            checksum = componentChecksum(component)
+            self.checksums[libfile][component.name] = checksum
 
-                if args.fix:
-                    rule.fix()
-                    rule.processOutput(printer, verbosity, args.silent)
-                    rule.recheck()
-
-        # No messages?
-        if first:
-            if not args.silent:
-                printer.green("Checking symbol '{sym}' - No errors".format(sym=component.name))
-
-        # check the number of violations
-        if n_violations > 0:
-            exit_code += 1
-        n_allviolations=n_allviolations+n_violations
-
-    if args.fix and n_allviolations > 0:
-        lib.save()
-        printer.green("saved '{file}' with fixes for {n_violations} violations.".format(file=libfile, n_violations=n_allviolations))
+            if self.only_changed and previous.get(component.name) == checksum:
+                continue
 
-sys.exit(exit_code);
+            SymbolAnalysis.attach(component).setPinTable(pin_table, index)
+
+            components.append(component)
+
+        self.previous = previous
+
+        return lib, components
+
+    def createRule(self, rule, component):
+        rule = rule(component)
+        rule.footprints_dir = self.footprints_dir
+        return rule
+
+    def finish(self, libfile, lib, components, n_violations):
+        if self.only_changed:
+            for name in self.previous:
+                if name not in self.checksums[libfile]:
+                    self.printer.red("Removed symbol '{sym}'".format(sym=name))
+            if len(components) == 0:
+                self.printer.regular("No symbols changed")
+
+        if self.args.fix and n_violations > 0:
+            lib.save()
+            self.printer.green("saved '{file}' with fixes for {n_violations} violations.".format(file=libfile, n_violations=n_violations))
+
+    def cacheable(self):
+        # The footprint rule looks up footprint files, the watch mode needs the
+        # checksums of load(), which is skipped for cached results
+        return not self.footprints_dir and not self.args.watch
+
+    def cacheKey(self):
+        return (self.args.component, self.args.pattern, self.print_name)
+
+class SymbolChecker(object):
+    """
+    Checks symbols against the KLC rules selected by the command line
+    arguments and prints the results.
+    """
+
+    def __init__(self, args, printer):
+        self.args = args
+        self.printer = printer
+
+        # Set verbosity globally
+        self.verbosity = 0
+        if args.verbose:
+            self.verbosity = args.verbose
+
+        KLCRule.verbosity = self.verbosity
+
+        if args.rule:
+            selected_rules = args.rule.split(',')
+        else:
+            #ALL rules are used
+            selected_rules = None
+
+        if args.exclude:
+            excluded_rules = args.exclude.split(',')
+        else:
+            excluded_rules = None
+
+        # only the modules of the selected rules are imported
+        self.rules = RuleRegistry('rules', all_rules).select(selected_rules, excluded_rules)
+
+        if args.footprints:
+            self.footprints_dir = args.footprints.split(",")
+        else:
+            self.footprints_dir = []
+
+        self.source = SymbolSource(args, printer, self.footprints_dir)
+
+        self.engine = KLCEngine(self.source, self.rules, printer, verbosity=self.verbosity,
+                                nowarnings=args.nowarnings, silent=args.silent, fix=args.fix)
+
+        if args.log:
+            self.engine.addSink(LogSink(args.log))
+
+        if args.report:
+            self.engine.addSink(ReportSink(args.report, self.source.kind, args.shard))
+
+    def checkComponent(self, component):
+        """
+        Check a single component against the selected rules.
+        Returns the number of violations found.
+        """
+        result = self.engine.checkItem(component, libName(component.lib_filename))
+        self.engine.report([result])
+        return result.violations
+
+    def checkLibraries(self, libfiles, jobs=1, print_name=False):
+        """
+        Check all (matching) components of libraries, in a process pool if jobs > 1.
+        Returns the number of components with violations.
+        """
+        self.source.print_name = print_name
+        self.source.only_changed = False
+        return self.engine.checkTasks(libfiles, jobs)
+
+    def checkLibrary(self, libfile, print_name=False, only_changed=False):
+        """
+        Check all (matching) components of a library.
+        If only_changed is set, components whose checksum did not change since
+        the previous run are skipped.
+        Returns the number of components with violations.
+        """
+        self.source.print_name = print_name
+        self.source.only_changed = only_changed
+        return self.engine.checkTasks([libfile])
+
+    def watch(self, libfiles):
+        """
+        Re-check changed symbols whenever one of the libraries is modified
+        """
+        def changed(files):
+            for libfile in libfiles:
+                dcmfile = os.path.splitext(libfile)[0] + '.dcm'
+                if libfile in files or dcmfile in files:
+                    if os.path.isfile(libfile):
+                        self.checkLibrary(libfile, only_changed=True)
+                    else:
+                        self.printer.red("Library removed: {f}".format(f=libfile))
+
+        dcmfiles = [os.path.splitext(libfile)[0] + '.dcm' for libfile in libfiles]
+        watcher = FileWatcher(libfiles + dcmfiles, ['.lib', '.dcm'], interval=self.args.watch_interval)
+        self.printer.regular("Watching {n} libraries for changes (press Ctrl-C to stop)".format(n=len(libfiles)))
+        watcher.watch(changed)
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    printer = PrintColor(use_color = not args.nocolor)
+
+    checker = SymbolChecker(args, printer)
+
+    #grab list of libfiles (even on windows!)
+    libfiles = []
+
+    if len(all_rules)<=0:
+        printer.red("No rules selected for check!")
+        sys.exit(1)
+    else:
+        if (checker.verbosity>2):
+            printer.regular("checking rules:")
+            for rule in all_rules:
+                printer.regular("  - "+str(rule))
+            printer.regular("")
+
+    for libfile in args.libfiles:
+        libfiles += glob(libfile)
+
+    if len(libfiles) == 0:
+        printer.red("File argument invalid: {f}".format(f=args.libfiles))
+        sys.exit(1)
+
+    print_name = len(libfiles) > 1
+
+    if args.shard:
+        timings = loadTimings(args.shard_timings) if args.shard_timings else None
+        libfiles = checker.engine.shardTasks(libfiles, args.shard, timings)
+
+    # the watch mode needs the checksums of the first run, which are only kept in this process
+    exit_code = checker.checkLibraries(libfiles, 1 if args.watch else args.jobs, print_name)
+
+    if args.watch:
+        checker.watch(libfiles)
+
+    sys.exit(exit_code);
@@ -15,6 +15,9 @@ import sys
 import os
 from glob import glob
 import fnmatch
+import io
+import multiprocessing
+from contextlib import redirect_stdout
 
 # Path to common directory
 common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
@@ -22,210 +25,251 @@ common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
 if not common in sys.path:
     sys.path.append(common)
 
-from schlib import *
 from print_color import *
+from checklib import parser as checklib_parser, SymbolChecker
+from libdiff import diffLibraryTask
 
 def ExitError( msg ):
     print(msg)
     sys.exit(-1)
 
-parser = argparse.ArgumentParser(description="Compare two .lib files to determine which symbols have changed")
+# Rule checker of the current (worker) process
+checker = None
+
+def initChecker(check_args):
+    global checker
+    checker = SymbolChecker(check_args, PrintColor(use_color = not check_args.nocolor))
+
+def KLCCheck(component):
+    """
+    Run the KLC rules on an already loaded component.
+    Returns the printed output and the number of violations.
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        n_violations = checker.checkComponent(component)
+    return output.getvalue(), n_violations
+
+class CheckQueue(object):
+    """
+    Schedules KLC checks of components.
+
+    Checks are run in a process pool (if given). All output printed while
+    the queue is active is buffered, so that the final output keeps the same
+    order as if every check had been run right when it was scheduled.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.items = []
+        self.failed = 0
+
+        if self.pool:
+            self.buffer = io.StringIO()
+            self.redirect = redirect_stdout(self.buffer)
+            self.redirect.__enter__()
+
+    def add(self, component):
+        if not self.pool:
+            output, n_violations = KLCCheck(component)
+            sys.stdout.write(output)
+            if n_violations > 0:
+                self.failed += 1
+            return
+
+        self.items.append(self.buffer.getvalue())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+        self.items.append(self.pool.apply_async(KLCCheck, (component,)))
+
+    def finish(self):
+        """
+        Print all buffered output, return the number of components with violations
+        """
+        if not self.pool:
+            return self.failed
 
-parser.add_argument("--new", help="New (updated) .lib file(s), or folder of .lib files", nargs='+')
-parser.add_argument("--old", help="Old (original) .lib file(s), or folder of .lib files for comparison", nargs='+')
-parser.add_argument("-v", "--verbose", help="Enable extra verbose output", action="store_true")
-parser.add_argument("--check", help="Perform KLC check on updated/added components", action='store_true')
-parser.add_argument("--nocolor", help="Does not use colors to show the output", action='store_true')
-parser.add_argument("--design-breaking-changes", help="Checks if there have been changes made that would break existing designs using a particular symbol.", action='store_true')
-parser.add_argument("--check-aliases", help="Do not only check symbols but also aliases.", action='store_true')
-parser.add_argument("--shownochanges", help="Show libraries that have not changed", action="store_true")
+        self.redirect.__exit__(None, None, None)
+        self.items.append(self.buffer.getvalue())
 
-args,extra = parser.parse_known_args()
+        for item in self.items:
+            if isinstance(item, str):
+                sys.stdout.write(item)
+            else:
+                output, n_violations = item.get()
+                sys.stdout.write(output)
+                if n_violations > 0:
+                    self.failed += 1
 
-if not args.new:
-    ExitError("New file(s) not supplied")
+        return self.failed
 
-if not args.old:
-    ExitError("Original file(s) not supplied")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two .lib files to determine which symbols have changed")
 
-def KLCCheck(lib, component):
+    parser.add_argument("--new", help="New (updated) .lib file(s), or folder of .lib files", nargs='+')
+    parser.add_argument("--old", help="Old (original) .lib file(s), or folder of .lib files for comparison", nargs='+')
+    parser.add_argument("-v", "--verbose", help="Enable extra verbose output", action="store_true")
+    parser.add_argument("--check", help="Perform KLC check on updated/added components", action='store_true')
+    parser.add_argument("--nocolor", help="Does not use colors to show the output", action='store_true')
+    parser.add_argument("--design-breaking-changes", help="Checks if there have been changes made that would break existing designs using a particular symbol.", action='store_true')
+    parser.add_argument("--check-aliases", help="Do not only check symbols but also aliases.", action='store_true')
+    parser.add_argument("--shownochanges", help="Show libraries that have not changed", action="store_true")
+    parser.add_argument("-j", "--jobs", help="Number of processes used for comparing libraries and KLC checks (default = number of CPUs)", type=int, default=multiprocessing.cpu_count())
 
-    # Wrap library in "quotes" if required
-    if " " in lib and '"' not in lib:
-        lib = '"' + lib + '"'
+    args,extra = parser.parse_known_args()
 
-    call = 'python checklib.py {lib} -c={cmp} -vv -s {nocolor}'.format(
-                lib = lib,
-                cmp = component,
-                nocolor = "--nocolor" if args.nocolor else ""
-                )
+    if not args.new:
+        ExitError("New file(s) not supplied")
 
-    # Pass extra arguments to checklib script
-    if len(extra) > 0:
-        call += ' '.join([str(e) for e in extra])
+    if not args.old:
+        ExitError("Original file(s) not supplied")
 
-    return os.system(call)
+    printer = PrintColor(use_color = not args.nocolor)
 
-printer = PrintColor(use_color = not args.nocolor)
+    pool = None
+    checks = CheckQueue()
 
-new_libs = {}
-old_libs = {}
+    if args.check:
+        # Remaining arguments are passed on to the checker, as for checklib.py
+        check_args = checklib_parser.parse_args(['-vv', '-s'] + (['--nocolor'] if args.nocolor else []) + extra + ['--'] + args.new)
 
-for lib in args.new:
-    libs = glob(lib)
+        initChecker(check_args)
 
-    for l in libs:
-        if os.path.isdir(l):
-            for root, dirnames, filenames in os.walk(l):
-                for filename in fnmatch.filter(filenames, '*.lib'):
-                    new_libs[os.path.basename(filename)] = os.path.abspath(os.path.join(root, filename))
+        if args.jobs > 1:
+            pool = multiprocessing.Pool(args.jobs, initChecker, (check_args,))
 
-        elif l.endswith('.lib') and os.path.exists(l):
-            new_libs[os.path.basename(l)] = os.path.abspath(l)
+        # Log file is written by each check, so can't be shared between processes
+        if pool and not check_args.log:
+            checks = CheckQueue(pool)
 
-for lib in args.old:
-    libs = glob(lib)
+    elif args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs)
 
-    for l in libs:
-        if os.path.isdir(l):
-            for root, dirnames, filenames in os.walk(l):
-                for filename in fnmatch.filter(filenames, '*.lib'):
-                    old_libs[os.path.basename(filename)] = os.path.abspath(os.path.join(root, filename))
+    new_libs = {}
+    old_libs = {}
 
-        elif l.endswith('.lib') and os.path.exists(l):
-            old_libs[os.path.basename(l)] = os.path.abspath(l)
+    for lib in args.new:
+        libs = glob(lib)
 
-errors = 0
-design_breaking_changes = 0
+        for l in libs:
+            if os.path.isdir(l):
+                for root, dirnames, filenames in os.walk(l):
+                    for filename in fnmatch.filter(filenames, '*.lib'):
+                        new_libs[os.path.basename(filename)] = os.path.abspath(os.path.join(root, filename))
 
-for lib_name in new_libs:
+            elif l.endswith('.lib') and os.path.exists(l):
+                new_libs[os.path.basename(l)] = os.path.abspath(l)
 
-    lib_path = new_libs[lib_name]
-    new_lib = SchLib(lib_path)
+    for lib in args.old:
+        libs = glob(lib)
 
+        for l in libs:
+            if os.path.isdir(l):
+                for root, dirnames, filenames in os.walk(l):
+                    for filename in fnmatch.filter(filenames, '*.lib'):
+                        old_libs[os.path.basename(filename)] = os.path.abspath(os.path.join(root, filename))
 
-    # New library has been created!
-    if not lib_name in old_libs:
+            elif l.endswith('.lib') and os.path.exists(l):
+                old_libs[os.path.basename(l)] = os.path.abspath(l)
 
-        if args.verbose:
-            printer.light_green("Created library '{lib}'".format(lib=lib_name))
+    errors = 0
+    design_breaking_changes = 0
 
-        # Check all the components!
-        for cmp in new_lib.components:
+    tasks = [(lib_name, new_libs[lib_name], old_libs.get(lib_name), args.check_aliases,
+              args.design_breaking_changes, args.check) for lib_name in new_libs]
 
-            if args.check:
-                if not KLCCheck(lib_path, cmp.name) == 0:
-                    errors += 1
+    # Libraries are loaded and compared in parallel, results are handled in order
+    if pool:
+        diffs = pool.imap(diffLibraryTask, tasks)
+    else:
+        diffs = map(diffLibraryTask, tasks)
 
+    for diff in diffs:
 
-        continue
+        lib_name = diff.name
 
-    # Library has been updated - check each component to see if it has been changed
-    old_lib_path = old_libs[lib_name]
-    old_lib = SchLib(old_lib_path)
-
-    # If library checksums match, we can skip entire library check
-    if new_lib.compareChecksum(old_lib):
-        if args.verbose and args.shownochanges:
-            printer.yellow("No changes to library '{lib}'".format(lib=lib_name))
-        continue
-
-    new_cmp = {}
-    old_cmp = {}
-
-    for cmp in new_lib.components:
-        new_cmp[cmp.name] = {'cmp': cmp, 'alias_of': None}
-        if args.check_aliases:
-            for alias in cmp.aliases:
-                new_cmp[alias] = {'cmp': cmp, 'alias_of': cmp.name}
-
-    for cmp in old_lib.components:
-        old_cmp[cmp.name] = {'cmp': cmp, 'alias_of': None}
-        if args.check_aliases:
-            for alias in cmp.aliases:
-                old_cmp[alias] = {'cmp': cmp, 'alias_of': cmp.name}
-
-    for cmp in new_cmp:
-        # Component is 'new' (not in old library)
-        alias_info = ''
-        if new_cmp[cmp]['alias_of']:
-            alias_info = ' alias of {}'.format(new_cmp[cmp]['alias_of'])
-
-        if not cmp in old_cmp:
+        # New library has been created!
+        if diff.created:
 
             if args.verbose:
-                printer.light_green("New '{lib}:{name}'{alias_info}".format(
-                    lib=lib_name, name=cmp, alias_info=alias_info))
+                printer.light_green("Created library '{lib}'".format(lib=lib_name))
 
-            if args.check:
-                if not KLCCheck(lib_path, cmp) == 0:
-                    errors += 1
+            # Check all the components!
+            for cmp in diff.components:
+                checks.add(cmp)
 
             continue
 
-        if new_cmp[cmp]['alias_of'] != old_cmp[cmp]['alias_of'] and args.verbose:
-            printer.white("Changed alias state of '{lib}:{name}'".format(lib=lib_name, name=cmp))
+        # If library checksums match, we can skip entire library check
+        if diff.unchanged:
+            if args.verbose and args.shownochanges:
+                printer.yellow("No changes to library '{lib}'".format(lib=lib_name))
+            continue
 
-        chk_new = new_cmp[cmp]['cmp'].checksum
-        chk_old = old_cmp[cmp]['cmp'].checksum
+        for change in diff.changes:
+            cmp = change['name']
 
-        if not chk_old == chk_new:
-            if args.verbose:
-                printer.yellow("Changed '{lib}:{name}'{alias_info}".format(
-                    lib=lib_name, name=cmp, alias_info=alias_info))
-            if args.design_breaking_changes:
-                pins_moved = 0
-                nc_pins_moved = 0
-                pins_missing = 0
-                nc_pins_missing = 0
-                for pin_old in old_cmp[cmp]['cmp'].pins:
-                    pin_new = new_cmp[cmp]['cmp'].getPinByNumber(pin_old['num'])
-                    if pin_new is None:
-                        if pin_old['electrical_type'] == 'N':
-                            nc_pins_missing +=1
-                        else:
-                            pins_missing += 1
-                        continue
-
-                    if pin_old['posx'] != pin_new['posx'] or pin_old['posy'] != pin_new['posy']:
-                        if pin_old['electrical_type'] == 'N' and pin_new['electrical_type'] == 'N':
-                            nc_pins_moved +=1
-                        else:
-                            pins_moved += 1
-
-                if pins_moved > 0 or pins_missing > 0:
-                    design_breaking_changes += 1
-                    printer.light_purple("Pins have been moved, renumbered or removed in symbol '{lib}:{name}'{alias_info}".format(
+            if change['type'] == 'removed':
+                alias_info = ''
+                if change['alias_of']:
+                    alias_info = ' was an alias of {}'.format(change['alias_of'])
+
+                if args.verbose:
+                    printer.red("Removed '{lib}:{name}'{alias_info}".format(
                         lib=lib_name, name=cmp, alias_info=alias_info))
-                elif nc_pins_moved > 0 or nc_pins_missing > 0:
+                if args.design_breaking_changes:
                     design_breaking_changes += 1
-                    printer.purple("Normal pins ok but NC pins have been moved, renumbered or removed in symbol '{lib}:{name}'{alias_info}".format(
-                        lib=lib_name, name=cmp, alias_info=alias_info))
 
-            if args.check:
-                if not KLCCheck(lib_path, cmp) == 0:
-                    errors += 1
+                continue
 
-    for cmp in old_cmp:
-        # Component has been deleted from library
-        if not cmp in new_cmp:
             alias_info = ''
-            if old_cmp[cmp]['alias_of']:
-                alias_info = ' was an alias of {}'.format(old_cmp[cmp]['alias_of'])
+            if change['alias_of']:
+                alias_info = ' alias of {}'.format(change['alias_of'])
+
+            # Component is 'new' (not in old library)
+            if change['type'] == 'new':
+                if args.verbose:
+                    printer.light_green("New '{lib}:{name}'{alias_info}".format(
+                        lib=lib_name, name=cmp, alias_info=alias_info))
 
+            elif change['type'] == 'alias_state':
+                if args.verbose:
+                    printer.white("Changed alias state of '{lib}:{name}'".format(lib=lib_name, name=cmp))
+
+            elif change['type'] == 'changed':
+                if args.verbose:
+                    printer.yellow("Changed '{lib}:{name}'{alias_info}".format(
+                        lib=lib_name, name=cmp, alias_info=alias_info))
+
+                pins = change['pins']
+                if args.design_breaking_changes:
+                    if pins['moved'] > 0 or pins['missing'] > 0:
+                        design_breaking_changes += 1
+                        printer.light_purple("Pins have been moved, renumbered or removed in symbol '{lib}:{name}'{alias_info}".format(
+                            lib=lib_name, name=cmp, alias_info=alias_info))
+                    elif pins['nc_moved'] > 0 or pins['nc_missing'] > 0:
+                        design_breaking_changes += 1
+                        printer.purple("Normal pins ok but NC pins have been moved, renumbered or removed in symbol '{lib}:{name}'{alias_info}".format(
+                            lib=lib_name, name=cmp, alias_info=alias_info))
+
+            # Only symbols are checked, not aliases
+            if change['component']:
+                checks.add(change['component'])
+
+    # Entire lib has been deleted?
+    for lib_name in old_libs:
+        if not lib_name in new_libs:
             if args.verbose:
-                printer.red("Removed '{lib}:{name}'{alias_info}".format(
-                    lib=lib_name, name=cmp, alias_info=alias_info))
+                printer.red("Removed library '{lib}'".format(lib=lib_name))
             if args.design_breaking_changes:
                 design_breaking_changes += 1
 
-# Entire lib has been deleted?
-for lib_name in old_libs:
-    if not lib_name in new_libs:
-        if args.verbose:
-            printer.red("Removed library '{lib}'".format(lib=lib_name))
-        if args.design_breaking_changes:
-            design_breaking_changes += 1
+    errors += checks.finish()
+
+    if pool:
+        pool.close()
+        pool.join()
 
-# Return the number of errors found ( zero if --check is not set )
-sys.exit(errors + design_breaking_changes)
+    # Return the number of errors found ( zero if --check is not set )
+    sys.exit(errors + design_breaking_changes)
@@ -19,6 +19,7 @@ if not common in sys.path:
 
 from schlib import *
 from print_color import *
+from parsecache import load_cached
 
 #enable windows wildcards
 from glob import glob
@@ -46,7 +47,7 @@ for lib in args.libfiles:
 errors = 0
             
 for libfile in libfiles:
-    lib = SchLib(libfile)
+    lib = load_cached(libfile)
     
     if not args.silent:
         printer.green("Checking {lib}".format(lib=libfile))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+This file looks for symbols which are drawn the same (or nearly the same)
+in one or more libraries, independent of their names, fields and the order
+of their pins and graphic items.
+
+Identical symbols have the same geometry fingerprint. Similar symbols are
+found by comparing the sets of their pins and graphic items, a similarity
+of 1.0 means that all items are the same.
+
+Example:
+    ./find_similar.py path/to/*.lib
+    ./find_similar.py path/to/*.lib -t 0.9 --json > clusters.json
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import sys, os
+
+common = os.path.abspath(os.path.join(sys.path[0], '..','common'))
+
+if not common in sys.path:
+    sys.path.append(common)
+
+from print_color import *
+from parsecache import load_cached
+from similarity import featureSet, signature, findClusters, printClusters
+from symbol_fingerprint import symbolFeatures, symbolFingerprint
+
+#enable windows wildcards
+from glob import glob
+
+def librarySymbols(filename):
+    """
+    Fingerprints of all symbols of a library file, the loader of findClusters.
+    A symbol is the tuple (library, name, aliases).
+    """
+    library = os.path.splitext(os.path.basename(filename))[0]
+
+    try:
+        lib = load_cached(filename)
+    except Exception as e:
+        return [], [(filename, str(e) or e.__class__.__name__)]
+
+    symbols = []
+    for component in lib.components:
+        features = symbolFeatures(component)
+        hashes = featureSet(features)
+        symbols.append(((library, component.name, sorted(component.aliases.keys())),
+                        symbolFingerprint(features), hashes, signature(hashes)))
+
+    return symbols, []
+
+def symbolName(symbol):
+    library, name, aliases = symbol[:3]
+    text = '{lib}:{name}'.format(lib=library, name=name)
+    if aliases:
+        text += ' (aliases: {a})'.format(a=', '.join(aliases))
+    return text
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find identical and similar symbols (by their drawing) across .lib files")
+
+    parser.add_argument('libfiles', help=".lib file(s)", nargs="+")
+    parser.add_argument('-t', '--threshold', help='Minimum similarity of similar symbols, 1 = only identical symbols (default = 0.8)', type=float, default=0.8)
+    parser.add_argument('-j', '--jobs', help='Number of processes used for parsing files (default = number of CPUs)', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--json', help='Print the clusters as JSON', action='store_true')
+    parser.add_argument('-s', '--silent', help='only show the number of clusters', action='store_true')
+    parser.add_argument('--nocolor', help='does not use color', action='store_true')
+
+    args = parser.parse_args()
+
+    printer = PrintColor(use_color = not args.nocolor)
+
+    # Lib files
+    libfiles = []
+
+    for lib in args.libfiles:
+        libfiles += glob(lib)
+
+    identical, similar, errors, capped = findClusters(sorted(set(libfiles)), librarySymbols, args.threshold, args.jobs)
+
+    printClusters(printer, identical, similar, errors, capped, symbolName, 'symbol', args.json, args.silent)
+
+    sys.exit(1 if identical or similar or errors else 0)
@@ -3,6 +3,7 @@
 
 from __future__ import print_function
 from schlib import *
+from pintable import PinTable
 import argparse
 
 # cases covered by this script:
@@ -14,7 +15,7 @@ import argparse
 #  (6) resize pins with posy wrong if component has at least one pin wrong in each of the following direction: U, D
 
 class CheckComponent(object):
-    def __init__(self, component):
+    def __init__(self, component, table, index):
         self.component = component
         self.prerequisites_ok = False
         self.header_printed = False
@@ -59,41 +60,23 @@ class CheckComponent(object):
             return
 
         # pins length have to be multiple of 50mil
-        for pin in component.pins:
-            if (int(pin['length']) % 50) != 0:
-                return
+        if table.pinsWhere(index, table.notMultiple('length', 50)):
+            return
 
         # pins posx and posy have to be multiple of 50mil
-        for pin in component.pins:
-            if (int(pin['posx']) % 50) != 0 or (int(pin['posy']) % 50) != 0:
-                return
+        if table.pinsWhere(index, table.offGrid(50)):
+            return
 
         # check if at least one pin is wrong in each direction
         if self.pinsL_count > 0 and self.pinsR_count > 0:
-            for pin in self.pinsL:
-                posx = int(pin['posx'])
-                if (posx % 100) != 0:
-                    self.need_fix_L = True
-                    break
-
-            for pin in self.pinsR:
-                posx = int(pin['posx'])
-                if (posx % 100) != 0:
-                    self.need_fix_R = True
-                    break
+            directions = [pin['direction'] for pin in table.pinsWhere(index, table.notMultiple('posx', 100))]
+            self.need_fix_L = 'L' in directions
+            self.need_fix_R = 'R' in directions
 
         if self.pinsU_count > 0 and self.pinsD_count > 0:
-            for pin in self.pinsU:
-                posy = int(pin['posy'])
-                if (posy % 100) != 0:
-                    self.need_fix_U = True
-                    break
-
-            for pin in self.pinsD:
-                posy = int(pin['posy'])
-                if (posy % 100) != 0:
-                    self.need_fix_D = True
-                    break
+            directions = [pin['direction'] for pin in table.pinsWhere(index, table.notMultiple('posy', 100))]
+            self.need_fix_U = 'U' in directions
+            self.need_fix_D = 'D' in directions
 
         self.prerequisites_ok = True
 
@@ -110,8 +93,8 @@ class CheckComponent(object):
         pin['length'] = str(new_len)
         pin[pos] = str(new_pos)
 
-def resize_component_pins(component):
-    component = CheckComponent(component)
+def resize_component_pins(component, table, index):
+    component = CheckComponent(component, table, index)
 
     # case (1)
     if component.pinsL_count > 0 and component.pinsR_count == 0:
@@ -219,8 +202,10 @@ args = parser.parse_args()
 for libfile in args.libfiles:
     lib = SchLib(libfile)
     print('library: %s' % libfile)
-    for component in lib.components:
-        component_printed = resize_component_pins(component)
+    # pins of all components are checked at once, before any pin is resized
+    table = PinTable(lib.components)
+    for index, component in enumerate(lib.components):
+        component_printed = resize_component_pins(component, table, index)
         if not component_printed:
             if args.verbose:
                 print('\tcomponent: %s......OK' % component.name)
@@ -46,10 +46,17 @@ import sys, os
 import re
 import json
 
+pcb = os.path.abspath(os.path.join(sys.path[0], '..', 'pcb'))
+
+if not pcb in sys.path:
+    sys.path.append(pcb)
+
+from prettypack import PACK_EXTENSION, isPack, listFootprints
+
 parser = argparse.ArgumentParser(description="Check symbols for footprint errors")
 
 parser.add_argument('-l', '--lib', nargs='+', help='Symbol libraries (.lib files)', action='store')
-parser.add_argument('-p', '--pretty', nargs='+', help='Footprint libraries (.pretty dirs)')
+parser.add_argument('-p', '--pretty', nargs='+', help='Footprint libraries (.pretty dirs or .prettypack files)')
 parser.add_argument('-r', '--replace', help='Path to JSON file containing replacement information')
 parser.add_argument('-v', '--verbose', help='Verbosity level', action='count')
 parser.add_argument('-f', '--fix', help='Fix errors', action='store_true')
@@ -87,18 +94,17 @@ for lib in args.lib:
     symbol_libs.append(lib)
 
 for lib in args.pretty:
-    if not os.path.isdir(lib) or not lib.endswith('.pretty'):
+    if isPack(lib):
+        name = os.path.basename(lib)[:-len(PACK_EXTENSION)]
+    elif os.path.isdir(lib) and lib.endswith('.pretty'):
+        name = os.path.basename(lib).replace('.pretty', '')
+    else:
         continue
 
-    name = os.path.basename(lib).replace('.pretty', '')
-
     footprints = []
 
-    for f in os.listdir(lib):
-        if not f.endswith('.kicad_mod'):
-            continue
-
-        fp = f.replace('.kicad_mod', '')
+    for f in listFootprints(lib):
+        fp = os.path.basename(f).replace('.kicad_mod', '')
 
         footprints.append(fp)
 
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Diff engine for comparing an old and a new version of a symbol library.
+
+Symbols are first compared by their checksum (fingerprint of the symbol
+definition). Only symbols whose checksum differs are compared pin by pin.
+
+"""
+
+from parsecache import load_cached
+
+class LibraryDiff(object):
+    """
+    Differences between the old and new version of a single library.
+
+    changes is a list of dicts with the following keys:
+        * type - 'new', 'changed', 'alias_state' or 'removed'
+        * name - symbol (or alias) name
+        * alias_of - name of the parent symbol if name is an alias
+        * pins - result of pinChanges() for changed symbols (if requested)
+        * component - the new Component (if requested)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.created = False
+        self.unchanged = False
+        self.components = []
+        self.changes = []
+
+    def addChange(self, type, name, alias_of=None, pins=None, component=None):
+        self.changes.append({
+            'type': type,
+            'name': name,
+            'alias_of': alias_of,
+            'pins': pins,
+            'component': component,
+            })
+
+def symbolMap(lib, aliases=False):
+    """
+    Map of { name : {'cmp': component, 'alias_of': parent name} }
+    """
+    symbols = {}
+
+    for cmp in lib.components:
+        symbols[cmp.name] = {'cmp': cmp, 'alias_of': None}
+        if aliases:
+            for alias in cmp.aliases:
+                symbols[alias] = {'cmp': cmp, 'alias_of': cmp.name}
+
+    return symbols
+
+def pinChanges(old_cmp, new_cmp):
+    """
+    Compare pins by number.
+    Returns a dict with the number of moved and missing pins,
+    counted separately for NC pins.
+    """
+    changes = {'moved': 0, 'missing': 0, 'nc_moved': 0, 'nc_missing': 0}
+
+    new_pins = new_cmp.getPinNumberMap()
+
+    for pin_old in old_cmp.pins:
+        pin_new = new_pins.get(pin_old['num'])
+        if pin_new is None:
+            if pin_old['electrical_type'] == 'N':
+                changes['nc_missing'] += 1
+            else:
+                changes['missing'] += 1
+            continue
+
+        if pin_old['posx'] != pin_new['posx'] or pin_old['posy'] != pin_new['posy']:
+            if pin_old['electrical_type'] == 'N' and pin_new['electrical_type'] == 'N':
+                changes['nc_moved'] += 1
+            else:
+                changes['moved'] += 1
+
+    return changes
+
+def diffLibrary(name, new_path, old_path=None, aliases=False, pins=False, components=False):
+    """
+    Compare the new version of a library with the old version (if there is one).
+
+    If pins is set, changed symbols are compared pin by pin.
+    If components is set, the new Component objects of created and changed
+    symbols are included in the result (e.g. to check them afterwards).
+    """
+    diff = LibraryDiff(name)
+
+    new_lib = load_cached(new_path)
+
+    # New library has been created!
+    if not old_path:
+        diff.created = True
+        if components:
+            diff.components = new_lib.components
+        return diff
+
+    old_lib = load_cached(old_path)
+
+    # If library checksums match, we can skip entire library check
+    if new_lib.compareChecksum(old_lib):
+        diff.unchanged = True
+        return diff
+
+    new_cmp = symbolMap(new_lib, aliases)
+    old_cmp = symbolMap(old_lib, aliases)
+
+    for cmp in new_cmp:
+        new = new_cmp[cmp]
+        component = new['cmp'] if components and not new['alias_of'] else None
+
+        # Component is 'new' (not in old library)
+        if not cmp in old_cmp:
+            diff.addChange('new', cmp, new['alias_of'], component=component)
+            continue
+
+        old = old_cmp[cmp]
+
+        if new['alias_of'] != old['alias_of']:
+            diff.addChange('alias_state', cmp, new['alias_of'])
+
+        if not old['cmp'].checksum == new['cmp'].checksum:
+            pin_changes = pinChanges(old['cmp'], new['cmp']) if pins else None
+            diff.addChange('changed', cmp, new['alias_of'], pins=pin_changes, component=component)
+
+    for cmp in old_cmp:
+        # Component has been deleted from library
+        if not cmp in new_cmp:
+            diff.addChange('removed', cmp, old_cmp[cmp]['alias_of'])
+
+    return diff
+
+def diffLibraryTask(task):
+    """
+    Wrapper around diffLibrary for use with multiprocessing.Pool.imap
+    """
+    return diffLibrary(*task)
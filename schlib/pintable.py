@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Columnar table of the pins of many symbols (e.g. a whole SchLib).
+
+The numeric pin values are converted once and stored per column, so
+checks like grid alignment or pin length can be done for all pins of a
+library at once. Results are mapped back to the symbols by index.
+
+Uses NumPy arrays if it is installed, otherwise plain lists.
+
+"""
+
+import bisect
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class LazyPinTable(object):
+    """
+    PinTable of a list of components, built on first use (see get)
+    """
+
+    def __init__(self, components):
+        self.components = components
+        self.table = None
+        self.built = False
+
+    def get(self):
+        """
+        The table, or None if a pin of the components is malformed
+        """
+        if not self.built:
+            try:
+                self.table = PinTable(self.components)
+            except ValueError:
+                self.table = None
+            self.built = True
+        return self.table
+
+class PinTable(object):
+    """
+    Pins of a list of components.
+    The pins of component i are pins[offsets[i]:offsets[i+1]].
+    Numeric columns: posx, posy, length, unit, convert
+    The 'direction' column holds the pin orientation (U/D/L/R).
+
+    The queries (notMultiple, offGrid, badLength) are computed for all pins
+    and return a key of the result, which is passed to matches or pinsWhere.
+    """
+
+    NUMERIC = ['posx', 'posy', 'length', 'unit', 'convert']
+
+    def __init__(self, components):
+        self.pins = []
+        self.offsets = [0]
+
+        for component in components:
+            self.pins.extend(component.pins)
+            self.offsets.append(len(self.pins))
+
+        self.columns = {}
+        for key in self.NUMERIC:
+            values = [int(pin[key]) for pin in self.pins]
+            self.columns[key] = numpy.array(values, dtype=int) if numpy is not None else values
+        self.columns['direction'] = [pin['direction'] for pin in self.pins]
+
+        # memoized results of the queries, by query and arguments
+        self._masks = {}
+        self._matches = {}
+
+    def __len__(self):
+        return len(self.pins)
+
+    def componentCount(self):
+        return len(self.offsets) - 1
+
+    def column(self, key, index=None):
+        """
+        Values of a column, for all pins or the pins of component index
+        """
+        values = self.columns[key]
+        if index is None:
+            return values
+        return values[self.offsets[index]:self.offsets[index+1]]
+
+    def _mask(self, query, args, compute):
+        key = (query,) + args
+        if not key in self._masks:
+            self._masks[key] = compute(*args)
+        return key
+
+    def notMultiple(self, key, multiple):
+        """
+        Mask of pins whose column value is not a multiple of multiple
+        """
+        def compute(key, multiple):
+            values = self.columns[key]
+            if numpy is not None:
+                return values % multiple != 0
+            return [v % multiple != 0 for v in values]
+
+        return self._mask('not_multiple', (key, multiple), compute)
+
+    def offGrid(self, grid):
+        """
+        Mask of pins which are not located on the grid
+        """
+        def compute(grid):
+            x = self._masks[self.notMultiple('posx', grid)]
+            y = self._masks[self.notMultiple('posy', grid)]
+            if numpy is not None:
+                return x | y
+            return [a or b for a, b in zip(x, y)]
+
+        return self._mask('off_grid', (grid,), compute)
+
+    def badLength(self, warning, maximum, multiple):
+        """
+        Mask of pins with a length (other than zero) which is at most warning,
+        above maximum or not a multiple of multiple
+        """
+        def compute(warning, maximum, multiple):
+            length = self.columns['length']
+            if numpy is not None:
+                return (length != 0) & ((length <= warning) | (length > maximum) | (length % multiple != 0))
+            return [l != 0 and (l <= warning or l > maximum or l % multiple != 0) for l in length]
+
+        return self._mask('bad_length', (warning, maximum, multiple), compute)
+
+    def matches(self, mask):
+        """
+        Map of { component index : list of pin indices } where the mask is set.
+        Pin indices are local to the component (index into component.pins).
+        """
+        if not mask in self._matches:
+            values = self._masks[mask]
+            if numpy is not None:
+                found = numpy.flatnonzero(values).tolist()
+            else:
+                found = [i for i, value in enumerate(values) if value]
+
+            matches = {}
+            for i in found:
+                component = bisect.bisect_right(self.offsets, i) - 1
+                matches.setdefault(component, []).append(i - self.offsets[component])
+            self._matches[mask] = matches
+
+        return self._matches[mask]
+
+    def pinsWhere(self, index, mask):
+        """
+        Pins of component index where the mask is set, in pin order
+        """
+        start = self.offsets[index]
+        return [self.pins[start + i] for i in self.matches(mask).get(index, [])]
@@ -22,32 +22,21 @@ class Rule(KLCRule):
         unit_count = int(self.component.definition['unit_count']) if units_locked else 1
 
         for unit in range(1, unit_count+1):
+            extents = self.analysis.extents(unit if units_locked else None)
+
             # If there is only a single filled rectangle, we assume that it is the
             # main symbol outline.
-            drawing = self.component.draw
-            filled_rects = [rect for rect in drawing['rectangles']
-                            if ((not units_locked) or (int(rect['unit']) == unit)) and (rect['fill'] == 'f')]
-            if len(filled_rects) == 1:
+            if len(extents['filled']) == 1:
                 # We now find it's center
-                rect = filled_rects[0]
-                x = (int(rect['startx']) + int(rect['endx'])) // 2
-                y = (int(rect['starty']) + int(rect['endy'])) // 2
-                y_min = int(min([rect['starty'], rect['endy']]))
-                y_max = int(max([rect['starty'], rect['endy']]))
+                x_min, y_min, x_max, y_max = extents['filled'][0]
+                x = (x_min + x_max) // 2
+                y = (y_min + y_max) // 2
             else:
-                pins = [pin for pin in self.component.pins
-                        if (not units_locked) or (int(pin['unit']) == unit)]
-
                 # No pins? Ignore check.
                 # This can be improved to include graphical items too...
-                if len(pins) == 0:
+                if extents['pins'] is None:
                     continue
-                x_pos = [int(pin['posx']) for pin in pins]
-                y_pos = [int(pin['posy']) for pin in pins]
-                x_min = min(x_pos)
-                x_max = max(x_pos)
-                y_min = min(y_pos)
-                y_max = max(y_pos)
+                x_min, y_min, x_max, y_max = extents['pins']
 
                 # Center point average
                 x = (x_min + x_max) / 2
@@ -13,15 +13,13 @@ class Rule(KLCRule):
     def checkPinOrigin(self, gridspacing=100):
         self.violating_pins = []
         err = False
-        for pin in self.component.pins:
-            posx = int(pin['posx'])
-            posy = int(pin['posy'])
-            if (posx % gridspacing) != 0 or (posy % gridspacing) != 0:
-                self.violating_pins.append(pin)
-                if not err:
-                    self.error("Pins not located on {0}mil (={1:.3}mm) grid:".format(gridspacing, gridspacing*0.0254))
-                self.error(' - Pin {0} ({1}), {2}mil'.format(pin['name'], pin['num'], positionFormater(pin)))
-                err = True
+        table, index = self.analysis.pinTable()
+        for pin in table.pinsWhere(index, table.offGrid(gridspacing)):
+            self.violating_pins.append(pin)
+            if not err:
+                self.error("Pins not located on {0}mil (={1:.3}mm) grid:".format(gridspacing, gridspacing*0.0254))
+            self.error(' - Pin {0} ({1}), {2}mil'.format(pin['name'], pin['num'], positionFormater(pin)))
+            err = True
 
         return len(self.violating_pins) > 0
 
@@ -71,15 +69,13 @@ class Rule(KLCRule):
     def checkPinLength(self, errorPinLength=49, warningPinLength=99):
         self.violating_pins = []
 
-        for pin in self.component.pins:
+        # only pins with any of the problems below (zero-length pins e.g. hidden power pins are ignored)
+        table, index = self.analysis.pinTable()
+        for pin in table.pinsWhere(index, table.badLength(warningPinLength, 300, 50)):
             length = int(pin['length'])
 
             err = False
 
-            # ignore zero-length pins e.g. hidden power pins
-            if length == 0:
-                continue
-
             if length <= errorPinLength:
                 self.error("{pin} length ({len}mils) is below {pl}mils".format(pin=pinString(pin), len=length, pl=errorPinLength+1))
             elif length <= warningPinLength:
@@ -107,7 +103,7 @@ class Rule(KLCRule):
         pingrid = 100
         errorPinLength = 49
         warningPinLength = 99
-        if self.component.isSmallComponentHeuristics():
+        if self.analysis.isSmallComponent():
             pingrid = 50
             errorPinLength = 24
             warningPinLength = 49
@@ -23,7 +23,7 @@ class Rule(KLCRule):
             for gnd in GND:
                 if re.search(gnd, name, flags=re.IGNORECASE) is not None:
                     # Pin orientation should be "up"
-                    if (not self.component.isPowerSymbol()) and (not pin['direction'] == 'U'):
+                    if (not self.analysis.isPowerSymbol()) and (not pin['direction'] == 'U'):
                         if first:
                             first = False
                             self.warning("Ground and negative power pins should be placed at bottom of symbol")
@@ -41,7 +41,7 @@ class Rule(KLCRule):
             for pwr in PWR:
                 if re.search(pwr, name, flags=re.IGNORECASE) is not None:
                     # Pin orientation should be "down"
-                    if (not self.component.isPowerSymbol()) and not pin['direction'] == 'D':
+                    if (not self.analysis.isPowerSymbol()) and not pin['direction'] == 'D':
                         if first:
                             first = False
                             self.warning("Positive power pins should be placed at top of symbol")
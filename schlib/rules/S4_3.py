@@ -44,34 +44,8 @@ class Rule(KLCRule):
         # List of lists of pins that are entirely duplicated
         self.duplicated_pins = []
 
-        pin_locations = []
-
-        for pin in self.component.pins:
-
-            # To be "identical", all following properties much be the same
-
-            pinx = pin['posx']     # x coordinate
-            piny = pin['posy']     # y coordinate
-            pinu = pin['unit']     # unit (for multi-unit parts)
-            pinc = pin['convert']  # convert (de morgan)
-
-            dupe = False
-
-            for loc in pin_locations:
-
-                locx = loc['x']
-                locy = loc['y']
-                locu = loc['u']
-                locc = loc['c']
-
-                if pinx == locx and piny == locy and pinu == locu and pinc == locc:
-                    loc['pins'].append(pin)
-                    dupe = True
-
-            if not dupe:
-                new_loc = {'x': pinx, 'y': piny, 'u': pinu, 'c': pinc}
-                new_loc['pins'] = [pin]
-                pin_locations.append(new_loc)
+        # To be "identical", pins must have the same position, unit and convert (de morgan)
+        pin_locations = self.analysis.pinStacks()
 
         err = False
 
@@ -207,37 +181,35 @@ class Rule(KLCRule):
         if len(self.duplicated_pins) > 0:
             self.info("Removing duplicate pins")
 
-            for pin_groups in self.duplicated_pins:
-                # Leave first pin and delete all others
-                pin = pin_groups[0]
+            # All these keys must be identical!
+            keys = ['name', 'num', 'unit', 'posx', 'posy', 'convert']
 
-                count = 0
-                # Iterate through component pins
-                i = 0
-                while i < len(self.component.drawOrdered):
-
-                    el = self.component.drawOrdered[i]
-                    if not el[0] == 'X':  # Pins
-                        i += 1
-                        continue
+            # Leave first pin of each group and delete all others
+            deleted = {}
+            for pin_group in self.duplicated_pins:
+                deleted[tuple(pin_group[0][key] for key in keys)] = 0
 
-                    p_test = el[1]
-
-                    # All these keys must be identical!
-                    keys = ['name', 'num', 'unit', 'posx', 'posy', 'convert']
-
-                    # Found duplicate
-                    if all([p_test[key] == pin[key] for key in keys]):
-                        count += 1
+            found = set()
+            draw = []
+            for el in self.component.drawOrdered:
+                if el[0] == 'X':  # Pins
+                    key = tuple(el[1][key] for key in keys)
+                    if key in deleted:
                         # Skip the first instance, delete all others
-                        if count > 1:
-                            del self.component.drawOrdered[i]
-                            self.info("Deleting {pin} @ ({x},{y})".format(
-                                pin=self.pinStr(pin),
-                                x=pin['posx'],
-                                y=pin['posy']))
+                        if key in found:
+                            deleted[key] += 1
                             continue
-                    i += 1
+                        found.add(key)
+                draw.append(el)
+            self.component.drawOrdered[:] = draw
+
+            for pin_group in self.duplicated_pins:
+                pin = pin_group[0]
+                for i in range(deleted[tuple(pin[key] for key in keys)]):
+                    self.info("Deleting {pin} @ ({x},{y})".format(
+                        pin=self.pinStr(pin),
+                        x=pin['posx'],
+                        y=pin['posy']))
 
         for pin in self.component.pins:
             if pin['num'] in self.fix_make_passive:
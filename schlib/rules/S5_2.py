@@ -49,7 +49,7 @@ class Rule(KLCRule):
 
         filters = self.component.fplist
 
-        if (not self.component.isGraphicSymbol() and not self.component.isPowerSymbol()) and len(filters) == 0:
+        if (not self.analysis.isGraphicSymbol() and not self.analysis.isPowerSymbol()) and len(filters) == 0:
             self.warning("No footprint filters defined")
 
         self.checkFilters(filters)
@@ -27,7 +27,7 @@ class Rule(KLCRule):
 
         ref = self.component.fields[0]
 
-        if (not self.component.isGraphicSymbol()) and (not self.component.isPowerSymbol()):
+        if (not self.analysis.isGraphicSymbol()) and (not self.analysis.isPowerSymbol()):
             if not self.checkVisibility(ref):
                 self.error("Ref(erence) field must be VISIBLE")
                 fail = True
@@ -48,7 +48,7 @@ class Rule(KLCRule):
         if name.startswith('"') and name.endswith('"'):
             name = name[1:-1]
 
-        if (not self.component.isGraphicSymbol()) and (not self.component.isPowerSymbol()):
+        if (not self.analysis.isGraphicSymbol()) and (not self.analysis.isPowerSymbol()):
             if not name == self.component.name:
                 self.error("Value {val} does not match component name.".format(val=name))
                 fail = True
@@ -61,7 +61,7 @@ class Rule(KLCRule):
                 self.error("Value {val} does not match component name.".format(val=name))
                 fail = True
 
-        if not isValidName(self.component.name, self.component.isGraphicSymbol(), self.component.isPowerSymbol()):
+        if not isValidName(self.component.name, self.analysis.isGraphicSymbol(), self.analysis.isPowerSymbol()):
             self.error("Symbol name '{val}' contains invalid characters as per KLC 1.7".format(
                 val=self.component.name))
             fail = True
@@ -21,14 +21,14 @@ class Rule(KLCRule):
         invalid_documentation = 0
 
         # check part itself
-        if self.checkDocumentation(self.component.name, self.component.documentation, False, self.component.isGraphicSymbol() or self.component.isPowerSymbol()):
+        if self.checkDocumentation(self.component.name, self.component.documentation, False, self.analysis.isGraphicSymbol() or self.analysis.isPowerSymbol()):
             invalid_documentation += 1
 
         # check all its aliases too
         if self.component.aliases:
             invalid = []
             for alias in self.component.aliases.keys():
-                if self.checkDocumentation(alias, self.component.aliases[alias], True, self.component.isGraphicSymbol() or self.component.isPowerSymbol()):
+                if self.checkDocumentation(alias, self.component.aliases[alias], True, self.analysis.isGraphicSymbol() or self.analysis.isPowerSymbol()):
                     invalid_documentation += 1
 
         return invalid_documentation > 0
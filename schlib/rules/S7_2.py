@@ -19,7 +19,7 @@ class Rule(KLCRule):
         """
 
         fail = False
-        if self.component.isGraphicSymbol():
+        if self.analysis.isGraphicSymbol():
             # no pins in raphical symbol
             if (len(self.component.pins) != 0):
                 self.error("Graphical symbols have no pins")
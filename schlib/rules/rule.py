@@ -9,6 +9,8 @@ if common not in sys.path:
     sys.path.append(common)
 
 from rulebase import *
+from pintable import PinTable
+from schlib import mergeBox
 
 
 # this should go to separate file
@@ -73,6 +75,83 @@ def positionFormater(element):
     # return "pos [{0},{1}]".format(element['posx'],element['posy'])
 
 
+def pinStackKey(pin):
+    return (pin['posx'], pin['posy'], pin['unit'], pin['convert'])
+
+
+def pinStacks(pins):
+    """
+    Group pins which are at the same position in the same unit and convert.
+    Returns a list of {'x', 'y', 'u', 'c', 'pins'} in order of the first pin
+    of each stack (single pins are stacks of one).
+    """
+    stacks = []
+    index = {}
+
+    for pin in pins:
+        key = pinStackKey(pin)
+        stack = index.get(key)
+        if stack is None:
+            stack = {'x': key[0], 'y': key[1], 'u': key[2], 'c': key[3], 'pins': []}
+            index[key] = stack
+            stacks.append(stack)
+        stack['pins'].append(pin)
+
+    return stacks
+
+
+class SymbolAnalysis(AnalysisContext):
+    """
+    Data derived from a symbol, shared by all rules (see AnalysisContext)
+    """
+
+    def isSmallComponent(self):
+        return self.get('small', self.item.isSmallComponentHeuristics)
+
+    def isPowerSymbol(self):
+        return self.get('power', self.item.isPowerSymbol)
+
+    def isGraphicSymbol(self):
+        return self.get('graphic', self.item.isGraphicSymbol)
+
+    # Tuple of (PinTable, index of the symbol in the table)
+    # Unless a table of the whole library was set (and is valid), a table of the symbol is used
+    def pinTable(self):
+        return self.get('pin_table', self._pinTable)
+
+    def _pinTable(self):
+        shared = self.cache.get('library_pin_table')
+        if shared is not None:
+            table, index = shared[0].get(), shared[1]
+            if table is not None:
+                return table, index
+        return PinTable([self.item]), 0
+
+    # table is a LazyPinTable of the library, it is built when a rule first asks for it
+    def setPinTable(self, table, index):
+        self.cache['library_pin_table'] = (table, index)
+
+    # Extents of the drawing (see Component.getBoundingBoxes), merged over all
+    # items or only the items of one unit (items common to all units are not included then)
+    def extents(self, unit=None):
+        return self.get('extents', self._extents, unit)
+
+    def _extents(self, unit):
+        boxes = self.get('bounding_boxes', self.item.getBoundingBoxes)
+
+        merged = {'pins': None, 'filled': []}
+        for key in sorted(boxes):
+            if unit is None or key[0] == unit:
+                merged['pins'] = mergeBox(merged['pins'], boxes[key]['pins'])
+                merged['filled'] += boxes[key]['filled']
+
+        return merged
+
+    # Pin stacks of the symbol (see pinStacks), must not be modified
+    def pinStacks(self):
+        return self.get('pin_stacks', lambda: pinStacks(self.item.pins))
+
+
 class KLCRule(KLCRuleBase):
     """
     A base class to represent a KLC rule
@@ -85,3 +164,4 @@ class KLCRule(KLCRuleBase):
         KLCRuleBase.__init__(self, description)
 
         self.component = component
+        self.analysis = SymbolAnalysis.attach(component)
@@ -116,6 +116,16 @@ class Documentation(object):
         if doc:#do not create empty records
             self.components[name]=doc
 
+def mergeBox(box, other):
+    """
+    Bounding box of two boxes (xmin, ymin, xmax, ymax), either may be None
+    """
+    if box is None:
+        return other
+    if other is None:
+        return box
+    return (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+
 class Component(object):
     """
     A class to parse components of Schematic Libraries Files Format of the KiCad
@@ -279,6 +289,51 @@ class Component(object):
 
         return None
 
+    # Map of { pin number : pin }, for many lookups by number
+    # For duplicate numbers the first pin is used (like getPinByNumber)
+    def getPinNumberMap(self):
+        pins = {}
+        for pin in self.draw['pins']:
+            if not pin['num'] in pins:
+                pins[pin['num']] = pin
+
+        return pins
+
+    def getBoundingBoxes(self):
+        """
+        Bounding boxes of the drawing, computed in one pass over drawOrdered.
+        Map of { (unit, convert) : extents } where extents is a dict of
+            * 'pins': box of the pin positions
+            * 'filled': list of boxes of the rectangles with background fill
+        Boxes are (xmin, ymin, xmax, ymax) or None. Unit or convert 0 are
+        the items common to all units or converts.
+        """
+        boxes = {}
+
+        for kind, item in self.drawOrdered:
+            if kind == 'X':
+                x = int(item['posx'])
+                y = int(item['posy'])
+                box = (x, y, x, y)
+            elif kind == 'S' and item['fill'] == 'f':
+                x = [int(item['startx']), int(item['endx'])]
+                y = [int(item['starty']), int(item['endy'])]
+                box = (min(x), min(y), max(x), max(y))
+            else:
+                continue
+
+            key = (int(item['unit']), int(item['convert']))
+            if not key in boxes:
+                boxes[key] = {'pins': None, 'filled': []}
+            extents = boxes[key]
+
+            if kind == 'X':
+                extents['pins'] = mergeBox(extents['pins'], box)
+            else:
+                extents['filled'].append(box)
+
+        return boxes
+
     def filterPins(self, name=None, direction=None, electrical_type=None):
         pins = []
 
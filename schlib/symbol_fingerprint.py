@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Geometry fingerprints of symbols.
+
+A symbol is described by its pins, its graphic items and the definition
+values which change its drawing (units, pin name offset, ...). The name,
+the fields and the draw order are ignored, so the same symbol drawn twice
+under different names has the same fingerprint. Rectangles, polylines and
+arcs are normalized so that the direction they are drawn in is ignored too.
+
+"""
+
+import hashlib
+
+def number(value):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+def numbers(item, keys):
+    return tuple(number(item[key]) for key in keys)
+
+def pinFeature(pin):
+    return ('X', pin['name'], pin['num']) + numbers(pin, ['posx', 'posy', 'length']) + \
+           (pin['direction'], pin['electrical_type'], pin.get('pin_type', '')) + numbers(pin, ['unit', 'convert'])
+
+def rectangleFeature(rect):
+    x = sorted(numbers(rect, ['startx', 'endx']))
+    y = sorted(numbers(rect, ['starty', 'endy']))
+    return ('S', x[0], y[0], x[1], y[1]) + numbers(rect, ['unit', 'convert', 'thickness']) + (rect['fill'],)
+
+def polylineFeature(poly):
+    values = [number(v) for v in poly['points']]
+    points = list(zip(values[0::2], values[1::2]))
+    # a polyline drawn backwards is the same polyline
+    points = min(tuple(points), tuple(reversed(points)))
+    return ('P', points) + numbers(poly, ['unit', 'convert', 'thickness']) + (poly['fill'],)
+
+def arcFeature(arc):
+    # the end points identify the arc, independent of the direction
+    ends = sorted([numbers(arc, ['startx', 'starty']), numbers(arc, ['endx', 'endy'])])
+    return ('A',) + numbers(arc, ['posx', 'posy', 'radius']) + tuple(ends) + \
+           numbers(arc, ['unit', 'convert', 'thickness']) + (arc['fill'],)
+
+def circleFeature(circle):
+    return ('C',) + numbers(circle, ['posx', 'posy', 'radius', 'unit', 'convert', 'thickness']) + (circle['fill'],)
+
+def textFeature(text):
+    return ('T', text['text']) + numbers(text, ['direction', 'posx', 'posy', 'text_size', 'unit', 'convert'])
+
+_FEATURES = {
+    'X': pinFeature,
+    'S': rectangleFeature,
+    'P': polylineFeature,
+    'A': arcFeature,
+    'C': circleFeature,
+    'T': textFeature,
+    }
+
+def symbolFeatures(component):
+    """
+    List of the normalized items of a component, in draw order
+    """
+    definition = component.definition
+    features = [('DEF',) + numbers(definition, ['text_offset', 'unit_count']) +
+                tuple(definition.get(key, '') for key in ['draw_pinnumber', 'draw_pinname', 'units_locked', 'option_flag'])]
+
+    for kind, item in component.drawOrdered:
+        if kind in _FEATURES:
+            features.append(_FEATURES[kind](item))
+
+    return features
+
+def symbolFingerprint(features):
+    """
+    md5 hash of the features of a symbol, independent of their order
+    """
+    items = sorted(repr(feature) for feature in features)
+    return hashlib.md5('\n'.join(items).encode('utf-8')).hexdigest()
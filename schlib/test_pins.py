@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of the pin rules against the per symbol implementations they replaced.
+Run with pytest.
+"""
+
+import random
+
+import pytest
+
+import pintable
+from pintable import PinTable, LazyPinTable
+from schlib import SchLib
+from rules.rule import SymbolAnalysis, positionFormater, pinString, pinStacks
+from rules import S4_1, S4_3
+
+def randomLibrary(rng, filename, n, duplicates=0):
+    """
+    Write a library of n symbols with random pins (on and off grid, stacked,
+    several units), returns the parsed library.
+    duplicates is the probability of repeating an earlier pin of the symbol.
+    """
+    lines = ['EESchema-LIBRARY Version 2.3', '#encoding utf-8']
+
+    for i in range(n):
+        units = rng.choice([1, 1, 2, 3])
+        lines += [
+            '#', '# U{i}'.format(i=i), '#',
+            'DEF U{i} U 0 40 Y Y {u} {l} N'.format(i=i, u=units, l='L' if units > 1 else 'F'),
+            'F0 "U" 0 0 50 H V C CNN',
+            'F1 "U{i}" 0 -100 50 H V C CNN'.format(i=i),
+            'F2 "" 0 0 50 H I C CNN',
+            'F3 "" 0 0 50 H I C CNN',
+            'DRAW',
+            ]
+
+        pins = []
+        for j in range(rng.choice([0, 1, 3, 8, 20])):
+            if pins and rng.random() < duplicates:
+                pins.append(rng.choice(pins))
+                continue
+            pins.append('X {name} {num} {x} {y} {length} {d} 50 50 {u} {c} {t} {s}'.format(
+                name=rng.choice(['~', 'A', 'B', 'VCC']),
+                num=rng.randint(1, 6),
+                x=rng.choice([-200, -150, -100, -75, 0, 100, 125]),
+                y=rng.choice([-100, 0, 50, 100, 110]),
+                length=rng.choice([0, 25, 50, 75, 100, 150, 300, 325]),
+                d=rng.choice('UDLR'),
+                u=rng.randint(0 if units > 1 else 1, units),
+                c=rng.choice([1, 1, 2]),
+                t=rng.choice('IOBPWwN'),
+                s=rng.choice(['N', 'I', 'NI', 'C'])))
+
+        lines += pins
+        lines += ['ENDDRAW', 'ENDDEF']
+
+    lines += ['#', '#End Library', '']
+
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines))
+    with open(filename[:-4] + '.dcm', 'w') as f:
+        f.write('EESchema-DOCLIB  Version 2.0\n#\n#End Doc Library\n')
+
+    return SchLib(filename)
+
+def perPinOffGrid(pins, grid):
+    return [pin for pin in pins if int(pin['posx']) % grid != 0 or int(pin['posy']) % grid != 0]
+
+def perPinBadLength(pins, warning, maximum, multiple):
+    bad = []
+    for pin in pins:
+        length = int(pin['length'])
+        if length != 0 and (length <= warning or length % multiple != 0 or length > maximum):
+            bad.append(pin)
+    return bad
+
+@pytest.fixture(params=['numpy', 'lists'])
+def columns(request, monkeypatch):
+    if request.param == 'lists':
+        monkeypatch.setattr(pintable, 'numpy', None)
+    elif pintable.numpy is None:
+        pytest.skip('NumPy is not installed')
+
+def test_pin_table(tmp_path, columns):
+    rng = random.Random(0)
+    lib = randomLibrary(rng, str(tmp_path / 'Test.lib'), 40)
+
+    table = PinTable(lib.components)
+    assert len(table) == sum(len(component.pins) for component in lib.components)
+    assert table.componentCount() == len(lib.components)
+
+    for index, component in enumerate(lib.components):
+        single = PinTable([component])
+
+        for grid in [50, 100]:
+            expected = perPinOffGrid(component.pins, grid)
+            assert table.pinsWhere(index, table.offGrid(grid)) == expected
+            assert single.pinsWhere(0, single.offGrid(grid)) == expected
+
+        for warning in [49, 99]:
+            expected = perPinBadLength(component.pins, warning, 300, 50)
+            assert table.pinsWhere(index, table.badLength(warning, 300, 50)) == expected
+            assert single.pinsWhere(0, single.badLength(warning, 300, 50)) == expected
+
+class PerPinRule(S4_1.Rule):
+    """
+    S4.1 as it was before the pin table
+    """
+
+    def checkPinOrigin(self, gridspacing=100):
+        self.violating_pins = []
+        err = False
+        for pin in self.component.pins:
+            posx = int(pin['posx'])
+            posy = int(pin['posy'])
+            if (posx % gridspacing) != 0 or (posy % gridspacing) != 0:
+                self.violating_pins.append(pin)
+                if not err:
+                    self.error("Pins not located on {0}mil (={1:.3}mm) grid:".format(gridspacing, gridspacing*0.0254))
+                self.error(' - Pin {0} ({1}), {2}mil'.format(pin['name'], pin['num'], positionFormater(pin)))
+                err = True
+
+        return len(self.violating_pins) > 0
+
+    def checkPinLength(self, errorPinLength=49, warningPinLength=99):
+        self.violating_pins = []
+
+        for pin in self.component.pins:
+            length = int(pin['length'])
+
+            err = False
+
+            # ignore zero-length pins e.g. hidden power pins
+            if length == 0:
+                continue
+
+            if length <= errorPinLength:
+                self.error("{pin} length ({len}mils) is below {pl}mils".format(pin=pinString(pin), len=length, pl=errorPinLength+1))
+            elif length <= warningPinLength:
+                self.warning("{pin} length ({len}mils) is below {pl}mils".format(pin=pinString(pin), len=length, pl=warningPinLength+1))
+
+            if length % 50 != 0:
+                self.warning("{pin} length ({len}mils) is not a multiple of 50mils".format(pin=pinString(pin), len=length))
+
+            # length too long flags a warning
+            if length > 300:
+                err = True
+                self.error("{pin} length ({length}mils) is longer than maximum (300mils)".format(
+                    pin=pinString(pin),
+                    length=length))
+
+            if err:
+                self.violating_pins.append(pin)
+
+        return len(self.violating_pins) > 0
+
+def ruleResult(rule):
+    result = rule.check()
+    return result, rule.errorCount, rule.warningCount(), rule.messageBuffer
+
+def test_s4_1(tmp_path, columns):
+    rng = random.Random(1)
+    lib = randomLibrary(rng, str(tmp_path / 'Test.lib'), 40)
+
+    # shared table of the library, as set by checklib.py
+    shared = LazyPinTable(lib.components)
+    for index, component in enumerate(lib.components):
+        expected = ruleResult(PerPinRule(component))
+
+        assert ruleResult(S4_1.Rule(component)) == expected
+
+        analysis = SymbolAnalysis.attach(component)
+        analysis.invalidate()
+        analysis.setPinTable(shared, index)
+        assert ruleResult(S4_1.Rule(component)) == expected
+        assert analysis.pinTable()[0] is shared.table
+
+def test_lazy_pin_table(tmp_path):
+    rng = random.Random(2)
+    lib = randomLibrary(rng, str(tmp_path / 'Test.lib'), 3)
+
+    shared = LazyPinTable(lib.components)
+    assert shared.table is None
+
+    SymbolAnalysis.attach(lib.components[1]).setPinTable(shared, 1)
+    table, index = SymbolAnalysis.attach(lib.components[1]).pinTable()
+    assert table is shared.table and index == 1
+    assert table.componentCount() == 3
+
+    # malformed pin: every symbol gets its own table
+    [pin for component in lib.components for pin in component.pins][0]['posx'] = 'x'
+    broken = LazyPinTable(lib.components)
+    analysis = SymbolAnalysis(lib.components[2])
+    analysis.setPinTable(broken, 2)
+    table, index = analysis.pinTable()
+    assert broken.get() is None and table.componentCount() == 1 and index == 0
+
+def pairwisePinStacks(pins):
+    """
+    Pin stacks as S4.3 found them before, comparing every pin with all stacks
+    """
+    pin_locations = []
+
+    for pin in pins:
+        dupe = False
+
+        for loc in pin_locations:
+            if pin['posx'] == loc['x'] and pin['posy'] == loc['y'] and pin['unit'] == loc['u'] and pin['convert'] == loc['c']:
+                loc['pins'].append(pin)
+                dupe = True
+
+        if not dupe:
+            pin_locations.append({'x': pin['posx'], 'y': pin['posy'], 'u': pin['unit'], 'c': pin['convert'], 'pins': [pin]})
+
+    return pin_locations
+
+def test_pin_stacks(tmp_path):
+    rng = random.Random(3)
+    lib = randomLibrary(rng, str(tmp_path / 'Test.lib'), 60, duplicates=0.3)
+
+    for component in lib.components:
+        assert pinStacks(component.pins) == pairwisePinStacks(component.pins)
+
+class OldFixRule(S4_3.Rule):
+    """
+    S4.3 with the fix as it was before, one pass over the drawing per duplicated pin
+    """
+
+    def fix(self):
+        # Delete duplicate pins
+        if len(self.duplicated_pins) > 0:
+            self.info("Removing duplicate pins")
+
+            for pin_groups in self.duplicated_pins:
+                # Leave first pin and delete all others
+                pin = pin_groups[0]
+
+                count = 0
+                # Iterate through component pins
+                i = 0
+                while i < len(self.component.drawOrdered):
+
+                    el = self.component.drawOrdered[i]
+                    if not el[0] == 'X':  # Pins
+                        i += 1
+                        continue
+
+                    p_test = el[1]
+
+                    # All these keys must be identical!
+                    keys = ['name', 'num', 'unit', 'posx', 'posy', 'convert']
+
+                    # Found duplicate
+                    if all([p_test[key] == pin[key] for key in keys]):
+                        count += 1
+                        # Skip the first instance, delete all others
+                        if count > 1:
+                            del self.component.drawOrdered[i]
+                            self.info("Deleting {pin} @ ({x},{y})".format(
+                                pin=self.pinStr(pin),
+                                x=pin['posx'],
+                                y=pin['posy']))
+                            continue
+                    i += 1
+
+        for pin in self.component.pins:
+            if pin['num'] in self.fix_make_passive:
+                pin['electrical_type'] = 'P'
+                self.info("pin "+pin['num']+" "+pin['name']+" is passive now (pin['electrical_type']="+pin['electrical_type']+")")
+            if pin['num'] in self.fix_make_invisible:
+                pin['pin_type'] = 'N'+pin['pin_type']
+                self.info("pin "+pin['num']+" "+pin['name']+" is invisible now (pin['pin_type']="+pin['pin_type']+")")
+            if pin['num'] in self.fix_make_visible:
+                pin['pin_type'] = pin['pin_type'][1:len(pin['pin_type'])]
+                self.info("pin "+pin['num']+" "+pin['name']+" is visible now (pin['pin_type']="+pin['pin_type']+")")
+
+        if self.different_names:
+            self.info("FIX for 'different pin names' not supported (yet)! Please fix manually.")
+        if self.NC_stacked:
+            self.info("FIX for 'NC pins stacked' not supported! Please fix manually.")
+        if self.different_types:
+            self.info("FIX for 'different pin types' not supported (yet)! Please fix manually.")
+        if self.only_one_visible:
+            self.info("FIX for 'only one pin in a pin stack is visible' not supported (yet)! Please fix manually.")
+
+def fixResult(rule):
+    result = ruleResult(rule)
+    rule.fix()
+    return result, rule.messageBuffer, rule.component.drawOrdered, rule.component.pins
+
+def test_s4_3_fix(tmp_path):
+    rng = random.Random(4)
+    old = randomLibrary(rng, str(tmp_path / 'Old.lib'), 60, duplicates=0.3)
+
+    rng = random.Random(4)
+    new = randomLibrary(rng, str(tmp_path / 'New.lib'), 60, duplicates=0.3)
+
+    deleted = 0
+    for old_component, new_component in zip(old.components, new.components):
+        n = len(new_component.drawOrdered)
+        assert fixResult(S4_3.Rule(new_component)) == fixResult(OldFixRule(old_component))
+        deleted += n - len(new_component.drawOrdered)
+
+    # the libraries have duplicates to remove
+    assert deleted > 0
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This script searches the names, descriptions and keywords of symbols,
+aliases and footprints, using the inverted index of a database created
+by index_library.py (run it again to refresh the index).
+
+All words of the query must match. A word ending with '*' matches all
+words starting with it. Results are ranked by how rare the matched words
+are and whether they were found in the name, keywords or description.
+
+Example:
+    ./search_library.py -d lib.sqlite opamp dual
+    ./search_library.py -d lib.sqlite -k footprint "sot-23*"
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import os
+import math
+import sqlite3
+import time
+
+from index_library import openDatabase, tokenize, IndexDatabaseError
+
+def queryTerms(query):
+    """
+    List of (term, prefix) of a query string
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        tokens = tokenize(word)
+        for i, token in enumerate(tokens):
+            terms.append((token, prefix and i == len(tokens) - 1))
+
+    return terms
+
+def termMatches(db, term, prefix):
+    """
+    Map of { document id : weight } of the documents containing a term
+    """
+    if prefix:
+        # all terms between the prefix and the next possible prefix
+        end = term[:-1] + chr(ord(term[-1]) + 1)
+        rows = db.execute('SELECT document_id, SUM(weight) FROM terms WHERE term >= ? AND term < ? GROUP BY document_id', (term, end))
+    else:
+        rows = db.execute('SELECT document_id, weight FROM terms WHERE term = ?', (term,))
+
+    return dict(rows)
+
+def search(db, query, kind=None, limit=20):
+    """
+    Search the documents of the index.
+    Returns a list of (score, kind, library, name, description) of the best matches.
+    """
+    terms = queryTerms(query)
+    if not terms:
+        return []
+
+    n_documents = db.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    scores = None
+    # rare terms first, to keep the intersection small
+    matches = sorted([termMatches(db, term, prefix) for term, prefix in terms], key=len)
+
+    for match in matches:
+        # inverse document frequency
+        idf = math.log(1.0 + n_documents / float(len(match) or 1))
+
+        if scores is None:
+            scores = dict((doc, weight * idf) for doc, weight in match.items())
+        else:
+            scores = dict((doc, scores[doc] + weight * idf) for doc, weight in match.items() if doc in scores)
+
+        if not scores:
+            return []
+
+    # best matches first, equal scores in index order
+    ranked = sorted(scores, key=lambda doc: (-scores[doc], doc))
+
+    results = []
+    # fetch the documents in batches (SQLite limits the number of parameters)
+    for i in range(0, len(ranked), 500):
+        batch = ranked[i:i+500]
+        sql = 'SELECT id, kind, library, name, description FROM documents WHERE id IN ({p})'.format(p=', '.join(['?'] * len(batch)))
+        if kind:
+            sql += ' AND kind = ?'
+        documents = dict((row[0], row[1:]) for row in db.execute(sql, batch + [kind] if kind else batch))
+
+        results += [(scores[doc],) + documents[doc] for doc in batch if doc in documents]
+
+        if limit and len(results) >= limit:
+            break
+
+    return results[:limit] if limit else results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Search symbols, aliases and footprints in a database created by index_library.py')
+    parser.add_argument('query', nargs='+', help='Words to search for, a word ending with * is a prefix')
+    parser.add_argument('-d', '--database', help='SQLite database file (default = library.sqlite)', default='library.sqlite')
+    parser.add_argument('-k', '--kind', help='Only show results of this kind', choices=['symbol', 'alias', 'footprint'])
+    parser.add_argument('-n', '--limit', help='Maximum number of results (default = 20, 0 = all)', type=int, default=20)
+    parser.add_argument('-v', '--verbose', help='Show the search time', action='store_true')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.database):
+        print("Database '{d}' does not exist, create it with index_library.py".format(d=args.database), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        db = openDatabase(args.database, readonly=True)
+    except (IndexDatabaseError, sqlite3.DatabaseError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    start = time.time()
+    results = search(db, ' '.join(args.query), args.kind, args.limit)
+
+    for score, kind, library, name, description in results:
+        print("{s:6.2f} {k:9} {l}:{n}  {d}".format(s=score, k=kind, l=library, n=name, d=description or ''))
+
+    if args.verbose:
+        print("{n} results in {t:.1f}ms".format(n=len(results), t=(time.time() - start) * 1000), file=sys.stderr)
+
+    db.close()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks of merge_results.py: the merged reports of all shards are the same
+as the report of a single run. Run with pytest.
+"""
+
+import json
+import random
+
+from merge_results import mergeResults
+from klcengine import ItemResult, TaskResult, ReportSink, shardTasks
+
+def randomTaskResults(rng, n):
+    """
+    Results of n tasks (libraries) with random items and failed rules
+    """
+    task_results = []
+
+    for i in range(n):
+        library = 'L{i}'.format(i=i)
+        results = [ItemResult(library, None, '')]
+        failed = 0
+        for j in range(rng.randint(0, 5)):
+            rules = sorted(rng.sample(['S3.1', 'S4.1', 'S4.3'], rng.randint(0, 2)))
+            results.append(ItemResult(library, 'I{j}'.format(j=j), '', len(rules), rules))
+            failed += 1 if rules else 0
+        task_results.append(TaskResult(library + '.lib', results, failed, rng.uniform(0, 2)))
+
+    return task_results
+
+def writeReport(filename, task_results, shard=None):
+    sink = ReportSink(str(filename), 'symbol', shard)
+    for task_result in task_results:
+        for result in task_result.results:
+            sink.report(result)
+        sink.reportTask(task_result)
+    sink.finish()
+
+    with open(str(filename), 'r') as f:
+        return json.loads(f.read())
+
+def test_merge_shards(tmp_path):
+    rng = random.Random(0)
+
+    for count in [1, 2, 3, 5]:
+        task_results = randomTaskResults(rng, 12)
+        single = writeReport(tmp_path / 'single.json', task_results)
+
+        tasks = [task_result.task for task_result in task_results]
+        weights = [len(task_result.results) for task_result in task_results]
+
+        inputs = []
+        for k in range(1, count + 1):
+            shard = shardTasks(tasks, k, count, weights)
+            filename = tmp_path / 'shard{k}.json'.format(k=k)
+            inputs.append((str(filename), writeReport(filename, [r for r in task_results if r.task in shard], (k, count))))
+
+        # the order of the reports does not matter
+        rng.shuffle(inputs)
+        merged, problems = mergeResults(inputs)
+
+        assert problems == []
+        for rule_name in single['errors']:
+            single['errors'][rule_name].sort(key=lambda entry: (entry['library'], entry['item']))
+        single['shard'] = None
+        assert merged == single
+
+def test_merge_problems(tmp_path):
+    rng = random.Random(1)
+    task_results = randomTaskResults(rng, 4)
+
+    first = writeReport(tmp_path / 'a.json', task_results[:2], (1, 3))
+    second = writeReport(tmp_path / 'b.json', task_results[2:], (1, 3))
+
+    merged, problems = mergeResults([('a.json', first), ('b.json', second)])
+    assert problems == ["'a.json' and 'b.json' are both shard 1/3", "Missing shards of 3: 2, 3"]
+
+    log = {'errors': {'S4.1': [{'library': 'L0', 'item': 'I0'}]}}
+    merged, problems = mergeResults([('a.json', first), ('log.json', log)])
+    assert "Reports and logs can't be merged together" in problems
+
+def test_merge_logs():
+    logs = [
+        ('a.json', {'errors': {'S4.1': [{'library': 'L1', 'item': 'I0'}, {'library': 'L0', 'item': 'I1'}]}}),
+        ('b.json', {'errors': {'S4.1': [{'library': 'L0', 'item': 'I0'}], 'S3.1': [{'library': 'L1', 'item': 'I0'}]}}),
+        ]
+
+    merged, problems = mergeResults(logs)
+
+    assert problems == []
+    assert merged['kind'] is None
+    # items with errors, counted once
+    assert merged['failed'] == 3
+    assert merged['errors']['S4.1'] == [{'library': 'L0', 'item': 'I0'}, {'library': 'L0', 'item': 'I1'}, {'library': 'L1', 'item': 'I0'}]